@@ -0,0 +1,166 @@
+# load_test.py - Load test for tools/game_server.py with many concurrent sessions
+#
+# Usage: python -m benchmarks.load_test --sessions 50 --games 2 [--difficulty 2] [--spawn-server]
+
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+
+from tools.game_server import DEFAULT_PORT
+
+
+class Client:
+    def __init__(self, reader, writer):
+        """A connection to the game server that records how long each request takes."""
+        self.reader = reader
+        self.writer = writer
+        self.latencies = {}
+        self._next_id = 0
+
+    @classmethod
+    async def connect(cls, host, port):
+        """Open a connection to the server."""
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def request(self, op, **fields):
+        """
+        Send one request and wait for its response.
+
+        Raises:
+            RuntimeError: If the server answers with an error
+        """
+        self._next_id += 1
+        fields.update(op=op, id=self._next_id)
+        start = time.perf_counter()
+        self.writer.write(json.dumps(fields).encode() + b"\n")
+        await self.writer.drain()
+        response = json.loads(await self.reader.readline())
+        self.latencies.setdefault(op, []).append(time.perf_counter() - start)
+        if not response["ok"]:
+            raise RuntimeError("%s failed: %s" % (op, response["error"]))
+        return response
+
+    async def close(self):
+        """Close the connection."""
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def play_session(host, port, games, difficulty, rng):
+    """Play `games` games against the server's AI, moving at random, and return the client's latencies."""
+    client = await Client.connect(host, port)
+    try:
+        for _ in range(games):
+            game = await client.request("new", mode="pvc", difficulty=difficulty)
+            heights = [0] * game["columns"]
+            while not game["game_over"]:
+                column = rng.choice([c for c in range(game["columns"]) if heights[c] < game["rows"]])
+                heights[column] += 1
+                game = await client.request("move", session=game["session"], column=column)
+                if game["game_over"]:
+                    break
+                game = await client.request("ai_move", session=game["session"])
+                heights[game["column"]] += 1
+            await client.request("close", session=game["session"])
+    finally:
+        await client.close()
+    return client.latencies
+
+
+def percentile(values, p):
+    """Return the p-th percentile of a sorted list, by the nearest-rank method."""
+    return values[min(len(values) - 1, max(0, int(round(p / 100.0 * len(values))) - 1))]
+
+
+async def run(args):
+    """Run every session at once and return the latencies per op and the elapsed time."""
+    rngs = [random.Random(args.seed * 1000003 + i) for i in range(args.sessions)]
+    start = time.perf_counter()
+    results = await asyncio.gather(*(play_session(args.host, args.port, args.games, args.difficulty, rng)
+                                     for rng in rngs))
+    elapsed = time.perf_counter() - start
+
+    latencies = {}
+    for result in results:
+        for op, values in result.items():
+            latencies.setdefault(op, []).extend(values)
+    return latencies, elapsed
+
+
+async def wait_for_server(host, port, timeout=10.0):
+    """Wait until the server accepts connections."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the game server with concurrent sessions.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--sessions", type=int, default=20, help="concurrent sessions (default: 20)")
+    parser.add_argument("--games", type=int, default=1, help="games per session (default: 1)")
+    parser.add_argument("--difficulty", type=int, default=2, help="AI difficulty (default: 2)")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the random player moves (default: 0)")
+    parser.add_argument("--spawn-server", action="store_true",
+                        help="start tools.game_server in a subprocess for the test")
+    parser.add_argument("--ai-workers", type=int, default=2, help="AI workers for a spawned server (default: 2)")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    server = None
+    if args.spawn_server:
+        server = subprocess.Popen([sys.executable, "-m", "tools.game_server", "--host", args.host,
+                                   "--port", str(args.port), "--ai-workers", str(args.ai_workers),
+                                   "--max-queued", str(max(64, args.sessions))],
+                                  stdout=subprocess.DEVNULL)
+    try:
+        if server is not None:
+            asyncio.run(wait_for_server(args.host, args.port))
+        latencies, elapsed = asyncio.run(run(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    report = {"sessions": args.sessions, "games": args.games, "difficulty": args.difficulty,
+              "seconds": elapsed, "ops": {}}
+    print("%d sessions x %d games in %.2fs" % (args.sessions, args.games, elapsed))
+    print("%-8s %8s %10s %10s %10s %10s" % ("op", "count", "p50 ms", "p99 ms", "max ms", "per sec"))
+    for op in ("new", "move", "ai_move", "close"):
+        values = sorted(latencies.get(op, []))
+        if not values:
+            continue
+        summary = {"count": len(values), "p50_ms": percentile(values, 50) * 1000,
+                   "p99_ms": percentile(values, 99) * 1000, "max_ms": values[-1] * 1000,
+                   "per_second": len(values) / elapsed}
+        report["ops"][op] = summary
+        print("%-8s %8d %10.2f %10.2f %10.2f %10.1f" % (op, summary["count"], summary["p50_ms"], summary["p99_ms"],
+                                                        summary["max_ms"], summary["per_second"]))
+
+    moves = sorted(latencies.get("move", []) + latencies.get("ai_move", []))
+    if moves:
+        report["moves"] = {"count": len(moves), "p50_ms": percentile(moves, 50) * 1000,
+                           "p99_ms": percentile(moves, 99) * 1000, "per_second": len(moves) / elapsed}
+        print("all moves: p50 %.2f ms, p99 %.2f ms, %.1f moves/s" % (
+            report["moves"]["p50_ms"], report["moves"]["p99_ms"], report["moves"]["per_second"]))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
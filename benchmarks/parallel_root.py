@@ -0,0 +1,71 @@
+# parallel_root.py - Benchmark of the parallel root search against the serial search
+#
+# Usage: python -m benchmarks.parallel_root [--depths 5 6 7 8 9] [--workers 1 2 4 8]
+
+import argparse
+import os
+import time
+
+from utils.constants import PLAYER_1, PLAYER_2
+from components.board import Board
+from connect4AI import AIPlayer
+
+# Positions as the columns played from an empty board, with player 2 to move
+POSITIONS = [
+    "3",
+    "323",
+    "33425",
+    "2344351",
+]
+
+
+def build_board(moves):
+    """Replay a string of column digits on a new board."""
+    board = Board()
+    piece = PLAYER_1
+    for char in moves:
+        col = int(char)
+        board.drop_piece(board.get_next_open_row(col), col, piece)
+        piece = PLAYER_2 if piece == PLAYER_1 else PLAYER_1
+    return board
+
+
+def time_search(board, depth, workers):
+    """Return (seconds, column, nodes) for one search with a fresh AIPlayer."""
+    ai = AIPlayer(player_piece=PLAYER_2, difficulty=3, workers=workers)
+    ai.depth = depth
+    try:
+        if workers > 1:
+            ai._parallel._ensure_pool()  # Keep process start-up out of the timing
+        start = time.perf_counter()
+        col = ai.get_move(board)
+        return time.perf_counter() - start, col, ai.last_search_nodes
+    finally:
+        ai.close()
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    default_workers = sorted({1, 2, 4, cpus})
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--depths", type=int, nargs="+", default=[5, 6, 7, 8, 9])
+    parser.add_argument("--workers", type=int, nargs="+", default=default_workers)
+    args = parser.parse_args()
+
+    print("cpus=%d" % cpus)
+    print("%-10s %5s %7s %9s %8s %10s %5s" % ("position", "depth", "workers", "seconds", "speedup", "nodes", "move"))
+    for moves in POSITIONS:
+        board = build_board(moves)
+        for depth in args.depths:
+            serial_time, serial_col = None, None
+            for workers in args.workers:
+                seconds, col, nodes = time_search(board, depth, workers)
+                if serial_time is None:
+                    serial_time, serial_col = seconds, col
+                flag = "" if col == serial_col else " MISMATCH"
+                print("%-10s %5d %7d %9.3f %7.2fx %10d %5d%s" % (
+                    moves, depth, workers, seconds, serial_time / seconds, nodes, col, flag))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+# search_suite.py - Benchmark and regression suite for AIPlayer over a fixed set of positions
+#
+# Usage: python -m benchmarks.search_suite [--configs hard perfect] [--output results.json]
+#        python -m benchmarks.search_suite --baseline results.json [--threshold 0.1]
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from collections import namedtuple
+
+from utils.constants import PLAYER_1, PLAYER_2
+from connect4AI import AIPlayer
+from engine.bitboard import BitBoard
+from engine.stats import ITERATION
+
+Position = namedtuple("Position", ["name", "category", "moves", "best", "outcome"])
+Position.__doc__ = """A corpus position.
+
+moves: Columns played from the empty board, as digits
+best: Columns that count as a correct answer, or None if any move is accepted
+outcome: Result for the side to move with perfect play ("win", "draw" or "loss"), if known
+"""
+
+# Tactics have exact answers: the only winning or blocking columns. Endgame answers
+# and outcomes come from the exact solver, and include every column with the best score.
+CORPUS = [
+    Position("empty", "opening", "", (3,), "win"),
+    Position("center", "opening", "3", None, None),
+    Position("center-2", "opening", "33", None, None),
+    Position("center-4", "opening", "3323", None, None),
+    Position("win-1", "tactic", "156365331303360551002", (2,), "win"),
+    Position("win-2", "tactic", "325364334434344115112", (2,), "win"),
+    Position("win-3", "tactic", "63441333242443322106252", (5,), "win"),
+    Position("block-1", "tactic", "03030033345444505", (5,), None),
+    Position("block-2", "tactic", "334233222434416", (5,), None),
+    Position("block-3", "tactic", "25133340344432563042", (2,), None),
+    Position("end-22a", "endgame", "26603434334342223412", (5,), "win"),
+    Position("end-22b", "endgame", "34033233044434400020", (2,), "win"),
+    Position("end-20", "endgame", "0353353350553151411220", (0, 1, 4), "win"),
+    Position("end-18a", "endgame", "030300333454445055435465", (0, 2), "win"),
+    Position("end-18b", "endgame", "105333335511113515500600", (2,), "win"),
+    Position("end-18c", "endgame", "644325354332443631400000", (0, 1, 2, 5, 6), "draw"),
+    Position("end-16", "endgame", "64432535433244363140000006", (1, 2, 5, 6), "draw"),
+    Position("end-14", "endgame", "6403253332232232650556655000", (0, 6), "win"),
+]
+
+# Engine settings to measure, as AIPlayer keyword arguments. "depth" overrides the
+# difficulty's search depth, so the fixed-depth settings give the time to each depth.
+CONFIGS = {
+    "easy": {"difficulty": 1},
+    "medium": {"difficulty": 2},
+    "hard": {"difficulty": 3},
+    "hard-no-ordering": {"difficulty": 3, "move_ordering": False},
+    "depth-7": {"difficulty": 3, "depth": 7},
+    "perfect": {"difficulty": 4},
+    "mcts": {"difficulty": 3, "engine": "mcts"},
+}
+
+# Settings that search to a time budget, so their node counts vary from run to run
+TIMED_CONFIGS = {"perfect"}
+
+# Settings that run Monte Carlo tree search. They count iterations rather than
+# nodes and use no transposition table, so they are summarized on their own.
+MCTS_CONFIGS = {"mcts"}
+
+
+def build_position(moves):
+    """Replay a string of column digits on an empty BitBoard."""
+    position = BitBoard()
+    for char in moves:
+        position.play(int(char))
+    return position
+
+
+def run_position(settings, entry, repeat=1):
+    """
+    Search one corpus position with a fresh AIPlayer.
+
+    Args:
+        settings: AIPlayer keyword arguments, plus an optional "depth"
+        entry: The Position to search
+        repeat: Searches to run, keeping the fastest to reduce timing noise
+
+    Returns:
+        Dictionary of measurements. Minimax settings report nodes, the table
+        hit rate and "time_to_depth", the seconds from the start of the search
+        until each depth completed. MCTS settings report iterations instead.
+    """
+    settings = dict(settings)
+    depth = settings.pop("depth", None)
+    position = build_position(entry.moves)
+    piece = PLAYER_1 if position.moves % 2 == 0 else PLAYER_2
+
+    best = None
+    for _ in range(repeat):
+        # A fresh player each time, so every run starts from an empty table. The
+        # callback receives the same ITERATION reports as SearchStats.iterations,
+        # without switching the search to its slower counting version.
+        iterations = []
+        ai = AIPlayer(player_piece=piece, callback=iterations.append, **settings)
+        if depth is not None:
+            ai.depth = depth
+        random.seed(0)
+        start = time.perf_counter()
+        col, score = ai.search(position)
+        seconds = time.perf_counter() - start
+        ai.close()
+        if best is None or seconds < best[0]:
+            best = (seconds, col, score, ai, iterations)
+
+    seconds, col, score, ai, iterations = best
+    result = {
+        "position": entry.name,
+        "category": entry.category,
+        "column": col,
+        "score": score,
+        "depth": ai.last_search_depth,
+        "seconds": seconds,
+        "correct": None if entry.best is None else col in entry.best,
+    }
+    if ai.engine == "mcts":
+        result["iterations"] = ai.last_search_nodes
+        result["iterations_per_second"] = ai.last_search_nodes / seconds if seconds > 0 else 0.0
+        return result
+
+    table = ai.solver.tt if ai.last_solution is not None else ai.tt
+    nodes = ai.last_search_nodes
+    result.update({
+        "solved": ai.last_solution is not None,
+        "nodes": nodes,
+        "nodes_per_second": nodes / seconds if seconds > 0 else 0.0,
+        "tt_hit_rate": table.stats()["hit_rate"],
+        "time_to_depth": {} if ai.last_solution is not None else {
+            str(it.depth): it.seconds for it in iterations if it.kind == ITERATION},
+    })
+    return result
+
+
+def summarize(results):
+    """
+    Total the measurements of one minimax setting over the corpus.
+
+    "time_to_depth" maps each depth to the mean seconds taken to complete it
+    and the number of positions that did, over positions not solved exactly.
+    """
+    nodes = sum(r["nodes"] for r in results)
+    seconds = sum(r["seconds"] for r in results)
+    checked = [r for r in results if r["correct"] is not None]
+    reached = {}
+    for r in results:
+        if not r["solved"]:
+            for depth, time_taken in r["time_to_depth"].items():
+                reached.setdefault(depth, []).append(time_taken)
+    return {
+        "positions": len(results),
+        "nodes": nodes,
+        "seconds": seconds,
+        "nodes_per_second": nodes / seconds if seconds > 0 else 0.0,
+        "mean_depth": sum(r["depth"] for r in results) / len(results),
+        "tt_hit_rate": sum(r["tt_hit_rate"] for r in results) / len(results),
+        "time_to_depth": {depth: [sum(reached[depth]) / len(reached[depth]), len(reached[depth])]
+                          for depth in sorted(reached, key=int)},
+        "correct": sum(1 for r in checked if r["correct"]),
+        "checked": len(checked),
+    }
+
+
+def summarize_mcts(results):
+    """Total the measurements of one MCTS setting over the corpus."""
+    iterations = sum(r["iterations"] for r in results)
+    seconds = sum(r["seconds"] for r in results)
+    checked = [r for r in results if r["correct"] is not None]
+    return {
+        "positions": len(results),
+        "iterations": iterations,
+        "seconds": seconds,
+        "iterations_per_second": iterations / seconds if seconds > 0 else 0.0,
+        "mean_depth": sum(r["depth"] for r in results) / len(results),
+        "correct": sum(1 for r in checked if r["correct"]),
+        "checked": len(checked),
+    }
+
+
+def run_suite(config_names, repeat=1, log=None):
+    """
+    Run every selected engine setting over the corpus.
+
+    Returns:
+        Dictionary with "meta", "configs" (per-position results), "summary" for
+        minimax settings and "mcts_summary" for MCTS settings
+    """
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "configs": {},
+        "summary": {},
+        "mcts_summary": {},
+    }
+    for name in config_names:
+        results = []
+        for entry in CORPUS:
+            result = run_position(CONFIGS[name], entry, repeat)
+            results.append(result)
+            if log is not None:
+                log(name, result)
+        report["configs"][name] = results
+        if name in MCTS_CONFIGS:
+            report["mcts_summary"][name] = summarize_mcts(results)
+        else:
+            report["summary"][name] = summarize(results)
+    return report
+
+
+def compare(report, baseline, threshold):
+    """
+    Compare a report against a saved baseline.
+
+    Flags a minimax setting whose nodes per second dropped, whose node count
+    for a fixed-depth search grew, or whose time to a depth both runs reached
+    grew, by more than `threshold`. Flags an MCTS setting whose iterations per
+    second dropped by more than `threshold`. Also flags any position that was
+    answered correctly in the baseline but not now.
+
+    Returns:
+        List of problem descriptions, empty if nothing regressed
+    """
+    problems = []
+    for name, summary in report["summary"].items():
+        old = baseline.get("summary", {}).get(name)
+        if old is None:
+            continue
+        if old["nodes_per_second"] and summary["nodes_per_second"] < old["nodes_per_second"] * (1 - threshold):
+            problems.append("%s: %.0f nodes/s, was %.0f (%+.1f%%)" % (
+                name, summary["nodes_per_second"], old["nodes_per_second"],
+                (summary["nodes_per_second"] / old["nodes_per_second"] - 1) * 100))
+        if name not in TIMED_CONFIGS and summary["nodes"] > old["nodes"] * (1 + threshold):
+            problems.append("%s: %d nodes, was %d (%+.1f%%)" % (
+                name, summary["nodes"], old["nodes"], (summary["nodes"] / old["nodes"] - 1) * 100))
+        for depth, (seconds, count) in summary["time_to_depth"].items():
+            # Only comparable when the same number of positions reached the depth
+            before = old.get("time_to_depth", {}).get(depth)
+            if before and before[1] == count and seconds > before[0] * (1 + threshold):
+                problems.append("%s: %.4fs to depth %s, was %.4fs (%+.1f%%)" % (
+                    name, seconds, depth, before[0], (seconds / before[0] - 1) * 100))
+
+    for name, summary in report["mcts_summary"].items():
+        old = baseline.get("mcts_summary", {}).get(name)
+        if old is None:
+            continue
+        rate, old_rate = summary["iterations_per_second"], old["iterations_per_second"]
+        if old_rate and rate < old_rate * (1 - threshold):
+            problems.append("%s: %.0f iterations/s, was %.0f (%+.1f%%)" % (
+                name, rate, old_rate, (rate / old_rate - 1) * 100))
+
+    for name in report["configs"]:
+        old_results = {r["position"]: r for r in baseline.get("configs", {}).get(name, [])}
+        for result in report["configs"][name]:
+            before = old_results.get(result["position"])
+            if before is not None and before["correct"] and result["correct"] is False:
+                problems.append("%s: %s now plays %s, was %s" % (
+                    name, result["position"], result["column"], before["column"]))
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark AIPlayer over a fixed set of positions.")
+    parser.add_argument("--configs", nargs="+", choices=sorted(CONFIGS), default=list(CONFIGS),
+                        help="engine settings to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=1, help="searches per position, keeping the fastest")
+    parser.add_argument("--output", help="write the full results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against results saved with --output")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative change that counts as a regression (default: 0.1)")
+    args = parser.parse_args()
+
+    print("%-17s %-10s %-9s %4s %5s %10s %9s %11s %6s %s" % (
+        "config", "position", "category", "col", "depth", "nodes", "seconds", "nodes/s", "tt hit", "correct"))
+
+    def log(name, r):
+        correct = "-" if r["correct"] is None else ("yes" if r["correct"] else "NO")
+        if name in MCTS_CONFIGS:
+            # Iterations per second in the nodes/s column, with no table hit rate
+            print("%-17s %-10s %-9s %4s %5s %10s %9.4f %11.0f %6s %s" % (
+                name, r["position"], r["category"], r["column"], r["depth"], "%d it" % r["iterations"],
+                r["seconds"], r["iterations_per_second"], "-", correct))
+            return
+        print("%-17s %-10s %-9s %4s %5s %10d %9.4f %11.0f %5.0f%% %s" % (
+            name, r["position"], r["category"], r["column"], r["depth"], r["nodes"], r["seconds"],
+            r["nodes_per_second"], r["tt_hit_rate"] * 100, correct))
+
+    report = run_suite(args.configs, args.repeat, log)
+
+    if report["summary"]:
+        print()
+        print("%-17s %10s %9s %11s %6s %6s %8s" % (
+            "config", "nodes", "seconds", "nodes/s", "depth", "tt hit", "correct"))
+        for name, s in report["summary"].items():
+            print("%-17s %10d %9.3f %11.0f %6.1f %5.0f%% %4d/%-3d" % (
+                name, s["nodes"], s["seconds"], s["nodes_per_second"], s["mean_depth"], s["tt_hit_rate"] * 100,
+                s["correct"], s["checked"]))
+        print()
+        print("Mean seconds to complete each depth (positions reaching it), over positions not solved exactly:")
+        for name, s in report["summary"].items():
+            print("%-17s %s" % (name, "  ".join("d%s %.4f (%d)" % (depth, seconds, count)
+                                                for depth, (seconds, count) in s["time_to_depth"].items())))
+
+    if report["mcts_summary"]:
+        print()
+        print("%-17s %10s %9s %11s %6s %8s" % ("config", "iterations", "seconds", "iter/s", "depth", "correct"))
+        for name, s in report["mcts_summary"].items():
+            print("%-17s %10d %9.3f %11.0f %6.1f %4d/%-3d" % (
+                name, s["iterations"], s["seconds"], s["iterations_per_second"], s["mean_depth"],
+                s["correct"], s["checked"]))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        problems = compare(report, baseline, args.threshold)
+        print()
+        if problems:
+            print("Regressions against %s:" % args.baseline)
+            for problem in problems:
+                print("  " + problem)
+            sys.exit(1)
+        print("No regressions against %s" % args.baseline)
+
+
+if __name__ == "__main__":
+    main()
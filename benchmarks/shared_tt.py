@@ -0,0 +1,122 @@
+# shared_tt.py - Benchmark of a shared-memory transposition table against per-process tables
+#
+# Usage: python -m benchmarks.shared_tt [--workers 1 4 16] [--games 12] [--depth 7]
+#
+# A batch of positions taken from the same games is searched by a pool of
+# worker processes, once with a private table in each worker and once with one
+# SharedTranspositionTable they all probe and store into. Positions from one
+# game land on different workers, so with private tables each worker has to
+# rediscover the lines its neighbours already searched.
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import time
+
+from utils.constants import PLAYER_2
+from engine.geometry import get_geometry
+from engine.bitboard import BitBoard
+from engine.shared_transposition import SharedTranspositionTable
+from connect4AI import AIPlayer
+
+# Per-process AIPlayer, built once by _init_worker
+_worker_ai = None
+
+
+def _init_worker(depth, tt_size_mb, shared_name):
+    """Create the AIPlayer each worker keeps, on a private or a shared table."""
+    global _worker_ai
+    _worker_ai = AIPlayer(player_piece=PLAYER_2, difficulty=3, tt_size_mb=tt_size_mb, shared_tt=shared_name)
+    _worker_ai.depth = depth
+
+
+def _search_task(masks):
+    """Search one position and return (nodes, table hits, table misses) for it."""
+    ai = _worker_ai
+    hits, misses = ai.tt.hits, ai.tt.misses
+    ai.search(BitBoard.from_masks(masks[0], masks[1], ai.geometry))
+    return ai.last_search_nodes, ai.tt.hits - hits, ai.tt.misses - misses
+
+
+def build_positions(games, plies, seed):
+    """
+    Play random games and keep every position with player 2 to move.
+
+    Returns:
+        List of (current, mask) pairs, game by game in move order
+    """
+    geometry = get_geometry()
+    rng = random.Random(seed)
+    positions = []
+    for _ in range(games):
+        position = BitBoard(geometry)
+        for ply in range(plies):
+            columns = [col for col in range(geometry.columns) if position.can_play(col)]
+            if any(position.is_winning_move(col) for col in columns):
+                break
+            position.play(rng.choice(columns))
+            if ply % 2 == 0:
+                positions.append((position.current, position.mask))
+    return positions
+
+
+def run(positions, workers, depth, tt_size_mb, shared):
+    """
+    Search every position on a pool of `workers` processes.
+
+    Returns:
+        Dictionary of the elapsed time, nodes and table hit rate
+    """
+    table = SharedTranspositionTable(tt_size_mb) if shared else None
+    try:
+        with multiprocessing.Pool(workers, initializer=_init_worker,
+                                  initargs=(depth, tt_size_mb, table.name if shared else None)) as pool:
+            pool.map(abs, range(workers))  # Keep process start-up out of the timing
+            start = time.perf_counter()
+            results = pool.map(_search_task, positions, chunksize=1)
+            seconds = time.perf_counter() - start
+    finally:
+        if table is not None:
+            table.close()
+
+    nodes = sum(r[0] for r in results)
+    hits = sum(r[1] for r in results)
+    probes = hits + sum(r[2] for r in results)
+    return {"workers": workers, "table": "shared" if shared else "private", "seconds": seconds,
+            "positions_per_second": len(positions) / seconds, "nodes": nodes, "nodes_per_second": nodes / seconds,
+            "hit_rate": hits / probes if probes else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare a shared transposition table with per-process tables.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--games", type=int, default=12, help="random games to take positions from (default: 12)")
+    parser.add_argument("--plies", type=int, default=16, help="moves per game (default: 16)")
+    parser.add_argument("--depth", type=int, default=7, help="search depth (default: 7)")
+    parser.add_argument("--tt-size-mb", type=float, default=8,
+                        help="table size, per worker for private tables (default: 8)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    positions = build_positions(args.games, args.plies, args.seed)
+    print("cpus=%d, %d positions at depth %d" % (os.cpu_count() or 1, len(positions), args.depth))
+    print("%7s %8s %9s %10s %12s %11s %9s" % ("workers", "table", "seconds", "pos/s", "nodes", "nodes/s", "hit rate"))
+    report = []
+    for workers in args.workers:
+        for shared in (False, True):
+            result = run(positions, workers, args.depth, args.tt_size_mb, shared)
+            report.append(result)
+            print("%7d %8s %9.2f %10.1f %12d %11.0f %8.1f%%" % (
+                workers, result["table"], result["seconds"], result["positions_per_second"], result["nodes"],
+                result["nodes_per_second"], result["hit_rate"] * 100))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"depth": args.depth, "positions": len(positions), "results": report}, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
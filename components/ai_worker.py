@@ -0,0 +1,97 @@
+# ai_worker.py - Contains the AIWorker class to run AI searches off the UI thread
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from connect4AI import SearchTimeout
+
+
+class AIWorker:
+    def __init__(self):
+        """
+        Initialize a background thread for AI searches.
+
+        The search runs on a thread rather than a process so the AIPlayer, and
+        the transposition table it keeps between moves, stays shared with the
+        game. The UI polls done() once a frame instead of waiting on the result.
+        """
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ai-search")
+        self._future = None
+        self._stop_event = None
+
+        # Background search on the opponent's time, started with ponder()
+        self._ponder_future = None
+        self._ponder_event = None
+
+    @property
+    def running(self):
+        """Whether a search has been started and its result not yet taken."""
+        return self._future is not None
+
+    @property
+    def pondering(self):
+        """Whether pondering has been started and not stopped, even if it has run out of work."""
+        return self._ponder_future is not None
+
+    def ponder(self, ai_player, position):
+        """
+        Start searching the AI's replies while the opponent thinks, stopping any other search.
+
+        Args:
+            ai_player: The AIPlayer that will move next
+            position: A BitBoard with the opponent to move, owned by the search
+        """
+        self.cancel()
+        self._ponder_event = threading.Event()
+        self._ponder_future = self._executor.submit(ai_player.ponder, position, self._ponder_event)
+
+    def stop_pondering(self):
+        """Stop pondering and wait for the thread to let go of the AIPlayer."""
+        if self._ponder_future is None:
+            return
+        self._ponder_event.set()
+        self._ponder_future.result()
+        self._ponder_future = None
+
+    def start(self, ai_player, board, position):
+        """
+        Start searching for the AI's move, stopping any search or pondering still running.
+
+        Args:
+            ai_player: The AIPlayer to move
+            board: The game board, which must not change until the search ends
+            position: A BitBoard of the board with the AI to move, owned by the search
+        """
+        self.cancel()
+        self._stop_event = threading.Event()
+        self._future = self._executor.submit(ai_player.get_move, board, position, self._stop_event)
+
+    def done(self):
+        """Check if the running search has finished."""
+        return self._future is not None and self._future.done()
+
+    def take_result(self):
+        """
+        Return the column chosen by a finished search.
+
+        Returns:
+            The column, or None if the AI had no move
+        """
+        future, self._future = self._future, None
+        return future.result()
+
+    def cancel(self):
+        """Stop the running search or pondering and wait for its thread to let go of the AIPlayer."""
+        self.stop_pondering()
+        if self._future is None:
+            return
+        self._stop_event.set()
+        try:
+            self._future.result()
+        except SearchTimeout:
+            pass
+        self._future = None
+
+    def close(self):
+        """Stop any search or pondering and shut the thread down."""
+        self.cancel()
+        self._executor.shutdown()
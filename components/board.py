@@ -1,73 +1,103 @@
 # board.py - Contains the Board class to manage the game board
 
 import numpy as np
-from utils.constants import ROW_COUNT, COLUMN_COUNT, EMPTY
+from utils.constants import EMPTY, ROW_COUNT, COLUMN_COUNT, WINDOW_LENGTH
+
+# Row and column steps for horizontal, vertical and both diagonal lines
+LINE_DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
 
 
 class Board:
-    def __init__(self):
-        """Initialize a new Connect 4 board 6x7"""
-        self.grid = np.zeros((ROW_COUNT, COLUMN_COUNT), dtype=int)
+    def __init__(self, rows=ROW_COUNT, columns=COLUMN_COUNT, connect=WINDOW_LENGTH):
+        """
+        Initialize a new Connect 4 board, 6x7 unless another size is given.
+
+        Args:
+            rows: Number of rows
+            columns: Number of columns
+            connect: Pieces in a row needed to win
+        """
+        self.rows = rows
+        self.columns = columns
+        self.connect = connect
+        self.grid = np.zeros((rows, columns), dtype=int)
+        self.heights = [0] * columns  # Pieces in each column
+        self.move_count = 0
 
     def is_valid_location(self, col):
         """Check if a column is valid for dropping a piece."""
-        return 0 <= col < COLUMN_COUNT and self.grid[ROW_COUNT - 1][col] == EMPTY
+        return 0 <= col < self.columns and self.heights[col] < self.rows
 
     def get_next_open_row(self, col):
         """Get the next open row in a column."""
-        for r in range(ROW_COUNT):
-            if self.grid[r][col] == EMPTY:
-                return r
-        return None
+        row = self.heights[col]
+        return row if row < self.rows else None
 
     def drop_piece(self, row, col, piece):
         """Drop a piece in the selected column."""
         self.grid[row][col] = piece
+        self.heights[col] = row + 1
+        self.move_count += 1
+
+    def remove_piece(self, col):
+        """Take the top piece back out of a column."""
+        row = self.heights[col] - 1
+        self.grid[row][col] = EMPTY
+        self.heights[col] = row
+        self.move_count -= 1
+
+    def is_winning_drop(self, row, col):
+        """Check if the piece at (row, col) completes a line through that cell."""
+        grid = self.grid
+        rows, columns = self.rows, self.columns
+        piece = grid[row, col]
+        for dr, dc in LINE_DIRECTIONS:
+            count = 1
+            for step in (1, -1):
+                r, c = row + step * dr, col + step * dc
+                while 0 <= r < rows and 0 <= c < columns and grid[r, c] == piece:
+                    count += 1
+                    r, c = r + step * dr, c + step * dc
+            if count >= self.connect:
+                return True
+        return False
 
     def is_winning_move(self, piece):
         """Check if the current player has won."""
+        rows, columns, length = self.rows, self.columns, self.connect
+
         # Check horizontal locations
-        for c in range(COLUMN_COUNT - 3):
-            for r in range(ROW_COUNT):
-                if (self.grid[r][c] == piece and
-                        self.grid[r][c + 1] == piece and
-                        self.grid[r][c + 2] == piece and
-                        self.grid[r][c + 3] == piece):
+        for c in range(columns - length + 1):
+            for r in range(rows):
+                if all(self.grid[r][c + i] == piece for i in range(length)):
                     return True
 
         # Check vertical locations
-        for c in range(COLUMN_COUNT):
-            for r in range(ROW_COUNT - 3):
-                if (self.grid[r][c] == piece and
-                        self.grid[r + 1][c] == piece and
-                        self.grid[r + 2][c] == piece and
-                        self.grid[r + 3][c] == piece):
+        for c in range(columns):
+            for r in range(rows - length + 1):
+                if all(self.grid[r + i][c] == piece for i in range(length)):
                     return True
 
         # Check positively sloped diagonals
-        for c in range(COLUMN_COUNT - 3):
-            for r in range(ROW_COUNT - 3):
-                if (self.grid[r][c] == piece and
-                        self.grid[r + 1][c + 1] == piece and
-                        self.grid[r + 2][c + 2] == piece and
-                        self.grid[r + 3][c + 3] == piece):
+        for c in range(columns - length + 1):
+            for r in range(rows - length + 1):
+                if all(self.grid[r + i][c + i] == piece for i in range(length)):
                     return True
 
         # Check negatively sloped diagonals
-        for c in range(COLUMN_COUNT - 3):
-            for r in range(3, ROW_COUNT):
-                if (self.grid[r][c] == piece and
-                        self.grid[r - 1][c + 1] == piece and
-                        self.grid[r - 2][c + 2] == piece and
-                        self.grid[r - 3][c + 3] == piece):
+        for c in range(columns - length + 1):
+            for r in range(length - 1, rows):
+                if all(self.grid[r - i][c + i] == piece for i in range(length)):
                     return True
 
         return False
 
     def is_full(self):
         """Check if the board is full (tie game)."""
-        return not any(EMPTY in row for row in self.grid)
+        return self.move_count == self.rows * self.columns
 
     def reset(self):
         """Reset the board to an empty state."""
-        self.grid = np.zeros((ROW_COUNT, COLUMN_COUNT), dtype=int)
\ No newline at end of file
+        self.grid = np.zeros((self.rows, self.columns), dtype=int)
+        self.heights = [0] * self.columns
+        self.move_count = 0
\ No newline at end of file
@@ -1,29 +1,63 @@
 # game_state.py - Contains the GameState class to manage game logic
 
 from utils.constants import PLAYING, PLAYER_1_WIN, PLAYER_2_WIN, TIE, PLAYER_1, PLAYER_2
+from utils.constants import ROW_COUNT, COLUMN_COUNT, WINDOW_LENGTH
 from .board import Board
+from .ai_worker import AIWorker
 from connect4AI import AIPlayer
+from engine.bitboard import BitBoard
+from engine.geometry import get_geometry
+
+# Characters used for columns 0-35 in move strings, e.g. "3324" for a 6x7 board
+MOVE_CHARS = "0123456789abcdefghijklmnopqrstuvwxyz"
 
 
 class GameState:
-    def __init__(self, game_mode="pvp", ai_difficulty=2):
+    def __init__(self, game_mode="pvp", ai_difficulty=2, rows=ROW_COUNT, columns=COLUMN_COUNT,
+                 connect=WINDOW_LENGTH, ai_options=None):
         """
         Initialize the game state.
 
         Args:
             game_mode: "pvp" for player vs player, "pvc" for player vs computer
-            ai_difficulty: The AI difficulty level (1-3)
+            ai_difficulty: The AI difficulty level (1-4)
+            rows: Number of board rows
+            columns: Number of board columns
+            connect: Pieces in a row needed to win
+            ai_options: Optional extra AIPlayer keyword arguments, e.g. tt_size_mb
+
+        Raises:
+            ValueError: If the board has more columns than MOVE_CHARS can name
         """
-        self.board = Board()
+        if columns > len(MOVE_CHARS):
+            raise ValueError("move strings name at most %d columns, not %d" % (len(MOVE_CHARS), columns))
+        self.board = Board(rows, columns, connect)
         self.current_player = PLAYER_1
         self.status = PLAYING
         self.game_over = False
         self.game_mode = game_mode
+        self.ai_options = dict(ai_options or {})
+
+        # Columns played so far, and columns taken back that redo() can replay
+        self.history = []
+        self.redo_stack = []
+
+        # Bitboard kept in step with the board, so the AI does not rebuild it from the grid
+        self.position = BitBoard(get_geometry(rows, columns, connect))
 
         # Initialize AI if in PvC mode
         self.ai_player = None
         if game_mode == "pvc":
-            self.ai_player = AIPlayer(player_piece=PLAYER_2, difficulty=ai_difficulty)
+            self.ai_player = self._create_ai(ai_difficulty)
+
+        # Background thread for AI moves started with start_ai_move
+        self.ai_worker = AIWorker()
+
+    def _create_ai(self, difficulty):
+        """Create an AI player for the current board size."""
+        return AIPlayer(player_piece=PLAYER_2, difficulty=difficulty,
+                        rows=self.board.rows, columns=self.board.columns, connect=self.board.connect,
+                        **self.ai_options)
 
     def switch_player(self):
         """Switch the current player."""
@@ -31,6 +65,13 @@ class GameState:
 
     def make_move(self, col):
         """Process a player's move."""
+        if self._play(col):
+            self.redo_stack.clear()
+            return True
+        return False
+
+    def _play(self, col):
+        """Drop a piece for the current player and update the game status."""
         if self.game_over:
             return False
 
@@ -38,9 +79,11 @@ class GameState:
             row = self.board.get_next_open_row(col)
             if row is not None:
                 self.board.drop_piece(row, col, self.current_player)
+                self.position.play(col)
+                self.history.append(col)
 
-                # Check for win
-                if self.board.is_winning_move(self.current_player):
+                # Check for win through the piece just dropped
+                if self.board.is_winning_drop(row, col):
                     self.status = PLAYER_1_WIN if self.current_player == PLAYER_1 else PLAYER_2_WIN
                     self.game_over = True
                 # Check for tie
@@ -53,14 +96,143 @@ class GameState:
                 return True
         return False
 
+    def undo(self):
+        """
+        Take back the last move, stopping any AI search first.
+
+        Returns:
+            True if a move was taken back, False if no moves have been played
+        """
+        self.cancel_ai_move()
+        if not self.history:
+            return False
+
+        col = self.history.pop()
+        self.current_player = int(self.board.grid[self.board.heights[col] - 1][col])
+        self.board.remove_piece(col)
+        self.position.undo(col)
+        self.status = PLAYING
+        self.game_over = False
+        self.redo_stack.append(col)
+        return True
+
+    def redo(self):
+        """
+        Replay the last move taken back by undo.
+
+        Returns:
+            True if a move was replayed, False if there is nothing to redo
+        """
+        if not self.redo_stack or self.ai_thinking:
+            return False
+        return self._play(self.redo_stack.pop())
+
+    def get_moves(self):
+        """Return the moves played so far as a string of column characters, e.g. "3324"."""
+        return "".join(MOVE_CHARS[col] for col in self.history)
+
+    def load_moves(self, moves):
+        """
+        Replace the current game with the moves in a string of column characters.
+
+        The AI player is kept, so its cached search results stay available.
+
+        Args:
+            moves: A string like the one returned by get_moves
+
+        Raises:
+            ValueError: If a character is not a column, a column is full, or a
+                move follows the end of the game
+        """
+        self._reset_board()
+        for i, char in enumerate(moves):
+            col = MOVE_CHARS.find(char.lower())
+            if col < 0 or not self._play(col):
+                self._reset_board()
+                raise ValueError("illegal move %r at position %d in %r" % (char, i, moves))
+
+    def _reset_board(self):
+        """Clear the board, the move history and the game status."""
+        self.cancel_ai_move()
+        self.board.reset()
+        self.position = BitBoard(self.position.geometry)
+        self.history = []
+        self.redo_stack = []
+        self.current_player = PLAYER_1
+        self.status = PLAYING
+        self.game_over = False
+
+    def is_ai_turn(self):
+        """Check if the AI player is to move."""
+        return self.game_mode == "pvc" and self.current_player == PLAYER_2 and not self.game_over
+
     def make_ai_move(self):
-        """Make a move as the AI player."""
-        if self.game_mode == "pvc" and self.current_player == PLAYER_2 and not self.game_over:
-            col = self.ai_player.get_move(self.board)
+        """Make a move as the AI player, waiting for the search to finish."""
+        if self.is_ai_turn() and not self.ai_thinking:
+            self.stop_pondering()
+            col = self.ai_player.get_move(self.board, self.position)
             if col is not None:
                 return self.make_move(col)
         return False
 
+    @property
+    def ai_thinking(self):
+        """Whether an AI move started with start_ai_move is still being searched."""
+        return self.ai_worker.running
+
+    def start_ai_move(self):
+        """
+        Start searching for the AI's move on a background thread.
+
+        Returns:
+            True if a search was started
+        """
+        if not self.is_ai_turn() or self.ai_thinking:
+            return False
+        self.ai_worker.start(self.ai_player, self.board, self.position.copy())
+        return True
+
+    def poll_ai_move(self):
+        """
+        Play the AI's move if its background search has finished.
+
+        Returns:
+            True if the move was played
+        """
+        if not self.ai_worker.done():
+            return False
+        col = self.ai_worker.take_result()
+        return col is not None and self.make_move(col)
+
+    def cancel_ai_move(self):
+        """Stop a background AI search or pondering and discard its move."""
+        self.ai_worker.cancel()
+
+    @property
+    def pondering(self):
+        """Whether the AI has been set pondering on the human player's time."""
+        return self.ai_worker.pondering
+
+    def start_pondering(self):
+        """
+        Let the AI search its replies in the background while the human player thinks.
+
+        The AI keeps what it finds, so once the human moves its reply is often
+        ready at once. Pondering stops when the AI's move starts, or on undo,
+        restart and close.
+
+        Returns:
+            True if pondering was started
+        """
+        if self.game_mode != "pvc" or self.game_over or self.is_ai_turn() or self.ai_thinking or self.pondering:
+            return False
+        self.ai_worker.ponder(self.ai_player, self.position.copy())
+        return True
+
+    def stop_pondering(self):
+        """Stop pondering, keeping whatever the AI has found so far."""
+        self.ai_worker.stop_pondering()
+
     def restart_game(self, game_mode=None, ai_difficulty=None):
         """
         Reset the game to start a new round.
@@ -69,23 +241,29 @@ class GameState:
             game_mode: Optional new game mode
             ai_difficulty: Optional new AI difficulty level
         """
-        self.board.reset()
-        self.current_player = PLAYER_1
-        self.status = PLAYING
-        self.game_over = False
+        self._reset_board()
 
         # Update game mode and AI if specified
         if game_mode is not None:
             self.game_mode = game_mode
 
+        if self.ai_player is not None:
+            self.ai_player.close()
+
         if self.game_mode == "pvc":
             difficulty = ai_difficulty if ai_difficulty is not None else (
                 self.ai_player.difficulty if self.ai_player else 2
             )
-            self.ai_player = AIPlayer(player_piece=PLAYER_2, difficulty=difficulty)
+            self.ai_player = self._create_ai(difficulty)
         else:
             self.ai_player = None
 
+    def close(self):
+        """Stop the AI's background thread and any processes or files it holds."""
+        self.ai_worker.close()
+        if self.ai_player is not None:
+            self.ai_player.close()
+
     def get_board_grid(self):
         """Return the current board grid."""
-        return self.board.grid
\ No newline at end of file
+        return self.board.grid
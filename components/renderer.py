@@ -1,68 +1,155 @@
 # renderer.py - Contains the Renderer class to handle all UI rendering
 
+import numpy as np
 import pygame
 
-from utils.constants import BLUE, BLACK, RED, YELLOW, PLAYER_1, PLAYER_2
+from utils.constants import BLUE, BLACK, RED, YELLOW, PLAYER_1, PLAYER_2, EMPTY
 from utils.constants import PLAYER_1_WIN, PLAYER_2_WIN, TIE
-from utils.constants import WIDTH, HEIGHT, SQUARE_SIZE, RADIUS
+from utils.constants import SQUARE_SIZE, RADIUS
+
+# Color that is left out when blitting the board overlay and piece sprites
+TRANSPARENT = (255, 0, 255)
+
+# Bottom-of-screen label slots, as (left offset from its edge, width)
+TURN_SLOT_WIDTH = 270
+DIFFICULTY_SLOT = (10, 150)
 
 
 class Renderer:
     def __init__(self, screen):
-        """Initialize the renderer with the pygame screen."""
+        """
+        Initialize the renderer with the pygame screen.
+
+        Drawing methods only draw to the screen surface and record the
+        rectangles they changed. Call flush() once per frame to push just those
+        rectangles to the display.
+        """
         self.screen = screen
+        self.width, self.height = screen.get_size()
         self.font = pygame.font.SysFont("monospace", 75)
         self.small_font = pygame.font.SysFont("monospace", 30)
 
+        self._dirty = []
+        self._labels = {}
+        self._drawn_grid = None
+
+        # Status labels shown over the bottom row, by slot name: (rect, text surface, text position)
+        self._slots = {}
+
+        # The blue board with see-through holes, drawn over the pieces
+        rows = self.height // SQUARE_SIZE - 1
+        columns = self.width // SQUARE_SIZE
+        self.board_overlay = pygame.Surface((columns * SQUARE_SIZE, rows * SQUARE_SIZE))
+        self.board_overlay.fill(BLUE)
+        for c in range(columns):
+            for r in range(rows):
+                pygame.draw.circle(self.board_overlay, TRANSPARENT,
+                                   (c * SQUARE_SIZE + SQUARE_SIZE // 2, r * SQUARE_SIZE + SQUARE_SIZE // 2), RADIUS)
+        self.board_overlay.set_colorkey(TRANSPARENT)
+
+        # One square sprite per piece color
+        self.piece_sprites = {}
+        for piece, color in ((PLAYER_1, RED), (PLAYER_2, YELLOW)):
+            sprite = pygame.Surface((SQUARE_SIZE, SQUARE_SIZE))
+            sprite.fill(TRANSPARENT)
+            pygame.draw.circle(sprite, color, (SQUARE_SIZE // 2, SQUARE_SIZE // 2), RADIUS)
+            sprite.set_colorkey(TRANSPARENT)
+            self.piece_sprites[piece] = sprite
+
+        # Render every fixed label up front
+        for text, color in (("Player 1 wins!!", RED), ("Player 2 wins!!", YELLOW), ("It's a tie!!", BLUE)):
+            self._label(text, color, self.font)
+        for text, color in (("Player 1's Turn", RED), ("Player 2's Turn", YELLOW), ("AI's Turn", YELLOW),
+                            ("AI: Easy", BLUE), ("AI: Medium", BLUE), ("AI: Hard", BLUE), ("AI: Perfect", BLUE)):
+            self._label(text, color, self.small_font)
+        for dots in range(4):
+            self._label("AI thinking" + "." * dots, YELLOW, self.small_font)
+
+    def _label(self, text, color, font):
+        """Return a rendered text surface, rendering it only the first time."""
+        key = (text, color, font)
+        label = self._labels.get(key)
+        if label is None:
+            label = self._labels[key] = font.render(text, 1, color)
+        return label
+
+    def _mark(self, rect):
+        """Record a changed screen rectangle for the next flush."""
+        self._dirty.append(pygame.Rect(rect))
+
+    def flush(self):
+        """Push every rectangle changed since the last flush to the display."""
+        if self._dirty:
+            pygame.display.update(self._dirty)
+            self._dirty = []
+
+    def invalidate(self):
+        """Forget what is on screen, e.g. after the menu drew over it, so the next draw_board redraws everything."""
+        self._drawn_grid = None
+        self._slots = {}
+        self.screen.fill(BLACK)
+        self._mark(self.screen.get_rect())
+
     def draw_board(self, board_grid):
-        """Draw the game board based on the current board state."""
-        # Draw the blue board background
-        for c in range(len(board_grid[0])):
-            for r in range(len(board_grid)):
-                pygame.draw.rect(self.screen, BLUE, (c * SQUARE_SIZE, (r + 1) * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
-                pygame.draw.circle(self.screen, BLACK,
-                                   (int(c * SQUARE_SIZE + SQUARE_SIZE / 2),
-                                    int((r + 1) * SQUARE_SIZE + SQUARE_SIZE / 2)), RADIUS)
-
-        # Draw the pieces
-        for c in range(len(board_grid[0])):
-            for r in range(len(board_grid)):
-                if board_grid[r][c] == PLAYER_1:
-                    pygame.draw.circle(self.screen, RED,
-                                       (int(c * SQUARE_SIZE + SQUARE_SIZE / 2),
-                                        HEIGHT - int(r * SQUARE_SIZE + SQUARE_SIZE / 2)), RADIUS)
-                elif board_grid[r][c] == PLAYER_2:
-                    pygame.draw.circle(self.screen, YELLOW,
-                                       (int(c * SQUARE_SIZE + SQUARE_SIZE / 2),
-                                        HEIGHT - int(r * SQUARE_SIZE + SQUARE_SIZE / 2)), RADIUS)
-
-        pygame.display.update()
+        """Draw the game board, redrawing only the cells that changed since the last call."""
+        rows = len(board_grid)
+        if self._drawn_grid is None or self._drawn_grid.shape != np.shape(board_grid):
+            changed = [(r, c) for r in range(rows) for c in range(len(board_grid[0]))]
+        else:
+            changed = np.argwhere(self._drawn_grid != board_grid)
+        self._drawn_grid = np.array(board_grid)
+
+        redrawn = []
+        for r, c in changed:
+            # Row 0 is the bottom of the board, one square above the bottom of the screen
+            cell = pygame.Rect(c * SQUARE_SIZE, self.height - (r + 1) * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
+            self.screen.fill(BLACK, cell)
+            piece = board_grid[r][c]
+            if piece != EMPTY:
+                self.screen.blit(self.piece_sprites[piece], cell)
+            self.screen.blit(self.board_overlay, cell, cell.move(0, -SQUARE_SIZE))
+            redrawn.append(cell)
+            self._mark(cell)
+
+        # Status labels sit over the bottom row, so put back any the cells covered
+        for rect, label, position in self._slots.values():
+            if rect.collidelist(redrawn) != -1:
+                self.screen.fill(BLACK, rect)
+                self.screen.blit(label, position)
+                self._mark(rect)
 
     def draw_piece_preview(self, x_pos, current_player):
         """Draw a preview of the piece at the top of the screen."""
-        pygame.draw.rect(self.screen, BLACK, (0, 0, WIDTH, SQUARE_SIZE))
-        color = RED if current_player == PLAYER_1 else YELLOW
-        pygame.draw.circle(self.screen, color, (x_pos, int(SQUARE_SIZE / 2)), RADIUS)
-        pygame.display.update()
+        self.clear_top_row()
+        sprite = self.piece_sprites[PLAYER_1 if current_player == PLAYER_1 else PLAYER_2]
+        self.screen.blit(sprite, (x_pos - SQUARE_SIZE // 2, 0))
 
     def clear_top_row(self):
         """Clear the top row where piece previews are shown."""
-        pygame.draw.rect(self.screen, BLACK, (0, 0, WIDTH, SQUARE_SIZE))
-        pygame.display.update()
+        top_row = (0, 0, self.width, SQUARE_SIZE)
+        self.screen.fill(BLACK, top_row)
+        self._mark(top_row)
 
     def draw_game_over_message(self, game_status):
         """Draw game over message based on the game status."""
         if game_status == PLAYER_1_WIN:
-            label = self.font.render("Player 1 wins!!", 1, RED)
+            label = self._label("Player 1 wins!!", RED, self.font)
         elif game_status == PLAYER_2_WIN:
-            label = self.font.render("Player 2 wins!!", 1, YELLOW)
+            label = self._label("Player 2 wins!!", YELLOW, self.font)
         elif game_status == TIE:
-            label = self.font.render("It's a tie!!", 1, BLUE)
+            label = self._label("It's a tie!!", BLUE, self.font)
         else:
             return
 
-        self.screen.blit(label, (40, 10))
-        pygame.display.update()
+        self._mark(self.screen.blit(label, (40, 10)))
+
+    def _draw_slot(self, name, rect, label, position):
+        """Draw a status label in its slot at the bottom of the screen and remember it."""
+        rect = pygame.Rect(rect)
+        self._slots[name] = (rect, label, position)
+        self.screen.fill(BLACK, rect)
+        self.screen.blit(label, position)
+        self._mark(rect)
 
     def draw_player_turn_indicator(self, current_player, is_ai=False):
         """
@@ -80,18 +167,27 @@ class Renderer:
             player_text = "Player 1" if current_player == PLAYER_1 else "Player 2"
             player_text += "'s Turn"
 
-        # Draw at the bottom of the screen
-        label = self.small_font.render(player_text, 1, color)
-        pygame.draw.rect(self.screen, BLACK, (WIDTH - 200, HEIGHT - 40, 200, 40))
-        self.screen.blit(label, (WIDTH - 190, HEIGHT - 35))
-        pygame.display.update()
+        # Draw at the bottom of the screen, over any "AI thinking" text
+        self._draw_slot("turn", (self.width - TURN_SLOT_WIDTH, self.height - 40, TURN_SLOT_WIDTH, 40),
+                        self._label(player_text, color, self.small_font), (self.width - 190, self.height - 35))
+
+    def draw_ai_thinking_indicator(self, dots=0):
+        """
+        Draw an indicator showing that the AI is searching for its move.
+
+        Args:
+            dots: Number of trailing dots (0-3), stepped by the caller to animate it
+        """
+        self._draw_slot("turn", (self.width - TURN_SLOT_WIDTH, self.height - 40, TURN_SLOT_WIDTH, 40),
+                        self._label("AI thinking" + "." * dots, YELLOW, self.small_font),
+                        (self.width - 260, self.height - 35))
 
     def draw_difficulty_indicator(self, difficulty):
         """
         Draw the current AI difficulty level.
 
         Args:
-            difficulty: The AI difficulty level (1-3)
+            difficulty: The AI difficulty level (1-4)
         """
         if difficulty is None:
             return
@@ -101,10 +197,11 @@ class Renderer:
             difficulty_text += "Easy"
         elif difficulty == 2:
             difficulty_text += "Medium"
+        elif difficulty == 4:
+            difficulty_text += "Perfect"
         else:
             difficulty_text += "Hard"
 
-        label = self.small_font.render(difficulty_text, 1, BLUE)
-        pygame.draw.rect(self.screen, BLACK, (10, HEIGHT - 40, 150, 40))
-        self.screen.blit(label, (20, HEIGHT - 35))
-        pygame.display.update()
+        left, width = DIFFICULTY_SLOT
+        self._draw_slot("difficulty", (left, self.height - 40, width, 40),
+                        self._label(difficulty_text, BLUE, self.small_font), (20, self.height - 35))
@@ -2,24 +2,134 @@
 
 import numpy as np
 import random
-from utils.constants import EMPTY, PLAYER_1, PLAYER_2, COLUMN_COUNT, ROW_COUNT
+import time
+from utils.constants import EMPTY, PLAYER_1, PLAYER_2, COLUMN_COUNT, ROW_COUNT, WINDOW_LENGTH
+from utils.constants import WIN_SCORE, CENTER_WEIGHT
+from engine.geometry import get_geometry
+from engine.bitboard import BitBoard
+from engine.evaluation import IncrementalEvaluator, window_score
+from engine.batch import score_boards
+from engine.transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND, NO_MOVE
+from engine.shared_transposition import SharedTranspositionTable
+from engine.ordering import MoveOrderer
+from engine.parallel import ParallelRootSearch
+from engine.opening_book import OpeningBook
+from engine.position_store import PositionStore
+from engine.solver import Solver, SearchTimeout, WIN, DRAW, LOSS, describe
+from engine.stats import SearchStats, SearchProgress, ColumnAnalysis, ROOT_MOVE, ITERATION
+from engine.mcts import MCTS
+
+# Iterations per move of the MCTS engine at each difficulty (Perfect uses its time budget)
+MCTS_ITERATIONS = {1: 50, 2: 200, 3: 1000}
+
+# Pondering with MCTS runs this many normal searches' worth of iterations at most
+PONDER_MULTIPLE = 7
+
+# Share of a time budget the endgame solver may use before the search falls back to iterative deepening
+SOLVER_BUDGET_SHARE = 0.5
 
 
 class AIPlayer:
-    def __init__(self, player_piece=PLAYER_2, difficulty=2):
+    def __init__(self, player_piece=PLAYER_2, difficulty=2, tt_size_mb=8, time_budget_ms=None,
+                 move_ordering=True, workers=1, book_path=None, solver_threshold=None,
+                 rows=ROW_COUNT, columns=COLUMN_COUNT, connect=WINDOW_LENGTH, stats=False, callback=None,
+                 engine="minimax", mcts_iterations=None, shared_tt=None,
+                 store_path=None):
         """
         Initialize the AI player.
 
         Args:
             player_piece: The piece representing the AI (default: PLAYER_2)
-            difficulty: The difficulty level (1-3)
+            difficulty: The difficulty level (1-4)
                 1 = Easy (depth 1, with randomness)
                 2 = Medium (depth 3)
                 3 = Hard (depth 5)
+                4 = Perfect (1 second iterative deepening, exact play with 22 or fewer
+                    empty cells when the solver finishes in half the budget)
+            tt_size_mb: Memory budget of the transposition table, kept across moves
+            time_budget_ms: If set, search with iterative deepening until this many
+                milliseconds have passed instead of to a fixed depth
+            move_ordering: Whether to sort moves with the hash move, killer and
+                history heuristics instead of searching columns left to right
+            workers: Number of processes to spread fixed-depth root moves across
+            book_path: Optional opening book file built by tools/build_book.py
+            solver_threshold: If set, play exactly with the endgame solver once
+                no more than this many empty cells remain. With a time budget the
+                solver gets SOLVER_BUDGET_SHARE of it, and iterative deepening
+                the rest if the solver runs out of time.
+            rows: Number of board rows
+            columns: Number of board columns
+            connect: Pieces in a row needed to win
+            stats: Whether to collect SearchStats for each search in self.stats
+            callback: Optional function called with a SearchProgress after each
+                root move and each completed depth, on the searching thread
+            engine: "minimax" for the alpha-beta search, or "mcts" for Monte
+                Carlo tree search, which keeps its tree between moves
+            mcts_iterations: Iterations per move for the MCTS engine (default:
+                set by the difficulty); the time budget also applies if set
+            shared_tt: True to keep the transposition table in shared memory,
+                where worker processes and other AIPlayers playing the same
+                piece can attach to it by its name (self.tt.name), or the name
+                of such a table to attach to instead of building a private one
+            store_path: Optional PositionStore file. Positions found there are
+                played without a search if they were solved, or, for a
+                fixed-depth search outside the solver threshold, searched at
+                least as deep before; new results are added to it.
         """
         self.player_piece = player_piece
         self.opponent_piece = PLAYER_1 if player_piece == PLAYER_2 else PLAYER_2
         self.difficulty = difficulty
+        self.geometry = get_geometry(rows, columns, connect)
+        if shared_tt is True:
+            self.tt = SharedTranspositionTable(tt_size_mb, self.geometry.key_bits)
+        elif shared_tt:
+            self.tt = SharedTranspositionTable(key_bits=self.geometry.key_bits, name=shared_tt)
+        else:
+            self.tt = TranspositionTable(tt_size_mb, self.geometry.key_bits)
+        self.tt_size_mb = tt_size_mb
+        self.time_budget_ms = time_budget_ms
+        self.move_ordering = move_ordering
+        self.orderer = MoveOrderer(self.geometry) if move_ordering else None
+        self._pv_first_orders = pv_first_orders(columns)
+        self.book = OpeningBook(book_path) if book_path else None
+        if self.book is not None and self.book.geometry is not self.geometry:
+            self.book.close()
+            raise ValueError("%s was built for %r, not %r" % (book_path, self.book.geometry, self.geometry))
+        self.store = PositionStore(store_path, self.geometry) if store_path else None
+        self.last_search_depth = None
+        self.last_search_nodes = 0
+        self.last_solution = None
+
+        # Optional instrumentation, off by default. Setting self.stats to a
+        # SearchStats later turns it on for the next search.
+        self.stats = SearchStats(self.geometry.cells) if stats else None
+        self.callback = callback
+
+        # Root moves go to a process pool when more than one worker is requested
+        self.workers = workers
+        self._parallel = None
+        if workers > 1:
+            self._parallel = ParallelRootSearch(workers, {
+                "player_piece": player_piece, "difficulty": difficulty,
+                "tt_size_mb": tt_size_mb, "move_ordering": move_ordering,
+                "rows": rows, "columns": columns, "connect": connect,
+                "shared_tt": self.tt.name if shared_tt else None,
+            })
+
+        # Search state for iterative deepening and for stopping a search early
+        self._deadline = None
+        self._stop_event = None
+        self._nodes = 0
+        self._root_moves = 0
+        self._search_start = None
+        self._pv_moves = {}
+        self._evaluator = None
+
+        # Table for analyzing positions with the opponent to move, made on first use
+        self._analysis_tt = None
+
+        # Replies found while pondering, by position key: ((column, score), depth, nodes)
+        self._ponder_results = {}
 
         # Set the search depth based on difficulty
         if difficulty == 1:  # Easy
@@ -30,131 +140,580 @@ class AIPlayer:
             self.depth = 3
             self.randomness = 0.0
 
+        elif difficulty == 4:  # Perfect
+            self.depth = 5
+            self.randomness = 0.0
+            if self.time_budget_ms is None:
+                self.time_budget_ms = 1000
+            if solver_threshold is None:
+                solver_threshold = 22
+
         else:  # Hard
             self.depth = 5
             self.randomness = 0.0
 
-    def get_move(self, board):
+        # Exact endgame play once few enough empty cells remain
+        self.solver_threshold = solver_threshold
+        self.solver = Solver(geometry=self.geometry) if solver_threshold is not None else None
+
+        # Monte Carlo tree search instead of minimax, if chosen
+        if engine not in ("minimax", "mcts"):
+            raise ValueError("unknown engine %r" % engine)
+        self.engine = engine
+        self.mcts = None
+        if engine == "mcts":
+            self.mcts = MCTS(self.geometry)
+            if mcts_iterations is None and self.time_budget_ms is None:
+                mcts_iterations = MCTS_ITERATIONS.get(difficulty, MCTS_ITERATIONS[3])
+        self.mcts_iterations = mcts_iterations
+
+    def get_move(self, board, position=None, stop_event=None):
         """
         Get the best move for the AI player.
         Args:
             board: The game board instance
+            position: Optional BitBoard of the same board with the AI to move,
+                used instead of converting the grid
+            stop_event: Optional threading.Event that abandons the search when set
         Returns:
             The column to place the piece
         """
         # Sometimes make a random move (for easier difficulties)
         if random.random() < self.randomness:
-            valid_columns = [col for col in range(COLUMN_COUNT) if board.is_valid_location(col)]
+            valid_columns = [col for col in range(self.geometry.columns) if board.is_valid_location(col)]
             if valid_columns:
                 return random.choice(valid_columns)
 
-        # Get the best move using minimax
-        board_copy = np.copy(board.grid)
-        valid_locations = [col for col in range(COLUMN_COUNT) if board.is_valid_location(col)]
+        # Get the best move using minimax on a bitboard copy of the grid
+        if position is None:
+            position = BitBoard.from_grid(board.grid, self.player_piece, self.geometry)
+
+        # Opening positions are looked up instead of searched
+        if self.book is not None:
+            entry = self.book.lookup(position)
+            if entry is not None:
+                return entry[0]
+
+        # So is a reply already found while pondering on the opponent's time
+        pondered = self._ponder_results.get(position.key())
+        self._ponder_results = {}
+        if pondered is not None:
+            (best_col, _), self.last_search_depth, self.last_search_nodes = pondered
+            return best_col
+
+        best_col, _ = self.search(position, stop_event)
+        return best_col
+
+    def search(self, position, stop_event=None):
+        """
+        Search a position with the AI to move.
+        Args:
+            position: The BitBoard to search, left unchanged
+            stop_event: Optional threading.Event, checked every thousand or so
+                nodes. Once it is set the search raises SearchTimeout, or returns
+                early with an unfinished result, and the caller should discard it.
+        Returns:
+            Tuple of (best column, score), or (None, None) if no move is possible
+        """
+        valid_locations = [col for col in range(self.geometry.columns) if position.can_play(col)]
 
         if not valid_locations:
+            return None, None
+
+        self.last_solution = None
+        if self.stats is not None:
+            self.stats.reset()
+        if self.store is not None:
+            stored = self._lookup_stored(position, valid_locations)
+            if stored is not None:
+                return stored
+        deadline = None
+        if self.time_budget_ms is not None:
+            deadline = time.perf_counter() + self.time_budget_ms / 1000.0
+        if self.solver is not None and self.geometry.cells - position.moves <= self.solver_threshold:
+            # Variants the solver cannot finish in time, e.g. connect 5, are searched heuristically instead
+            solver_deadline = None
+            if deadline is not None:
+                solver_deadline = deadline - self.time_budget_ms / 1000.0 * (1 - SOLVER_BUDGET_SHARE)
+            try:
+                return self._solve(position, stop_event, solver_deadline)
+            except SearchTimeout:
+                if solver_deadline is None or (stop_event is not None and stop_event.is_set()):
+                    raise
+                self.last_solution = None
+        if self.mcts is not None:
+            return self._search_mcts(position, stop_event)
+
+        position = position.copy()
+        self._begin_search(position)
+        if self.orderer is not None:
+            valid_locations = [col for col in self.geometry.center_order if position.can_play(col)]
+
+        self._stop_event = stop_event
+        try:
+            if self.time_budget_ms is not None:
+                best_col, best_score = self._iterative_deepening(position, valid_locations, deadline)
+            else:
+                best_col, best_score = self._search_root(position, valid_locations, self.depth)
+                self.last_search_depth = self.depth
+                if self.stats is not None or self.callback is not None:
+                    pv = list(self._principal_variation(position, best_col, self.depth).values())
+                    self._report(SearchProgress(ITERATION, self.depth, best_col, best_score, self._nodes,
+                                                time.perf_counter() - self._search_start, pv))
+        finally:
+            self._stop_event = None
+
+        self.last_search_nodes = self._nodes
+        if self.stats is not None:
+            self.stats.nodes = self._nodes
+            self.stats.seconds = self.stats.elapsed()
+        if self.store is not None and not (stop_event is not None and stop_event.is_set()):
+            outcome = WIN if best_score >= WIN_SCORE else LOSS if best_score <= -WIN_SCORE else None
+            self.store.put(position, best_col, best_score, self.last_search_depth, outcome)
+        return best_col, best_score
+
+    def _lookup_stored(self, position, valid_locations):
+        """
+        Look up a position in the position store.
+        Args:
+            position: The BitBoard with the AI to move
+            valid_locations: The valid columns
+        Returns:
+            Tuple of (best column, score) if a stored result can stand in for this
+            player's search, otherwise None
+        """
+        entry = self.store.lookup(position)
+        if entry is None:
             return None
+        col, score, depth, outcome, _ = entry
+        if outcome is None:
+            # A heuristic result only stands in for a fixed-depth search at least as deep, not for the solver
+            if self.mcts is not None or self.time_budget_ms is not None or depth < self.depth:
+                return None
+            if self.solver is not None and self.geometry.cells - position.moves <= self.solver_threshold:
+                return None
+        if col not in valid_locations:
+            return None
+        self.last_search_depth = depth
+        self.last_search_nodes = 0
+        return col, score
 
-        best_score = -float('inf')
-        best_col = random.choice(valid_locations)
+    def _solve(self, position, stop_event=None, deadline=None):
+        """
+        Play a position exactly with the endgame solver.
+        Args:
+            position: The BitBoard with the AI to move
+            stop_event: Optional threading.Event that makes the solver raise SearchTimeout
+            deadline: Optional time.perf_counter() value at which the solver gives up
+        Returns:
+            Tuple of (best column, score), with wins and losses scored as +/- WIN_SCORE
+        """
+        solution = self.last_solution = self.solver.solve(position, stop_event, deadline)
+        self.last_search_depth = self.geometry.cells - position.moves
+        self.last_search_nodes = self.solver.nodes
+        if solution.outcome == WIN:
+            score = WIN_SCORE
+        elif solution.outcome == LOSS:
+            score = -WIN_SCORE
+        else:
+            score = 0
+
+        if self.stats is not None or self.callback is not None:
+            seconds = self.stats.elapsed() if self.stats is not None else None
+            self._report(SearchProgress(ITERATION, self.last_search_depth, solution.column, score,
+                                        self.solver.nodes, seconds, [solution.column]))
+        if self.stats is not None:
+            self.stats.solved = True
+            self.stats.nodes = self.solver.nodes
+            self.stats.seconds = self.stats.elapsed()
+        if self.store is not None:
+            self.store.put(position, solution.column, score, self.last_search_depth, solution.outcome, solution.plies)
+        return solution.column, score
+
+    def analyze(self, position, depth=None, stop_event=None):
+        """
+        Score every legal move of a position in one search.
+        Args:
+            position: The BitBoard to analyze, left unchanged
+            depth: Moves to search after each move (default: the difficulty's
+                depth, or as deep as the time budget allows if one is set)
+            stop_event: Optional threading.Event that ends the analysis early
+        Returns:
+            List of ColumnAnalysis for the side to move, in column order, from
+            the deepest completed depth; empty if no move is possible
+        """
+        result = []
+        for _, result in self.analyze_iter(position, depth, stop_event):
+            pass
+        return result
 
-        # Try each valid column and choose the best one
-        for col in valid_locations:
-            row = board.get_next_open_row(col)
-            temp_board = np.copy(board_copy)
-            self._drop_piece(temp_board, row, col, self.player_piece)
+    def analyze_iter(self, position, depth=None, stop_event=None):
+        """
+        Score every legal move one depth at a time, yielding after each depth.
+
+        Every move is searched with a full window, so its score is exact
+        rather than a bound, and all of them share the transposition table.
+        The table's scores are from the side of the player to move at the
+        root, so positions with the opponent to move are analyzed on a second
+        table, kept apart from the one that get_move uses.
+        Positions within the solver threshold are solved exactly in a single
+        step, unless a timed analysis runs out of the solver's share of the
+        budget first. The analysis always uses minimax, whichever engine plays moves,
+        and should be finished or closed before the player searches again.
+        Args:
+            position: The BitBoard to analyze, left unchanged
+            depth: The deepest depth to search (default: as for analyze)
+            stop_event: Optional threading.Event that ends the analysis early
+        Yields:
+            Tuples of (depth, list of ColumnAnalysis in column order)
+        """
+        columns = [col for col in self.geometry.center_order if position.can_play(col)]
+        if not columns or position.last_move_won():
+            return
+
+        empty = self.geometry.cells - position.moves
+        timed = depth is None and self.time_budget_ms is not None
+        deadline = time.perf_counter() + self.time_budget_ms / 1000.0 if timed else None
+        if self.solver is not None and empty <= self.solver_threshold:
+            solver_deadline = None
+            if timed:
+                solver_deadline = deadline - self.time_budget_ms / 1000.0 * (1 - SOLVER_BUDGET_SHARE)
+            try:
+                results = [self._solve_column(position, col, stop_event, solver_deadline)
+                           for col in sorted(columns)]
+            except SearchTimeout:
+                if solver_deadline is None or (stop_event is not None and stop_event.is_set()):
+                    return
+            else:
+                yield empty, results
+                return
+
+        if depth is None:
+            depth = empty - 1 if timed else self.depth
+        depth = min(depth, empty - 1)
+
+        position = position.copy()
+        own_table = self.tt
+        if (PLAYER_1 if position.moves % 2 == 0 else PLAYER_2) != self.player_piece:
+            if self._analysis_tt is None:
+                self._analysis_tt = TranspositionTable(self.tt_size_mb, self.geometry.key_bits)
+            self.tt = self._analysis_tt
+        try:
+            self._begin_search(position)
+            self._evaluator = IncrementalEvaluator(position.current, position.opponent(), self.geometry)
+            self._stop_event = stop_event
+            for current_depth in range(depth + 1):
+                results = []
+                for col in sorted(columns):
+                    score = self._search_root_move(position, col, current_depth, -float('inf'))
+                    pv = list(self._principal_variation(position, col, current_depth).values())
+                    if score >= WIN_SCORE:
+                        outcome = WIN
+                    elif score <= -WIN_SCORE:
+                        outcome = LOSS
+                    elif current_depth + 1 >= empty:
+                        outcome = DRAW
+                    else:
+                        outcome = None
+                    results.append(ColumnAnalysis(col, score, pv, outcome, None, current_depth))
+
+                self._stop_event, self._deadline = None, None
+                yield current_depth, results
+                if all(result.outcome is not None for result in results):
+                    break
+                if deadline is not None and time.perf_counter() >= deadline:
+                    break
+                self._stop_event, self._deadline = stop_event, deadline
+        except SearchTimeout:
+            return
+        finally:
+            self._stop_event, self._deadline = None, None
+            self.tt = own_table
+
+    def _solve_column(self, position, col, stop_event=None, deadline=None):
+        """Return the exact ColumnAnalysis of one move, using the endgame solver."""
+        cells = self.geometry.cells
+        child = position.copy()
+        child.play(col)
+        if position.is_winning_move(col):
+            score, pv = (cells + 1 - position.moves) // 2, [col]
+        elif child.is_full():
+            score, pv = 0, [col]
+        else:
+            score = -self.solver.score(child.current, child.mask, child.moves, stop_event, deadline)
+            pv = [col] + self.solver.principal_variation(child, stop_event, deadline)
+        outcome, _, plies = describe(score, position.moves, cells)
+        value = WIN_SCORE if outcome == WIN else (-WIN_SCORE if outcome == LOSS else 0)
+        return ColumnAnalysis(col, value, pv, outcome, plies, cells - position.moves - 1)
+
+    def ponder(self, position, stop_event):
+        """
+        Search ahead on the opponent's time, until stopped or out of work.
 
-            score = self._minimax(temp_board, self.depth, -float('inf'), float('inf'), False)
+        Minimax searches the position after each opponent move in turn, the move
+        the table expects first and then center-out. Each finished search is
+        kept for get_move, and a stopped one still leaves its work in the
+        transposition table. MCTS grows its tree from the opponent's position,
+        and the next search re-roots it on the move actually played.
+        Args:
+            position: A BitBoard with the opponent to move, left unchanged
+            stop_event: threading.Event that ends pondering when set
+        """
+        self._ponder_results = {}
+        if position.last_move_won() or position.is_full():
+            return
+
+        if self.mcts is not None:
+            iterations = None if self.mcts_iterations is None else self.mcts_iterations * PONDER_MULTIPLE
+            budget = None if self.time_budget_ms is None else self.time_budget_ms * PONDER_MULTIPLE
+            self.mcts.search(position, iterations, budget, stop_event)
+            return
+
+        columns = list(self.geometry.center_order)
+        key, mirrored = position.canonical_key()
+        entry = self.tt.probe(key)
+        if entry is not None and entry[3] != NO_MOVE:
+            expected = self.geometry.columns - 1 - entry[3] if mirrored else entry[3]
+            columns.remove(expected)
+            columns.insert(0, expected)
+
+        for col in columns:
+            if not position.can_play(col) or position.is_winning_move(col):
+                continue
+            reply = position.copy()
+            reply.play(col)
+            if reply.is_full():
+                continue
+            try:
+                result = self.search(reply, stop_event)
+            except SearchTimeout:
+                return
+            if stop_event.is_set():
+                return
+            self._ponder_results[reply.key()] = (result, self.last_search_depth, self.last_search_nodes)
+
+    def _search_mcts(self, position, stop_event):
+        """
+        Search a position with Monte Carlo tree search.
+        Args:
+            position: The BitBoard with the AI to move
+            stop_event: Optional threading.Event that ends the search early
+        Returns:
+            Tuple of (best column, score), with the score scaled from the
+            expected result so a sure win is WIN_SCORE and a sure loss -WIN_SCORE
+        """
+        start = time.perf_counter()
+        col, value = self.mcts.search(position, self.mcts_iterations, self.time_budget_ms, stop_event)
+        score = int(round((2 * value - 1) * WIN_SCORE))
+        self.last_search_depth = self.mcts.max_depth
+        self.last_search_nodes = self.mcts.iterations
+
+        if self.stats is not None or self.callback is not None:
+            self._report(SearchProgress(ITERATION, self.mcts.max_depth, col, score, self.mcts.iterations,
+                                        time.perf_counter() - start, self.mcts.principal_variation()))
+        if self.stats is not None:
+            self.stats.nodes = self.mcts.iterations
+            self.stats.max_depth = self.mcts.max_depth
+            self.stats.seconds = self.stats.elapsed()
+        return col, score
+
+    def close(self):
+        """Stop any worker processes, release the opening book and any shared table, and write the position store."""
+        if self._parallel is not None:
+            self._parallel.close()
+        if self.book is not None:
+            self.book.close()
+        if self.store is not None:
+            self.store.close()
+        if isinstance(self.tt, SharedTranspositionTable):
+            self.tt.close()
+
+    def _begin_search(self, position):
+        """Reset the per-search state before searching from a root position."""
+        self.tt.new_search()
+        self._nodes = 0
+        self._root_moves = position.moves
+        self._search_start = time.perf_counter()
+        if self.orderer is not None:
+            self.orderer.new_search()
+
+        # Only searches with stats go through the counting wrapper, so the
+        # plain search pays nothing for the instrumentation
+        if self.stats is not None:
+            self._minimax = self._minimax_with_stats
+        elif "_minimax" in self.__dict__:
+            del self._minimax
+
+    def _report(self, progress):
+        """Record a SearchProgress in the stats and pass it to the callback."""
+        stats = self.stats
+        if stats is not None:
+            if progress.kind == ITERATION:
+                stats.iterations.append(progress)
+                stats.depth = progress.depth
+                stats.pv = progress.pv
+            else:
+                stats.root_moves.append(progress)
+        if self.callback is not None:
+            self.callback(progress)
 
+    def _search_root(self, position, columns, depth):
+        """
+        Search every root move to a fixed depth.
+        Args:
+            position: The BitBoard with the AI to move
+            columns: The valid columns, in the order to try them
+            depth: How many moves to look ahead after the root move
+        Returns:
+            Tuple of (best column, best score)
+        """
+        best_score = -float('inf')
+        best_col = random.choice(columns)
+        self._evaluator = IncrementalEvaluator(position.current, position.opponent(), self.geometry)
+
+        if self._parallel is not None and self.time_budget_ms is None and len(columns) > 1:
+            # Search the most promising move here to get a bound, then the rest in parallel
+            first_score = self._search_root_move(position, columns[0], depth, best_score)
+            scores, nodes = self._parallel.search(position, columns[1:], depth, first_score, self._should_stop)
+            self._nodes += nodes
+            for col, score in zip(columns, [first_score] + scores):
+                if score > best_score:
+                    best_score = score
+                    best_col = col
+            return best_col, best_score
+
+        # Try each valid column and choose the best one. Later columns only need
+        # to prove they beat the best score so far, which lets them prune more.
+        for col in columns:
+            score = self._search_root_move(position, col, depth, best_score)
             if score > best_score:
                 best_score = score
                 best_col = col
 
-        return best_col
+        return best_col, best_score
 
-    def _drop_piece(self, board, row, col, piece):
-        """Helper to drop a piece in the board array."""
-        board[row][col] = piece
-
-    def _is_winning_move(self, board, piece):
-        """Check if the current board state has a win for the given piece."""
-        # Check horizontal locations
-        for c in range(COLUMN_COUNT - 3):
-            for r in range(ROW_COUNT):
-                if (board[r][c] == piece and
-                        board[r][c + 1] == piece and
-                        board[r][c + 2] == piece and
-                        board[r][c + 3] == piece):
-                    return True
-
-        # Check vertical locations
-        for c in range(COLUMN_COUNT):
-            for r in range(ROW_COUNT - 3):
-                if (board[r][c] == piece and
-                        board[r + 1][c] == piece and
-                        board[r + 2][c] == piece and
-                        board[r + 3][c] == piece):
-                    return True
-
-        # Check positively sloped diagonals
-        for c in range(COLUMN_COUNT - 3):
-            for r in range(ROW_COUNT - 3):
-                if (board[r][c] == piece and
-                        board[r + 1][c + 1] == piece and
-                        board[r + 2][c + 2] == piece and
-                        board[r + 3][c + 3] == piece):
-                    return True
-
-        # Check negatively sloped diagonals
-        for c in range(COLUMN_COUNT - 3):
-            for r in range(3, ROW_COUNT):
-                if (board[r][c] == piece and
-                        board[r - 1][c + 1] == piece and
-                        board[r - 2][c + 2] == piece and
-                        board[r - 3][c + 3] == piece):
-                    return True
-
-        return False
-
-    def _get_next_open_row(self, board, col):
-        """Get the next open row in a column for the temporary board."""
-        for r in range(ROW_COUNT):
-            if board[r][col] == EMPTY:
-                return r
-        return None
+    def _search_root_move(self, position, col, depth, alpha):
+        """
+        Search a single root move.
+        Args:
+            position: The BitBoard with the AI to move
+            col: The root column to play
+            depth: How many moves to look ahead after the root move
+            alpha: Score the move has to beat to matter
+        Returns:
+            The score of the move
+        """
+        start, nodes = time.perf_counter(), self._nodes
+        cell = position.heights[col]
+        self._evaluator.play(cell, True)
+        position.play(col)
+        score = self._minimax(position, depth, alpha, float('inf'), False)
+        position.undo(col)
+        self._evaluator.undo(cell, True)
+        if self.stats is not None or self.callback is not None:
+            self._report(SearchProgress(ROOT_MOVE, depth, col, score, self._nodes - nodes,
+                                        time.perf_counter() - start, None))
+        return score
+
+    def _iterative_deepening(self, position, valid_locations, deadline):
+        """
+        Search one depth deeper at a time until the time budget runs out.
+
+        The first iteration always completes, so a move is always available. Each
+        later iteration tries the previous principal variation first and is thrown
+        away if the deadline passes before it finishes.
+        Args:
+            position: The BitBoard with the AI to move
+            valid_locations: The valid columns
+            deadline: The time.perf_counter() value at which the budget runs out
+        Returns:
+            Tuple of (best column, score) from the deepest completed iteration
+        """
+        max_depth = self.geometry.cells - position.moves - 1
+        columns = list(valid_locations)
+        best_col, best_score = None, None
+
+        try:
+            for depth in range(max_depth + 1):
+                nodes = self._nodes
+                try:
+                    col, score = self._search_root(position.copy(), columns, depth)
+                except SearchTimeout:
+                    break
+
+                best_col, best_score = col, score
+                self.last_search_depth = depth
+                self._pv_moves = self._principal_variation(position, col, depth)
+                if self.stats is not None or self.callback is not None:
+                    self._report(SearchProgress(ITERATION, depth, col, score, self._nodes - nodes,
+                                                time.perf_counter() - self._search_start,
+                                                list(self._pv_moves.values())))
+                columns = [col] + [c for c in columns if c != col]
+
+                # A forced result will not change with more depth
+                if abs(score) >= WIN_SCORE or time.perf_counter() >= deadline:
+                    break
+                self._deadline = deadline
+        finally:
+            self._deadline = None
+            self._pv_moves = {}
+
+        return best_col, best_score
+
+    def _principal_variation(self, position, col, depth):
+        """
+        Follow the best moves stored in the transposition table from a root move.
+        Args:
+            position: The BitBoard with the AI to move
+            col: The best root column
+            depth: The depth of the completed search
+        Returns:
+            Dictionary mapping each position key on the line to its best column,
+            in the order the moves are played
+        """
+        position = position.copy()
+        pv_moves = {position.key(): col}
+        position.play(col)
+        for _ in range(depth):
+            if position.last_move_won() or position.is_full():
+                break
+            key, mirrored = position.canonical_key()
+            entry = self.tt.probe(key)
+            if entry is None or entry[3] == NO_MOVE:
+                break
+            move = self.geometry.columns - 1 - entry[3] if mirrored else entry[3]
+            if not position.can_play(move):
+                break
+            pv_moves[position.key()] = move
+            position.play(move)
+        return pv_moves
+
+    def _should_stop(self):
+        """Check if the deadline has passed or the caller asked the search to stop."""
+        if self._stop_event is not None and self._stop_event.is_set():
+            return True
+        return self._deadline is not None and time.perf_counter() >= self._deadline
 
     def _evaluate_window(self, window, piece):
         """
-        Score a window of 4 pieces.
+        Score a window of `connect` pieces.
 
         Args:
-            window: Array of 4 board positions
+            window: Array of `connect` board positions
             piece: The piece to evaluate for
 
         Returns:
             Score for the window
         """
         opponent_piece = self.opponent_piece if piece == self.player_piece else self.player_piece
+        window = np.asarray(window)
 
         # Count pieces
-        score = 0
         piece_count = np.count_nonzero(window == piece)
         empty_count = np.count_nonzero(window == EMPTY)
         opponent_count = np.count_nonzero(window == opponent_piece)
 
-        # Score the window based on its contents
-        if piece_count == 4:
-            score += 100  # Win
-        elif piece_count == 3 and empty_count == 1:
-            score += 5  # 3 in a row
-        elif piece_count == 2 and empty_count == 2:
-            score += 2  # 2 in a row
-
-        # Penalize opponent's potential wins
-        if opponent_count == 3 and empty_count == 1:
-            score -= 4  # Block opponent's 3 in a row
-
-        return score
+        return window_score(piece_count, empty_count, opponent_count, self.geometry.connect)
 
     def _score_position(self, board, piece):
         """
@@ -166,51 +725,63 @@ class AIPlayer:
             The score for the position
         """
         score = 0
+        rows = self.geometry.rows
 
-        # Score center column (preferable to control the center)
-        center_array = [board[r][COLUMN_COUNT // 2] for r in range(ROW_COUNT)]
+        # Score center column, or both middle columns on an even width (preferable to control the center)
+        center_array = [board[r][c] for c in self.geometry.center_columns for r in range(rows)]
         center_count = np.count_nonzero(np.array(center_array) == piece)
-        score += center_count * 3
-
-        # Score horizontal windows
-        for r in range(ROW_COUNT):
-            row_array = board[r]
-            for c in range(COLUMN_COUNT - 3):
-                window = row_array[c:c + 4]
-                score += self._evaluate_window(window, piece)
-
-        # Score vertical windows
-        for c in range(COLUMN_COUNT):
-            col_array = [board[r][c] for r in range(ROW_COUNT)]
-            for r in range(ROW_COUNT - 3):
-                window = col_array[r:r + 4]
-                score += self._evaluate_window(window, piece)
-
-        # Score positively sloped diagonal windows
-        for r in range(ROW_COUNT - 3):
-            for c in range(COLUMN_COUNT - 3):
-                window = [board[r + i][c + i] for i in range(4)]
-                score += self._evaluate_window(window, piece)
-
-        # Score negatively sloped diagonal windows
-        for r in range(3, ROW_COUNT):
-            for c in range(COLUMN_COUNT - 3):
-                window = [board[r - i][c + i] for i in range(4)]
-                score += self._evaluate_window(window, piece)
+        score += center_count * CENTER_WEIGHT
+
+        # Score every horizontal, vertical and diagonal window
+        for cells in self.geometry.window_cells:
+            window = [board[r][c] for r, c in cells]
+            score += self._evaluate_window(window, piece)
 
         return score
 
-    def _is_terminal_node(self, board):
-        """Check if the board is in a terminal state (win or full)."""
-        return (self._is_winning_move(board, self.player_piece) or
-                self._is_winning_move(board, self.opponent_piece) or
-                len([c for c in range(COLUMN_COUNT) if board[ROW_COUNT - 1][c] == EMPTY]) == 0)
+    def score_boards(self, boards, piece=None):
+        """
+        Score many boards at once with the same heuristic as _score_position.
+        Args:
+            boards: Array of shape (N, rows, columns) holding board grids
+            piece: The piece to evaluate for (default: the AI's piece)
+        Returns:
+            Tuple of (scores, wins) arrays of length N, where wins marks boards
+            on which `piece` has `connect` in a row
+        """
+        piece = self.player_piece if piece is None else piece
+        opponent_piece = self.opponent_piece if piece == self.player_piece else self.player_piece
+        return score_boards(boards, piece, opponent_piece, self.geometry)
+
+    def _minimax_with_stats(self, position, depth, alpha, beta, maximizing_player):
+        """
+        Run _minimax for one node and record it in self.stats.
 
-    def _minimax(self, board, depth, alpha, beta, maximizing_player):
+        While stats are on this replaces _minimax on the instance, so every
+        recursive call passes through here. A node counts as a cutoff if it
+        failed high: its score reached beta (alpha for the minimizing side),
+        from a move or from a stored bound.
+        """
+        stats = self.stats
+        ply = position.moves - self._root_moves
+        stats.nodes_by_ply[ply] += 1
+        if ply > stats.max_depth:
+            stats.max_depth = ply
+        terminal = position.last_move_won() or position.is_full()
+        if depth == 0 and not terminal:
+            stats.leaf_evals += 1
+
+        value = AIPlayer._minimax(self, position, depth, alpha, beta, maximizing_player)
+
+        if depth > 0 and not terminal and (value >= beta if maximizing_player else value <= alpha):
+            stats.cutoffs_by_ply[ply] += 1
+        return value
+
+    def _minimax(self, position, depth, alpha, beta, maximizing_player):
         """
         Minimax algorithm with alpha-beta pruning.
         Args:
-            board: The current board state
+            position: The current BitBoard, searched in place with play/undo
             depth: How many moves to look ahead
             alpha: Alpha value for pruning
             beta: Beta value for pruning
@@ -218,44 +789,100 @@ class AIPlayer:
         Returns:
             The best score for the current position
         """
-        # Terminal node or max depth reached
-        if depth == 0 or self._is_terminal_node(board):
-            if self._is_winning_move(board, self.player_piece):
-                return 1000000  # AI wins
-            elif self._is_winning_move(board, self.opponent_piece):
-                return -1000000  # Opponent wins
-            elif len([c for c in range(COLUMN_COUNT) if board[ROW_COUNT - 1][c] == EMPTY]) == 0:
-                return 0  # Draw
-            else:
-                # Evaluate the board for the AI player
-                return self._score_position(board, self.player_piece)
-
-        valid_locations = [c for c in range(COLUMN_COUNT) if board[ROW_COUNT - 1][c] == EMPTY]
+        # Check the clock and the stop event every thousand or so nodes
+        self._nodes += 1
+        if not self._nodes & 0x3FF and self._should_stop():
+            raise SearchTimeout()
+
+        # Only the side that just moved can have completed a line
+        if position.last_move_won():
+            return -WIN_SCORE if maximizing_player else WIN_SCORE
+        if position.is_full():
+            return 0  # Draw
+        if depth == 0:
+            return self._evaluator.score
+
+        # Reuse a stored result if it was searched at least this deep. Mirror-image
+        # positions share an entry, so stored moves are flipped to match.
+        key, mirrored = position.canonical_key()
+        entry = self.tt.probe(key)
+        pv_move = self._pv_moves.get(position.key(), NO_MOVE)
+        hash_move = pv_move
+        if entry is not None:
+            tt_value, tt_depth, tt_bound, tt_move = entry
+            if hash_move == NO_MOVE and tt_move != NO_MOVE:
+                hash_move = self.geometry.columns - 1 - tt_move if mirrored else tt_move
+            if tt_depth >= depth:
+                if tt_bound == EXACT:
+                    return tt_value
+                elif tt_bound == LOWER_BOUND:
+                    alpha = max(alpha, tt_value)
+                else:
+                    beta = min(beta, tt_value)
+                if alpha >= beta:
+                    return tt_value
+
+        original_alpha, original_beta = alpha, beta
+        best_move = NO_MOVE
+        evaluator = self._evaluator
+        if self.orderer is not None:
+            ply = position.moves - self._root_moves
+            columns = self.orderer.order(position, ply, hash_move, maximizing_player)
+        else:
+            columns = self._pv_first_orders[pv_move]
 
         if maximizing_player:
             value = -float('inf')
-            for col in valid_locations:
-                row = self._get_next_open_row(board, col)
-                if row is not None:
-                    board_copy = np.copy(board)
-                    self._drop_piece(board_copy, row, col, self.player_piece)
-                    new_score = self._minimax(board_copy, depth - 1, alpha, beta, False)
-                    value = max(value, new_score)
+            for col in columns:
+                if position.can_play(col):
+                    cell = position.heights[col]
+                    evaluator.play(cell, True)
+                    position.play(col)
+                    new_score = self._minimax(position, depth - 1, alpha, beta, False)
+                    position.undo(col)
+                    evaluator.undo(cell, True)
+                    if new_score > value:
+                        value = new_score
+                        best_move = col
                     alpha = max(alpha, value)
                     if alpha >= beta:
+                        if self.orderer is not None:
+                            self.orderer.record_cutoff(position, ply, col, depth, maximizing_player)
                         break  # Beta cutoff
-            return value
 
         else:  # Minimizing player
             value = float('inf')
-            for col in valid_locations:
-                row = self._get_next_open_row(board, col)
-                if row is not None:
-                    board_copy = np.copy(board)
-                    self._drop_piece(board_copy, row, col, self.opponent_piece)
-                    new_score = self._minimax(board_copy, depth - 1, alpha, beta, True)
-                    value = min(value, new_score)
+            for col in columns:
+                if position.can_play(col):
+                    cell = position.heights[col]
+                    evaluator.play(cell, False)
+                    position.play(col)
+                    new_score = self._minimax(position, depth - 1, alpha, beta, True)
+                    position.undo(col)
+                    evaluator.undo(cell, False)
+                    if new_score < value:
+                        value = new_score
+                        best_move = col
                     beta = min(beta, value)
                     if alpha >= beta:
+                        if self.orderer is not None:
+                            self.orderer.record_cutoff(position, ply, col, depth, maximizing_player)
                         break  # Alpha cutoff
-            return value
\ No newline at end of file
+
+        if value <= original_alpha:
+            bound = UPPER_BOUND
+        elif value >= original_beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        if mirrored and best_move != NO_MOVE:
+            best_move = self.geometry.columns - 1 - best_move
+        self.tt.store(key, value, depth, bound, best_move)
+        return value
+
+
+def pv_first_orders(columns):
+    """Return column orders with a principal variation move tried first, indexed by that move."""
+    orders = {col: (col,) + tuple(c for c in range(columns) if c != col) for col in range(columns)}
+    orders[NO_MOVE] = tuple(range(columns))
+    return orders
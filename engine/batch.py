@@ -0,0 +1,69 @@
+# batch.py - Contains vectorized scoring of many boards at once with NumPy
+
+import numpy as np
+from functools import lru_cache
+from utils.constants import CENTER_WEIGHT
+from engine.geometry import DEFAULT_GEOMETRY
+from engine.evaluation import evaluation_tables
+
+
+@lru_cache(maxsize=None)
+def _index_tables(geometry):
+    """
+    Build the gather indices for a board shape, once per geometry.
+
+    Returns:
+        Tuple of (window index, center index, window score table): the flat grid
+        index of every cell in every window with shape (windows, connect), the
+        flat index of every cell in the center columns, and window scores indexed by
+        [own pieces][opponent pieces]
+    """
+    columns = geometry.columns
+    window_index = np.array([[r * columns + c for r, c in cells] for cells in geometry.window_cells], dtype=np.intp)
+    center_index = np.array([r * columns + c for c in geometry.center_columns for r in range(geometry.rows)],
+                            dtype=np.intp)
+    score_table = np.array(evaluation_tables(geometry).window_scores, dtype=np.int64)
+    return window_index, center_index, score_table
+
+
+# Boards scored per chunk, to bound the size of the temporary window arrays
+CHUNK_SIZE = 8192
+
+
+def score_boards(boards, piece, opponent_piece, geometry=DEFAULT_GEOMETRY):
+    """
+    Score many boards with the same heuristic as AIPlayer._score_position.
+
+    Args:
+        boards: Array of shape (N, rows, columns) holding board grids
+        piece: The piece to score for
+        opponent_piece: The other player's piece
+        geometry: The board shape
+
+    Returns:
+        Tuple of (scores, wins): an int64 array of N heuristic scores, and a
+        bool array that is True where `piece` has `connect` in a row
+    """
+    boards = np.asarray(boards)
+    rows, columns = geometry.rows, geometry.columns
+    if boards.ndim != 3 or boards.shape[1:] != (rows, columns):
+        raise ValueError("boards must have shape (N, %d, %d), got %s" % (rows, columns, boards.shape))
+
+    window_index, center_index, score_table = _index_tables(geometry)
+    flat = boards.reshape(len(boards), rows * columns)
+    scores = np.empty(len(flat), dtype=np.int64)
+    wins = np.empty(len(flat), dtype=bool)
+
+    for start in range(0, len(flat), CHUNK_SIZE):
+        chunk = flat[start:start + CHUNK_SIZE]
+        own = chunk == piece
+        windows_own = own[:, window_index].sum(axis=2)
+        windows_opponent = (chunk == opponent_piece)[:, window_index].sum(axis=2)
+
+        chunk_scores = score_table[windows_own, windows_opponent].sum(axis=1)
+        chunk_scores += own[:, center_index].sum(axis=1) * CENTER_WEIGHT
+
+        scores[start:start + CHUNK_SIZE] = chunk_scores
+        wins[start:start + CHUNK_SIZE] = (windows_own == geometry.connect).any(axis=1)
+
+    return scores, wins
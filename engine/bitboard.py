@@ -0,0 +1,152 @@
+# bitboard.py - Contains the BitBoard class, a compact position for the AI search
+
+from utils.constants import EMPTY
+from engine.geometry import DEFAULT_GEOMETRY
+
+
+class BitBoard:
+    def __init__(self, geometry=DEFAULT_GEOMETRY):
+        """
+        Initialize an empty position.
+
+        The position is two integers: `current` holds the stones of the side
+        to move and `mask` holds every occupied cell. `heights` keeps the bit
+        index of the next free cell in each column so moves can be undone.
+        The mirror image is kept up to date alongside, so the canonical key
+        costs no more than the plain one.
+
+        Args:
+            geometry: The board shape, from engine.geometry.get_geometry
+        """
+        self.geometry = geometry
+        self.current = 0
+        self.mask = 0
+        self.mirror_current = 0
+        self.mirror_mask = 0
+        self.moves = 0
+        self.heights = list(geometry.column_bottoms)
+
+    @classmethod
+    def from_grid(cls, grid, piece_to_move, geometry=DEFAULT_GEOMETRY):
+        """
+        Build a position from a Board grid.
+
+        Args:
+            grid: A rows x columns array of pieces
+            piece_to_move: The piece whose turn it is
+            geometry: The board shape
+
+        Returns:
+            A new BitBoard
+        """
+        position = cls(geometry)
+        for c in range(geometry.columns):
+            for r in range(geometry.rows):
+                piece = grid[r][c]
+                if piece == EMPTY:
+                    break
+                bit = geometry.cell_bit(r, c)
+                position.mask |= bit
+                if piece == piece_to_move:
+                    position.current |= bit
+                position.heights[c] += 1
+                position.moves += 1
+        position.mirror_current = geometry.mirror(position.current)
+        position.mirror_mask = geometry.mirror(position.mask)
+        return position
+
+    @classmethod
+    def from_masks(cls, current, mask, geometry=DEFAULT_GEOMETRY):
+        """
+        Build a position from its two integers, e.g. after sending it to another process.
+
+        Args:
+            current: Stones of the side to move
+            mask: Every occupied cell
+            geometry: The board shape
+
+        Returns:
+            A new BitBoard
+        """
+        position = cls(geometry)
+        position.current = current
+        position.mask = mask
+        position.mirror_current = geometry.mirror(current)
+        position.mirror_mask = geometry.mirror(mask)
+        position.moves = mask.bit_count()
+        for c in range(geometry.columns):
+            position.heights[c] += (mask & geometry.column_masks[c]).bit_count()
+        return position
+
+    def copy(self):
+        """Return an independent copy of the position."""
+        position = BitBoard.__new__(BitBoard)
+        position.geometry = self.geometry
+        position.current = self.current
+        position.mask = self.mask
+        position.mirror_current = self.mirror_current
+        position.mirror_mask = self.mirror_mask
+        position.moves = self.moves
+        position.heights = self.heights[:]
+        return position
+
+    def can_play(self, col):
+        """Check if a column still has a free cell."""
+        return self.heights[col] < self.geometry.column_tops[col]
+
+    def play(self, col):
+        """Drop a stone for the side to move and hand the turn over."""
+        bit = self.heights[col]
+        self.current ^= self.mask
+        self.mask |= 1 << bit
+        self.mirror_current ^= self.mirror_mask
+        self.mirror_mask |= 1 << (bit + self.geometry.mirror_offsets[col])
+        self.heights[col] = bit + 1
+        self.moves += 1
+
+    def undo(self, col):
+        """Take back the last stone dropped in a column."""
+        bit = self.heights[col] = self.heights[col] - 1
+        self.mask ^= 1 << bit
+        self.current ^= self.mask
+        self.mirror_mask ^= 1 << (bit + self.geometry.mirror_offsets[col])
+        self.mirror_current ^= self.mirror_mask
+        self.moves -= 1
+
+    def opponent(self):
+        """Return the stones of the side that just moved."""
+        return self.current ^ self.mask
+
+    def last_move_won(self):
+        """Check if the side that just moved has connected a line."""
+        return self.geometry.is_win(self.current ^ self.mask)
+
+    def is_winning_move(self, col):
+        """Check if dropping in a column wins for the side to move."""
+        return self.geometry.is_win(self.current | (1 << self.heights[col]))
+
+    def is_full(self):
+        """Check if every cell is occupied."""
+        return self.moves == self.geometry.cells
+
+    def key(self):
+        """Return an integer that uniquely identifies the position."""
+        return self.current + self.mask
+
+    def canonical_key(self):
+        """
+        Return a key shared by the position and its mirror image.
+
+        Returns:
+            Tuple of (key, mirrored), where mirrored tells whether the key belongs
+            to the mirror image, so columns stored under it must be flipped back
+        """
+        key = self.current + self.mask
+        mirrored_key = self.mirror_current + self.mirror_mask
+        if mirrored_key < key:
+            return mirrored_key, True
+        return key, False
+
+    def mirrored(self):
+        """Return the mirror image of the position."""
+        return BitBoard.from_masks(self.mirror_current, self.mirror_mask, self.geometry)
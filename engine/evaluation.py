@@ -0,0 +1,158 @@
+# evaluation.py - Contains the heuristic scoring used by the AI search
+
+from collections import namedtuple
+from functools import lru_cache
+from utils.constants import WINDOW_LENGTH, CENTER_WEIGHT, FOUR_WEIGHT, THREE_WEIGHT, TWO_WEIGHT
+from utils.constants import OPPONENT_THREE_PENALTY
+from engine.geometry import DEFAULT_GEOMETRY
+
+
+def window_score(piece_count, empty_count, opponent_count, length=WINDOW_LENGTH):
+    """Score a window of `length` cells from its piece counts."""
+    score = 0
+
+    # Score the window based on its contents
+    if piece_count == length:
+        score += FOUR_WEIGHT  # Win
+    elif piece_count == length - 1 and empty_count == 1:
+        score += THREE_WEIGHT  # 3 in a row
+    elif piece_count == length - 2 and empty_count == 2:
+        score += TWO_WEIGHT  # 2 in a row
+
+    # Penalize opponent's potential wins
+    if opponent_count == length - 1 and empty_count == 1:
+        score -= OPPONENT_THREE_PENALTY  # Block opponent's 3 in a row
+
+    return score
+
+
+EvaluationTables = namedtuple("EvaluationTables", [
+    "window_scores", "code_stride", "own_gain", "opponent_gain", "cell_windows", "cell_center_bonus",
+])
+
+
+@lru_cache(maxsize=None)
+def evaluation_tables(geometry):
+    """
+    Build the scoring tables for a board shape, once per geometry.
+
+    Returns:
+        EvaluationTables where window_scores is indexed by [own pieces][opponent
+        pieces], and each window's counts are packed into one code
+        (own * code_stride + opponent) that indexes own_gain and opponent_gain,
+        the change in window score when a piece is added. cell_windows and
+        cell_center_bonus are indexed by a cell's bit.
+    """
+    length = geometry.connect
+    window_scores = [[window_score(p, length - p - o, o, length) if p + o <= length else 0
+                      for o in range(length + 1)]
+                     for p in range(length + 1)]
+    code_stride = length + 1
+
+    def gain(code, own_step, opponent_step):
+        own, opponent = divmod(code, code_stride)
+        if own + opponent >= length:
+            return 0
+        return window_scores[own + own_step][opponent + opponent_step] - window_scores[own][opponent]
+
+    codes = range(code_stride * code_stride)
+    cell_windows = tuple(tuple(w for w, window in enumerate(geometry.window_masks) if window >> bit & 1)
+                         for bit in range(geometry.key_bits))
+    cell_center_bonus = tuple(CENTER_WEIGHT if geometry.center_mask >> bit & 1 else 0
+                              for bit in range(geometry.key_bits))
+    return EvaluationTables(window_scores, code_stride,
+                            tuple(gain(code, 1, 0) for code in codes),
+                            tuple(gain(code, 0, 1) for code in codes),
+                            cell_windows, cell_center_bonus)
+
+
+def score_stones(own_stones, opponent_stones, geometry=DEFAULT_GEOMETRY):
+    """
+    Score a position from scratch for the owner of `own_stones`.
+    Args:
+        own_stones: Bit mask of the scored player's pieces
+        opponent_stones: Bit mask of the opponent's pieces
+        geometry: The board shape
+    Returns:
+        The score for the position
+    """
+    window_scores = evaluation_tables(geometry).window_scores
+    score = (own_stones & geometry.center_mask).bit_count() * CENTER_WEIGHT
+    for window in geometry.window_masks:
+        score += window_scores[(own_stones & window).bit_count()][(opponent_stones & window).bit_count()]
+    return score
+
+
+class IncrementalEvaluator:
+    def __init__(self, own_stones=0, opponent_stones=0, geometry=DEFAULT_GEOMETRY):
+        """
+        Initialize the evaluator for a position.
+
+        Keeps the piece counts of every window and a running score for the
+        owner of `own_stones`. Dropping or removing a piece only updates the
+        windows through that cell, and the score always equals score_stones.
+
+        Args:
+            own_stones: Bit mask of the scored player's pieces
+            opponent_stones: Bit mask of the opponent's pieces
+            geometry: The board shape
+        """
+        tables = evaluation_tables(geometry)
+        self.code_stride = tables.code_stride
+        self.own_gain = tables.own_gain
+        self.opponent_gain = tables.opponent_gain
+        self.cell_windows = tables.cell_windows
+        self.cell_center_bonus = tables.cell_center_bonus
+        self.codes = [(own_stones & window).bit_count() * self.code_stride + (opponent_stones & window).bit_count()
+                      for window in geometry.window_masks]
+        self.score = score_stones(own_stones, opponent_stones, geometry)
+
+    def play(self, cell, own):
+        """
+        Add a piece to the evaluated position.
+
+        Args:
+            cell: Bit index of the cell the piece lands in
+            own: Whether the piece belongs to the scored player
+        """
+        codes = self.codes
+        score = self.score
+        if own:
+            score += self.cell_center_bonus[cell]
+            own_gain, stride = self.own_gain, self.code_stride
+            for w in self.cell_windows[cell]:
+                code = codes[w]
+                score += own_gain[code]
+                codes[w] = code + stride
+        else:
+            opponent_gain = self.opponent_gain
+            for w in self.cell_windows[cell]:
+                code = codes[w]
+                score += opponent_gain[code]
+                codes[w] = code + 1
+        self.score = score
+
+    def undo(self, cell, own):
+        """
+        Remove a piece added by play.
+
+        Args:
+            cell: Bit index of the cell the piece was in
+            own: Whether the piece belongs to the scored player
+        """
+        codes = self.codes
+        score = self.score
+        if own:
+            score -= self.cell_center_bonus[cell]
+            own_gain, stride = self.own_gain, self.code_stride
+            for w in self.cell_windows[cell]:
+                code = codes[w] - stride
+                score -= own_gain[code]
+                codes[w] = code
+        else:
+            opponent_gain = self.opponent_gain
+            for w in self.cell_windows[cell]:
+                code = codes[w] - 1
+                score -= opponent_gain[code]
+                codes[w] = code
+        self.score = score
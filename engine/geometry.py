@@ -0,0 +1,118 @@
+# geometry.py - Contains the Geometry class with the precomputed tables for one board shape
+
+from functools import lru_cache
+from utils.constants import ROW_COUNT, COLUMN_COUNT, WINDOW_LENGTH
+
+
+class Geometry:
+    def __init__(self, rows, columns, connect):
+        """
+        Precompute the bit layout and line tables for one board shape.
+
+        Use get_geometry() rather than building these directly, so every game
+        of the same variant shares one set of tables.
+
+        Args:
+            rows: Number of rows
+            columns: Number of columns
+            connect: Pieces in a row needed to win
+        """
+        if rows < 1 or columns < 1 or connect < 2 or connect > max(rows, columns):
+            raise ValueError("cannot connect %d on a %dx%d board" % (connect, rows, columns))
+
+        self.rows = rows
+        self.columns = columns
+        self.connect = connect
+        self.cells = rows * columns
+
+        # Each column uses `rows` bits plus one sentinel bit on top, so shifting a
+        # line of pieces never wraps into the neighbouring column.
+        self.column_height = rows + 1
+        self.key_bits = columns * self.column_height
+        self.column_bits = (1 << self.column_height) - 1
+        self.bottom_mask = sum(1 << (c * self.column_height) for c in range(columns))
+        self.board_mask = self.bottom_mask * ((1 << rows) - 1)
+        self.column_masks = tuple(((1 << rows) - 1) << (c * self.column_height) for c in range(columns))
+        self.column_bottoms = tuple(c * self.column_height for c in range(columns))
+        self.column_tops = tuple(c * self.column_height + rows for c in range(columns))
+
+        # Shift distances for vertical, horizontal and both diagonal directions
+        self.directions = (1, self.column_height, self.column_height - 1, self.column_height + 1)
+
+        # Distance from a cell's bit to the bit of its mirror image, per column
+        self.mirror_offsets = tuple((columns - 1 - 2 * c) * self.column_height for c in range(columns))
+
+        self.window_cells = self._build_windows()
+        self.window_masks = tuple(sum(self.cell_bit(r, c) for r, c in cells) for cells in self.window_cells)
+
+        # The middle column, or both middle columns on an even width, so the
+        # center bonus is the same for a position and its mirror image
+        self.center_columns = tuple(sorted({(columns - 1) // 2, columns // 2}))
+        self.center_mask = sum(self.column_masks[c] for c in self.center_columns)
+
+        # Columns sorted from the center outwards, e.g. 3, 2, 4, 1, 5, 0, 6
+        self.center_order = tuple(sorted(range(columns), key=lambda c: (abs(2 * c - (columns - 1)), c)))
+
+    def __repr__(self):
+        return "Geometry(rows=%d, columns=%d, connect=%d)" % (self.rows, self.columns, self.connect)
+
+    def cell_bit(self, row, col):
+        """Return the bit for the cell at (row, col), row 0 being the bottom."""
+        return 1 << (col * self.column_height + row)
+
+    def _build_windows(self):
+        """Build the (row, col) cells of every line of `connect` cells on the board."""
+        rows, columns, length = self.rows, self.columns, self.connect
+        windows = []
+        for r in range(rows):
+            for c in range(columns - length + 1):
+                windows.append(tuple((r, c + i) for i in range(length)))
+        for c in range(columns):
+            for r in range(rows - length + 1):
+                windows.append(tuple((r + i, c) for i in range(length)))
+        for r in range(rows - length + 1):
+            for c in range(columns - length + 1):
+                windows.append(tuple((r + i, c + i) for i in range(length)))
+        for r in range(length - 1, rows):
+            for c in range(columns - length + 1):
+                windows.append(tuple((r - i, c + i) for i in range(length)))
+        return tuple(windows)
+
+    def mirror(self, bits):
+        """Reflect a bit mask (or position key) left to right."""
+        mirrored = 0
+        height, column_bits, last = self.column_height, self.column_bits, self.columns - 1
+        for c in range(self.columns):
+            mirrored |= ((bits >> (c * height)) & column_bits) << ((last - c) * height)
+        return mirrored
+
+    def is_win(self, stones):
+        """Check if a set of stones contains `connect` in a line."""
+        for shift in self.directions:
+            m = stones
+            for i in range(1, self.connect):
+                m &= stones >> (i * shift)
+                if not m:
+                    break
+            if m:
+                return True
+        return False
+
+
+def get_geometry(rows=ROW_COUNT, columns=COLUMN_COUNT, connect=WINDOW_LENGTH):
+    """
+    Return the shared Geometry for a board shape, building it on first use.
+
+    Every call for the same shape returns the same object, however the
+    arguments are passed, so geometries can be compared with `is`.
+    """
+    return _build_geometry(rows, columns, connect)
+
+
+@lru_cache(maxsize=None)
+def _build_geometry(rows, columns, connect):
+    """Build the Geometry for a board shape, cached by positional arguments only."""
+    return Geometry(rows, columns, connect)
+
+
+DEFAULT_GEOMETRY = get_geometry()
@@ -0,0 +1,431 @@
+# mcts.py - Contains the MCTS class, a Monte Carlo tree search with batched random playouts
+
+import math
+import random
+import time
+from array import array
+
+import numpy as np
+
+from engine.geometry import DEFAULT_GEOMETRY
+
+NO_NODE = -1
+
+# Node results known without playouts, for the side that moved into the node
+UNKNOWN = 0
+WON = 1
+DRAWN = 2
+
+
+class MCTS:
+    def __init__(self, geometry=DEFAULT_GEOMETRY, max_nodes=1 << 18, playouts_per_leaf=32, exploration=1.0):
+        """
+        Initialize an empty search tree.
+
+        Nodes live in flat typed arrays indexed by node number rather than as
+        one object each, about 22 bytes a node. The children of a node sit next
+        to each other, so a node only stores its first child and child count.
+        Each new leaf is scored by `playouts_per_leaf` random games played
+        together as NumPy bit operations. The tree is kept between searches, and
+        a later search reuses the part below the position it is given.
+
+        Args:
+            geometry: The board shape
+            max_nodes: Capacity of the node pool; once it is full, leaves are
+                scored by more playouts instead of being expanded
+            playouts_per_leaf: Random games played from each new leaf
+            exploration: UCT exploration constant
+        """
+        self.geometry = geometry
+        self.max_nodes = max_nodes
+        self.playouts_per_leaf = playouts_per_leaf
+        self.exploration = exploration
+
+        self._allocate()
+        self._root = NO_NODE
+        self._root_position = None
+
+        # Bit shifts used by the vectorized win check, when keys fit in 64 bits
+        self._vectorized = geometry.key_bits <= 64
+        if self._vectorized:
+            self._line_shifts = [[np.uint64(run * shift) for run in _doubling_runs(geometry.connect)]
+                                 for shift in geometry.directions]
+            self._bottom = np.uint64(geometry.bottom_mask)
+            self._column_masks = np.array(geometry.column_masks, dtype=np.uint64)
+        self._rng = np.random.default_rng()
+
+        self.iterations = 0
+        self.max_depth = 0
+        self.reused_visits = 0
+
+    def _allocate(self):
+        """Create empty node arrays for max_nodes nodes."""
+        size = self.max_nodes
+        self.parents = array('i', bytes(4 * size))
+        self.first_child = array('i', bytes(4 * size))
+        self.child_counts = array('b', bytes(size))
+        self.moves = array('b', bytes(size))
+        self.terminal = array('b', bytes(size))
+        self.visits = array('I', bytes(4 * size))
+        self.values = array('d', bytes(8 * size))
+        self.count = 0
+
+    def _new_node(self, parent, move, terminal):
+        """Append a node to the pool and return its index."""
+        node = self.count
+        self.parents[node] = parent
+        self.first_child[node] = NO_NODE
+        self.child_counts[node] = 0
+        self.moves[node] = move
+        self.terminal[node] = terminal
+        self.visits[node] = 0
+        self.values[node] = 0.0
+        self.count += 1
+        return node
+
+    def search(self, position, iterations=None, time_budget_ms=None, stop_event=None):
+        """
+        Search a position with the side to move.
+
+        Stops after `iterations` iterations, once `time_budget_ms` has passed, or
+        once `stop_event` is set, whichever comes first. With neither limit set
+        it runs 1000 iterations. Iterations already spent below the position by
+        earlier searches, e.g. while pondering, count toward `iterations`.
+
+        Args:
+            position: The BitBoard to search, left unchanged
+            iterations: Number of leaves to expand and play out
+            time_budget_ms: Time limit in milliseconds
+            stop_event: Optional threading.Event that ends the search early
+
+        Returns:
+            Tuple of (best column, expected result for the side to move from 0
+            to 1), or (None, None) if no move is possible
+        """
+        if position.is_full() or position.last_move_won():
+            return None, None
+        if iterations is None and time_budget_ms is None:
+            iterations = 1000
+        deadline = None if time_budget_ms is None else time.perf_counter() + time_budget_ms / 1000.0
+
+        # Seed from the random module, so random.seed makes searches repeatable
+        self._rng = np.random.default_rng(random.getrandbits(64))
+        self._set_root(position)
+        if iterations is not None:
+            iterations = max(1, iterations - self.reused_visits // self.playouts_per_leaf)
+        self.iterations = 0
+        self.max_depth = 0
+        while iterations is None or self.iterations < iterations:
+            if not self.iterations & 0xF and self.iterations:
+                if stop_event is not None and stop_event.is_set():
+                    break
+                if deadline is not None and time.perf_counter() >= deadline:
+                    break
+            self._iterate()
+            self.iterations += 1
+            # A forced move needs no more search
+            if self.child_counts[self._root] == 1:
+                break
+
+        return self.best_move()
+
+    def best_move(self):
+        """
+        Return the most visited move at the root.
+
+        Returns:
+            Tuple of (column, expected result for the side to move from 0 to 1)
+        """
+        best, best_visits = NO_NODE, -1
+        first = self.first_child[self._root]
+        for child in range(first, first + self.child_counts[self._root]):
+            if self.terminal[child] == WON:
+                return self.moves[child], 1.0
+            if self.visits[child] > best_visits:
+                best, best_visits = child, self.visits[child]
+        if best == NO_NODE:
+            return None, None
+        return self.moves[best], self.values[best] / best_visits if best_visits else 0.5
+
+    def principal_variation(self, max_length=None):
+        """Return the line of most visited moves from the root, as a list of columns."""
+        line, node = [], self._root
+        while self.child_counts[node] and (max_length is None or len(line) < max_length):
+            first = self.first_child[node]
+            node = max(range(first, first + self.child_counts[node]), key=self.visits.__getitem__)
+            if not self.visits[node]:
+                break
+            line.append(self.moves[node])
+        return line
+
+    def root_moves(self):
+        """
+        Return the statistics of every root move.
+
+        Returns:
+            List of (column, visits, expected result for the side to move) tuples
+        """
+        first = self.first_child[self._root]
+        return [(self.moves[child], self.visits[child],
+                 self.values[child] / self.visits[child] if self.visits[child] else None)
+                for child in range(first, first + self.child_counts[self._root])]
+
+    def _set_root(self, position):
+        """Make the node for `position` the root, keeping its subtree if the tree has it."""
+        node = self._find(position)
+        if node == NO_NODE:
+            self.count = 0
+            self._root = self._new_node(NO_NODE, -1, UNKNOWN)
+            self.reused_visits = 0
+        else:
+            self._root = node
+            self.parents[node] = NO_NODE
+            self.reused_visits = self.visits[node]
+            # Drop the unreachable rest of the tree once it takes up half the pool
+            if self.count > self.max_nodes // 2:
+                self._compact()
+        self._root_position = position.copy()
+
+    def _find(self, position):
+        """
+        Find the node for a position reached from the current root.
+
+        Returns:
+            The node index, or NO_NODE if the position is not in the tree
+        """
+        old = self._root_position
+        if self._root == NO_NODE or old is None or old.geometry is not position.geometry:
+            return NO_NODE
+        if position.moves < old.moves or position.mask & old.mask != old.mask:
+            return NO_NODE
+
+        # Walk down, at each ply taking the child whose stone is in the new position
+        node, walk = self._root, old.copy()
+        while walk.moves < position.moves:
+            stones = position.current if (position.moves - walk.moves) % 2 == 0 else position.opponent()
+            first = self.first_child[node]
+            for child in range(first, first + self.child_counts[node]):
+                if stones >> walk.heights[self.moves[child]] & 1:
+                    node = child
+                    break
+            else:
+                return NO_NODE
+            walk.play(self.moves[node])
+
+        if walk.current != position.current or walk.mask != position.mask:
+            return NO_NODE
+        return node
+
+    def _compact(self):
+        """Copy the root's subtree to the front of a fresh pool, keeping child blocks together."""
+        old = (self.parents, self.first_child, self.child_counts, self.moves, self.terminal,
+               self.visits, self.values)
+        _, old_first, old_counts, old_moves, old_terminal, old_visits, old_values = old
+        self._allocate()
+
+        root = self._new_node(NO_NODE, -1, old_terminal[self._root])
+        self.visits[root] = old_visits[self._root]
+        self.values[root] = old_values[self._root]
+        queue = [(self._root, root)]
+        for old_node, node in queue:
+            count = old_counts[old_node]
+            if not count:
+                continue
+            self.first_child[node] = self.count
+            self.child_counts[node] = count
+            old_child = old_first[old_node]
+            for child in range(old_child, old_child + count):
+                new_child = self._new_node(node, old_moves[child], old_terminal[child])
+                self.visits[new_child] = old_visits[child]
+                self.values[new_child] = old_values[child]
+                queue.append((child, new_child))
+        self._root = root
+
+    def _select(self, node):
+        """Pick the child with the highest UCT score, trying unvisited children first."""
+        first = self.first_child[node]
+        visits, values = self.visits, self.values
+        # Counts are in playouts, so convert back to node visits for the bound
+        per_leaf = self.playouts_per_leaf
+        scale = self.exploration * math.sqrt(per_leaf * math.log(max(1.0, visits[node] / per_leaf)))
+        best, best_score = first, -1.0
+        for child in range(first, first + self.child_counts[node]):
+            n = visits[child]
+            if not n:
+                return child
+            score = values[child] / n + scale / math.sqrt(n)
+            if score > best_score:
+                best, best_score = child, score
+        return best
+
+    def _expand(self, node, position):
+        """
+        Add the children of a leaf.
+
+        A move that wins on the spot is the only child kept, and otherwise a
+        move that blocks the opponent's immediate win is, since the other
+        moves lose at once.
+
+        Returns:
+            True if the node was expanded, False if the pool is full
+        """
+        geometry = self.geometry
+        columns = [col for col in geometry.center_order if position.can_play(col)]
+        winning = [col for col in columns if position.is_winning_move(col)]
+        if winning:
+            columns = winning[:1]
+        else:
+            opponent = position.opponent()
+            blocks = [col for col in columns if geometry.is_win(opponent | (1 << position.heights[col]))]
+            if blocks:
+                columns = blocks[:1]
+
+        if self.count + len(columns) > self.max_nodes:
+            return False
+        full = position.moves + 1 == geometry.cells
+        self.first_child[node] = self.count
+        self.child_counts[node] = len(columns)
+        for col in columns:
+            self._new_node(node, col, WON if winning else (DRAWN if full else UNKNOWN))
+        return True
+
+    def _iterate(self):
+        """Select a leaf, expand it, score a new child by playouts and back the result up."""
+        node, position, depth = self._root, self._root_position.copy(), 0
+        while self.child_counts[node] and self.terminal[node] == UNKNOWN:
+            node = self._select(node)
+            position.play(self.moves[node])
+            depth += 1
+
+        count = self.playouts_per_leaf
+        terminal = self.terminal[node]
+        if terminal == WON:
+            reward = float(count)
+        elif terminal == DRAWN:
+            reward = count / 2.0
+        else:
+            if (self.visits[node] or node == self._root) and self._expand(node, position):
+                node = self.first_child[node]
+                position.play(self.moves[node])
+                depth += 1
+                terminal = self.terminal[node]
+            if terminal == WON:
+                reward = float(count)
+            elif terminal == DRAWN:
+                reward = count / 2.0
+            elif self._vectorized:
+                reward = self._playouts(position, count)
+            else:
+                reward = self._python_playouts(position, count)
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+        # Each node keeps results for the side that moved into it
+        while node != NO_NODE:
+            self.visits[node] += count
+            self.values[node] += reward
+            reward = count - reward
+            node = self.parents[node]
+
+    def _playouts(self, position, count):
+        """
+        Play `count` random games from a position at once, as NumPy arrays of bitboards.
+
+        Returns:
+            The total result for the side that moved into the position: 1 per
+            game it won and 1/2 per draw
+        """
+        rng = self._rng
+        current = np.full(count, position.current, dtype=np.uint64)
+        mask = np.full(count, position.mask, dtype=np.uint64)
+        bottom, column_masks, line_shifts = self._bottom, self._column_masks, self._line_shifts
+
+        # Draw every random column up front, twice as many as the longest games
+        # could use, since drawing per move costs more than the moves
+        moves, cells = position.moves, self.geometry.cells
+        draws = rng.integers(self.geometry.columns, size=2 * count * (cells - moves) + count, dtype=np.uint8)
+        used = 0
+
+        # The side to move at the position makes the even-numbered moves
+        mover_wins = [0.0, 0.0]
+        step = 0
+        while len(current):
+            if moves + step == cells:
+                mover_wins[0] += len(current) / 2.0
+                mover_wins[1] += len(current) / 2.0
+                break
+
+            # A random column for every game. Adding the bottom row to the mask
+            # carries into the lowest free cell of each column, or past the top
+            # of a full one, so full columns give no move and are drawn again.
+            games = len(mask)
+            if used + games > len(draws):
+                draws = rng.integers(self.geometry.columns, size=len(draws), dtype=np.uint8)
+                used = 0
+            free = mask + bottom
+            move = free & column_masks[draws[used:used + games]]
+            used += games
+            missing = np.flatnonzero(move == 0)
+            while len(missing):
+                if used + len(missing) > len(draws):
+                    draws = rng.integers(self.geometry.columns, size=len(draws), dtype=np.uint8)
+                    used = 0
+                move[missing] = free[missing] & column_masks[draws[used:used + len(missing)]]
+                used += len(missing)
+                missing = missing[move[missing] == 0]
+
+            # Lines are found by doubling: runs of 1, 2, 4... stones, then the rest
+            stones = current | move
+            lines = None
+            for shifts in line_shifts:
+                m = stones
+                for shift in shifts:
+                    m = m & (m >> shift)
+                lines = m if lines is None else lines | m
+            won = lines != 0
+
+            mover_wins[step & 1] += np.count_nonzero(won)
+            mask = mask | stones
+            current = mask ^ stones
+            if won.any():
+                keep = ~won
+                current, mask = current[keep], mask[keep]
+            step += 1
+
+        return mover_wins[1]
+
+    def _python_playouts(self, position, count):
+        """Play `count` random games one at a time, for boards whose keys do not fit in 64 bits."""
+        rng = random.Random(int(self._rng.integers(1 << 62)))
+        columns = range(self.geometry.columns)
+        reward = 0.0
+        for _ in range(count):
+            game = position.copy()
+            step = 0
+            while not game.is_full():
+                col = rng.choice([c for c in columns if game.can_play(c)])
+                if game.is_winning_move(col):
+                    reward += step & 1
+                    break
+                game.play(col)
+                step += 1
+            else:
+                reward += 0.5
+        return reward
+
+
+def _doubling_runs(connect):
+    """
+    Return the shifts, in stones, that turn single stones into runs of `connect`.
+
+    Each step ANDs the mask of run starts with itself shifted by the given
+    number of stones, which doubles the run length until the last step tops
+    it up to `connect`, e.g. 1, 2, 1 for five in a row.
+    """
+    runs, length = [], 1
+    while length * 2 <= connect:
+        runs.append(length)
+        length *= 2
+    if length < connect:
+        runs.append(connect - length)
+    return runs
@@ -0,0 +1,144 @@
+# opening_book.py - Contains the OpeningBook class and the book file format
+
+import mmap
+import struct
+from engine.bitboard import BitBoard
+from engine.geometry import DEFAULT_GEOMETRY, get_geometry
+
+# File layout: a header followed by entries sorted by canonical position key.
+# Scores are from the point of view of the side to move, and moves are stored
+# for the canonical orientation of the position.
+MAGIC = b"C4BK"
+VERSION = 2
+HEADER = struct.Struct("<4sHBBBBBI")  # magic, version, rows, columns, connect, max plies, search depth, entry count
+ENTRY = struct.Struct("<Qibb")  # key, score, best column, search depth
+
+
+class OpeningBook:
+    def __init__(self, path):
+        """
+        Open a book file for lookups.
+
+        The file is memory-mapped rather than read, so opening is cheap and
+        each lookup is a binary search touching O(log n) entries.
+
+        Args:
+            path: Path of a file written by write_book
+        """
+        self._file = open(path, "rb")
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, rows, columns, connect,
+         self.max_plies, self.depth, self.count) = HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError("%s is not a version %d opening book" % (path, VERSION))
+        self.geometry = get_geometry(rows, columns, connect)
+        if len(self._data) != HEADER.size + self.count * ENTRY.size:
+            self.close()
+            raise ValueError("%s is truncated" % path)
+
+    def __len__(self):
+        return self.count
+
+    def _find(self, key):
+        """Binary search for a canonical key, returning its entry tuple or None."""
+        data = self._data
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            offset = HEADER.size + middle * ENTRY.size
+            middle_key = struct.unpack_from("<Q", data, offset)[0]
+            if middle_key < key:
+                low = middle + 1
+            elif middle_key > key:
+                high = middle
+            else:
+                return ENTRY.unpack_from(data, offset)
+        return None
+
+    def lookup(self, position):
+        """
+        Look up a position.
+
+        Args:
+            position: The BitBoard to look up
+
+        Returns:
+            A (column, score, depth) tuple for the side to move, or None if the
+            position is not in the book
+        """
+        if position.moves > self.max_plies or position.geometry is not self.geometry:
+            return None
+        key, mirrored = position.canonical_key()
+        entry = self._find(key)
+        if entry is None:
+            return None
+        _, score, col, depth = entry
+        if mirrored:
+            col = self.geometry.columns - 1 - col
+        return col, score, depth
+
+    def close(self):
+        """Release the memory map and the file."""
+        if self._data is not None:
+            self._data.close()
+            self._file.close()
+            self._data = None
+
+
+def opening_positions(max_plies, geometry=DEFAULT_GEOMETRY):
+    """
+    Yield every reachable, unfinished position up to max_plies moves deep.
+
+    Positions are folded by left-right symmetry, so each is yielded once in its
+    canonical orientation.
+
+    Args:
+        max_plies: Number of moves played from the empty board
+        geometry: The board shape
+
+    Yields:
+        Tuple of (canonical key, BitBoard)
+    """
+    frontier = [BitBoard(geometry)]
+    seen = {0}
+    yield 0, frontier[0]
+    for _ in range(max_plies):
+        next_frontier = []
+        for position in frontier:
+            for col in range(geometry.columns):
+                if not position.can_play(col) or position.is_winning_move(col):
+                    continue
+                child = position.copy()
+                child.play(col)
+                key, mirrored = child.canonical_key()
+                if key in seen:
+                    continue
+                seen.add(key)
+                if mirrored:
+                    child = child.mirrored()
+                next_frontier.append(child)
+                yield key, child
+        frontier = next_frontier
+
+
+def write_book(path, entries, max_plies, depth, geometry=DEFAULT_GEOMETRY):
+    """
+    Write a book file.
+
+    Args:
+        path: Output path
+        entries: Iterable of (canonical key, score, column, depth) tuples
+        max_plies: Deepest ply covered by the book
+        depth: Search depth used to build the book
+        geometry: The board shape the positions belong to
+    """
+    if geometry.key_bits > 64:
+        raise ValueError("%r has keys too large for the book format" % geometry)
+    entries = sorted(entries)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, geometry.rows, geometry.columns, geometry.connect,
+                            max_plies, depth, len(entries)))
+        for entry in entries:
+            f.write(ENTRY.pack(*entry))
@@ -0,0 +1,87 @@
+# ordering.py - Contains the MoveOrderer class to sort moves for alpha-beta search
+
+from operator import itemgetter
+from engine.geometry import DEFAULT_GEOMETRY
+from engine.transposition import NO_MOVE
+
+# Priorities that keep the hash move and killers ahead of any history score
+HASH_MOVE_PRIORITY = 1 << 40
+KILLER_PRIORITY = (1 << 39, 1 << 38)
+
+_by_priority = itemgetter(0)
+
+
+class MoveOrderer:
+    def __init__(self, geometry=DEFAULT_GEOMETRY):
+        """
+        Initialize the move ordering state.
+
+        Moves are tried in this order: the hash move (from the principal
+        variation or transposition table), the two killer moves for the ply,
+        then the rest by history score. Ties fall back to center-out order.
+
+        Args:
+            geometry: The board shape
+        """
+        self.center_order = geometry.center_order
+        self.max_ply = geometry.cells + 1
+        self.killers = [[NO_MOVE, NO_MOVE] for _ in range(self.max_ply)]
+        # History scores per side, indexed by the bit of the cell a move fills
+        self.history = [[0] * geometry.key_bits for _ in range(2)]
+
+    def new_search(self):
+        """Forget killers and age the history scores before a new search."""
+        for killers in self.killers:
+            killers[0] = killers[1] = NO_MOVE
+        for table in self.history:
+            for i in range(len(table)):
+                table[i] >>= 1
+
+    def order(self, position, ply, hash_move, side):
+        """
+        Sort the playable columns of a position.
+
+        Args:
+            position: The BitBoard to move in
+            ply: Distance from the root of the search
+            hash_move: A column to try first, or NO_MOVE
+            side: 1 for the maximizing player, 0 for the minimizing player
+
+        Returns:
+            List of playable columns, best candidates first
+        """
+        first_killer, second_killer = self.killers[ply]
+        history = self.history[side]
+        heights = position.heights
+        scored = []
+        for col in self.center_order:
+            if position.can_play(col):
+                if col == hash_move:
+                    priority = HASH_MOVE_PRIORITY
+                elif col == first_killer:
+                    priority = KILLER_PRIORITY[0]
+                elif col == second_killer:
+                    priority = KILLER_PRIORITY[1]
+                else:
+                    priority = history[heights[col]]
+                scored.append((priority, col))
+        # Python's sort is stable, so equal priorities keep center-out order
+        scored.sort(key=_by_priority, reverse=True)
+        return [col for _, col in scored]
+
+    def record_cutoff(self, position, ply, col, depth, side):
+        """
+        Remember a move that caused a cutoff.
+
+        Args:
+            position: The BitBoard the move was played in (already undone)
+            ply: Distance from the root of the search
+            col: The column that caused the cutoff
+            depth: Remaining depth at the node
+            side: 1 for the maximizing player, 0 for the minimizing player
+        """
+        killers = self.killers[ply]
+        if killers[0] != col:
+            killers[1] = killers[0]
+            killers[0] = col
+        self.history[side][position.heights[col]] += depth * depth
@@ -0,0 +1,111 @@
+# parallel.py - Contains the ParallelRootSearch class to search root moves on several cores
+
+import multiprocessing
+from engine.bitboard import BitBoard
+from engine.evaluation import IncrementalEvaluator
+
+# Per-process search state, set up once by _init_worker
+_worker_ai = None
+_shared_best = None
+_stop = None
+
+
+def _init_worker(settings, shared_best, stop):
+    """Create the AIPlayer each worker process keeps for its whole life."""
+    global _worker_ai, _shared_best, _stop
+    from connect4AI import AIPlayer
+
+    _worker_ai = AIPlayer(**settings)
+    _shared_best = shared_best
+    _stop = stop
+
+
+def _search_task(task):
+    """
+    Search a single root move in a worker process.
+
+    The lower bound is the larger of the first root move's score and the best
+    score any worker has proven so far. One is taken off the shared score so a
+    move that ties it still gets an exact score and the earlier column can win
+    the tie, as it would in the serial search.
+    """
+    current, mask, col, depth, first_score = task
+    ai = _worker_ai
+    position = BitBoard.from_masks(current, mask, ai.geometry)
+    alpha = max(first_score, _shared_best.value - 1)
+
+    ai._begin_search(position)
+    ai._stop_event = _stop
+    ai._evaluator = IncrementalEvaluator(position.current, position.opponent(), ai.geometry)
+    score = ai._search_root_move(position, col, depth, alpha)
+
+    with _shared_best.get_lock():
+        if score > _shared_best.value:
+            _shared_best.value = score
+    return score, ai._nodes
+
+
+class ParallelRootSearch:
+    def __init__(self, workers, settings):
+        """
+        Initialize a pool of processes that search root moves in parallel.
+
+        The pool is started on first use and kept until close(), so each worker's
+        transposition table carries over between moves.
+
+        Args:
+            workers: Number of worker processes
+            settings: Keyword arguments for the AIPlayer built in each worker
+        """
+        self.workers = workers
+        self.settings = settings
+        self._pool = None
+        self._shared_best = None
+        self._stop = None
+
+    def _ensure_pool(self):
+        """Start the worker processes if they are not running yet."""
+        if self._pool is None:
+            context = multiprocessing.get_context()
+            self._shared_best = context.Value('d', -float('inf'))
+            self._stop = context.Event()
+            self._pool = context.Pool(self.workers, initializer=_init_worker,
+                                      initargs=(self.settings, self._shared_best, self._stop))
+
+    def search(self, position, columns, depth, first_score, should_stop=None):
+        """
+        Search root moves on the worker processes.
+
+        Args:
+            position: The BitBoard with the AI to move
+            columns: The root columns to search
+            depth: How many moves to look ahead after each root move
+            first_score: Score of the root move already searched, used as the lower bound
+            should_stop: Optional function polled while the workers search. Once
+                it returns True the workers are told to stop, which they notice
+                within a thousand or so nodes.
+
+        Returns:
+            Tuple of (scores in the order of `columns`, total nodes searched)
+
+        Raises:
+            SearchTimeout: If the search was stopped
+        """
+        self._ensure_pool()
+        self._shared_best.value = first_score
+        self._stop.clear()
+        tasks = [(position.current, position.mask, col, depth, first_score) for col in columns]
+        pending = self._pool.map_async(_search_task, tasks, chunksize=1)
+        while not pending.ready():
+            pending.wait(0.01)
+            if should_stop is not None and should_stop():
+                self._stop.set()
+        results = pending.get()
+        return [score for score, _ in results], sum(nodes for _, nodes in results)
+
+    def close(self):
+        """Stop the worker processes."""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
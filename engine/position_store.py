@@ -0,0 +1,178 @@
+# position_store.py - Contains the PositionStore class, a persistent store of searched and solved positions
+
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from engine.geometry import DEFAULT_GEOMETRY
+
+VERSION = 1
+
+# Once a store holds more than max_entries, it is cut back to this fraction of them
+EVICT_TO = 0.9
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS positions (
+    key INTEGER PRIMARY KEY,
+    depth INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    move INTEGER NOT NULL,
+    outcome TEXT,
+    plies INTEGER,
+    stamp INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS positions_eviction ON positions (depth, stamp);
+"""
+
+# Keep the stored result unless the new one was searched at least as deep
+_UPSERT = """
+INSERT INTO positions (key, depth, score, move, outcome, plies, stamp) VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (key) DO UPDATE SET depth = excluded.depth, score = excluded.score, move = excluded.move,
+    outcome = excluded.outcome, plies = excluded.plies, stamp = excluded.stamp
+WHERE excluded.depth >= positions.depth
+"""
+
+
+class PositionStore:
+    def __init__(self, path, geometry=DEFAULT_GEOMETRY, max_entries=1000000, batch_size=256):
+        """
+        Open a SQLite file of search results, creating it if needed.
+
+        Results are keyed by canonical position key, so a position and its mirror
+        image share one row, and scores are for the side to move. New results are
+        held in memory and written in one transaction per `batch_size` results,
+        or on flush() and close(). The file uses write-ahead logging, so any
+        number of processes can read it while one writes. Once it holds more
+        than `max_entries` rows, the shallowest and then oldest are removed.
+
+        Args:
+            path: Path of the database file
+            geometry: The board shape; a file is only used with the shape it was created for
+            max_entries: Most rows kept in the file
+            batch_size: Results held in memory before they are written
+
+        Raises:
+            ValueError: If the file is for another board shape, or the keys do not fit in 63 bits
+        """
+        if geometry.key_bits > 63:
+            raise ValueError("a position store needs keys of at most 63 bits, not %d" % geometry.key_bits)
+        self.path = path
+        self.geometry = geometry
+        self.max_entries = max_entries
+        self.batch_size = batch_size
+        self._pending = {}
+        self._lock = threading.Lock()
+
+        # Transactions are started explicitly, so writers take the write lock up front
+        self._connection = sqlite3.connect(path, timeout=30.0, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        with self._transaction():
+            for statement in filter(None, (s.strip() for s in _SCHEMA.split(";"))):
+                self._connection.execute(statement)
+            shape = {"version": VERSION, "rows": geometry.rows, "columns": geometry.columns,
+                     "connect": geometry.connect}
+            self._connection.executemany("INSERT OR IGNORE INTO meta (name, value) VALUES (?, ?)", shape.items())
+            stored = dict(self._connection.execute("SELECT name, value FROM meta"))
+        if stored != shape:
+            self._connection.close()
+            raise ValueError("%s holds positions for %d rows, %d columns, connect %d (version %d), not %r" % (
+                path, stored.get("rows"), stored.get("columns"), stored.get("connect"), stored.get("version"),
+                geometry))
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @contextmanager
+    def _transaction(self):
+        """Run a block as one IMMEDIATE transaction, rolled back if it raises."""
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._connection.execute("COMMIT")
+
+    def lookup(self, position):
+        """
+        Look up a position.
+
+        Args:
+            position: The BitBoard to look up
+
+        Returns:
+            A (column, score, depth, outcome, plies) tuple for the side to move,
+            or None if the position is not stored. outcome and plies are None
+            unless the position was solved.
+        """
+        key, mirrored = position.canonical_key()
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is None:
+                entry = self._connection.execute(
+                    "SELECT depth, score, move, outcome, plies FROM positions WHERE key = ?", (key,)).fetchone()
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        depth, score, col, outcome, plies = entry
+        if mirrored:
+            col = self.geometry.columns - 1 - col
+        return col, score, depth, outcome, plies
+
+    def put(self, position, column, score, depth, outcome=None, plies=None):
+        """
+        Record a search result, to be written with the next batch.
+
+        Args:
+            position: The BitBoard that was searched
+            column: The best column found
+            score: Its score for the side to move
+            depth: Moves searched after the best move
+            outcome: WIN, DRAW or LOSS if the result is proven
+            plies: Moves left in the game with best play, if solved exactly
+        """
+        key, mirrored = position.canonical_key()
+        if mirrored:
+            column = self.geometry.columns - 1 - column
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None or depth >= pending[0]:
+                self._pending[key] = (depth, score, column, outcome, plies)
+            if len(self._pending) < self.batch_size:
+                return
+        self.flush()
+
+    def flush(self):
+        """Write the pending results in one transaction, then evict rows if the store is over its limit."""
+        with self._lock:
+            if not self._pending:
+                return
+            stamp = int(time.time())
+            rows = [(key, depth, score, col, outcome, plies, stamp)
+                    for key, (depth, score, col, outcome, plies) in self._pending.items()]
+            with self._transaction():
+                self._connection.executemany(_UPSERT, rows)
+                count = self._connection.execute("SELECT COUNT(*) FROM positions").fetchone()[0]
+                if count > self.max_entries:
+                    excess = count - int(self.max_entries * EVICT_TO)
+                    self._connection.execute("DELETE FROM positions WHERE key IN "
+                                             "(SELECT key FROM positions ORDER BY depth, stamp LIMIT ?)", (excess,))
+                    self.evictions += excess
+            self._pending = {}
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM positions").fetchone()[0]
+
+    def close(self):
+        """Write any pending results and close the file."""
+        if self._connection is None:
+            return
+        self.flush()
+        self._connection.close()
+        self._connection = None
+
@@ -0,0 +1,169 @@
+# shared_transposition.py - Contains the SharedTranspositionTable class, a transposition table shared between processes
+
+from multiprocessing import shared_memory
+from engine.transposition import NO_MOVE, ENTRY_SIZE, _HASH_MULTIPLIER, _HASH_MASK
+
+# The block starts with two header words: the search generation and the table's size in bits
+HEADER_WORDS = 2
+
+
+class SharedTranspositionTable:
+    def __init__(self, size_mb=8, key_bits=64, name=None):
+        """
+        Create a transposition table in shared memory, or attach to one.
+
+        Each slot is two 64-bit words: the packed data and the position key
+        XORed with the data. Bits 0-31 of the data hold the value, then one
+        byte each for the depth, bound, move and generation, with negative
+        numbers in two's complement. Writers store both words without a lock, so a
+        reader in another process can see one word from one store and one from
+        another. The XOR check then no longer gives back the key and the torn
+        slot reads as a miss, the same as any other collision.
+
+        Only search results from the same side are comparable, since minimax
+        scores are from the AI's point of view. Share a table between players
+        of the same piece only.
+
+        The process that creates the table owns it, advances its generation
+        and removes the block on close(). Processes that attach should be started by the owner through
+        multiprocessing, so they share its resource tracker and do not remove
+        the block when they exit.
+
+        Args:
+            size_mb: Memory budget in megabytes, for a new table
+            key_bits: Bits in a position key, at most 64
+            name: Name of an existing table to attach to, or None to create one
+
+        Raises:
+            ValueError: If the keys do not fit in 64 bits
+        """
+        if key_bits > 64:
+            raise ValueError("a shared transposition table needs keys of at most 64 bits, not %d" % key_bits)
+
+        self.owner = name is None
+        if self.owner:
+            slots = max(1, int(size_mb * 1024 * 1024) // ENTRY_SIZE)
+            bits = slots.bit_length() - 1
+            self._memory = shared_memory.SharedMemory(create=True,
+                                                      size=(HEADER_WORDS + 2 * (1 << bits)) * 8)
+            self._words = self._memory.buf.cast('Q')
+            self._words[1] = bits
+        else:
+            self._memory = shared_memory.SharedMemory(name=name)
+            self._words = self._memory.buf.cast('Q')
+        self.name = self._memory.name
+        self.bits = self._words[1]
+        self.size = 1 << self.bits
+
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+        self.replacements = 0
+
+    @property
+    def generation(self):
+        """The current search generation, shared by every process."""
+        return self._words[0]
+
+    def _index(self, key):
+        """Map a position key to the slot's data word with multiplicative hashing."""
+        slot = ((key * _HASH_MULTIPLIER) & _HASH_MASK) >> (64 - self.bits) if self.bits else 0
+        return HEADER_WORDS + 2 * slot
+
+    def new_search(self):
+        """
+        Age the table so entries from earlier searches, by any process, are replaced first.
+
+        Only the owner advances the generation, once per root search. Processes
+        that attach store with the owner's current generation, so a parallel
+        search's tasks keep each other's deeper results.
+        """
+        if self.owner:
+            self._words[0] = (self._words[0] + 1) & 0xFF
+
+    def probe(self, key):
+        """
+        Look up a position.
+
+        Args:
+            key: The position key
+
+        Returns:
+            A (value, depth, bound, move) tuple, or None on a miss
+        """
+        words = self._words
+        index = self._index(key)
+        data = words[index]
+        if data and words[index + 1] ^ data == key:
+            self.hits += 1
+            value = data & 0xFFFFFFFF
+            depth = (data >> 32) & 0xFF
+            move = (data >> 48) & 0xFF
+            return (value - (1 << 32) if value & 0x80000000 else value, depth - 256 if depth & 0x80 else depth,
+                    (data >> 40) & 0xFF, move - 256 if move & 0x80 else move)
+
+        self.misses += 1
+        if data:
+            self.collisions += 1
+        return None
+
+    def store(self, key, value, depth, bound, move=NO_MOVE):
+        """
+        Store a search result, keeping deeper results from the current search.
+
+        Uses the same replacement rule as TranspositionTable. Two processes
+        storing into one slot at once can leave a torn slot, which probes
+        reject until the next store.
+
+        Args:
+            key: The position key
+            value: The score found for the position
+            depth: The remaining depth the score was searched to
+            bound: EXACT, LOWER_BOUND or UPPER_BOUND
+            move: The best column found, or NO_MOVE
+        """
+        words = self._words
+        index = self._index(key)
+        generation = words[0]
+        old = words[index]
+        if old and words[index + 1] ^ old != key:
+            old_depth = (old >> 32) & 0xFF
+            if old >> 56 == generation and depth < (old_depth - 256 if old_depth & 0x80 else old_depth):
+                return
+            self.replacements += 1
+
+        data = ((value & 0xFFFFFFFF) | (depth & 0xFF) << 32 | bound << 40 | (move & 0xFF) << 48
+                | generation << 56)
+        words[index] = data
+        words[index + 1] = key ^ data
+        self.stores += 1
+
+    def clear(self):
+        """Empty the table for every process and reset this process's counters."""
+        self._memory.buf[HEADER_WORDS * 8:] = bytes(len(self._memory.buf) - HEADER_WORDS * 8)
+        self._words[0] = 0
+        self.hits = self.misses = self.collisions = self.stores = self.replacements = 0
+
+    def stats(self):
+        """Return this process's counters as a dictionary."""
+        probes = self.hits + self.misses
+        return {
+            "size": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "collisions": self.collisions,
+            "stores": self.stores,
+            "replacements": self.replacements,
+            "hit_rate": self.hits / probes if probes else 0.0,
+        }
+
+    def close(self):
+        """Detach from the table, and remove it if this process created it."""
+        if self._words is None:
+            return
+        self._words.release()
+        self._words = None
+        self._memory.close()
+        if self.owner:
+            self._memory.unlink()
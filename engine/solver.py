@@ -0,0 +1,314 @@
+# solver.py - Contains the Solver class for exact win/draw/loss search
+
+import time
+from collections import namedtuple
+from engine.geometry import DEFAULT_GEOMETRY
+from engine.transposition import TranspositionTable, LOWER_BOUND, UPPER_BOUND
+
+CELL_COUNT = DEFAULT_GEOMETRY.cells
+
+# The outcome of a solved position for the side to move
+WIN = "win"
+DRAW = "draw"
+LOSS = "loss"
+
+Solution = namedtuple("Solution", ["column", "outcome", "score", "plies"])
+Solution.__doc__ = """Exact result of a solved position.
+
+column: Best column for the side to move
+outcome: WIN, DRAW or LOSS for the side to move
+score: Positive if the side to move wins, larger the sooner it wins
+plies: Moves left in the game with best play from both sides, counting the last one
+"""
+
+
+def _winning_cells_function(geometry):
+    """
+    Build a function that returns the empty cells completing a line for some stones.
+
+    Args:
+        geometry: The board shape
+
+    Returns:
+        A function of (stones, mask) returning a bit mask of winning cells
+    """
+    board_mask = geometry.board_mask
+    height = geometry.column_height
+    connect = geometry.connect
+
+    if connect == 4:
+        shifts = (height, height - 1, height + 1)
+
+        def winning_cells(stones, mask):
+            # Vertical
+            result = (stones << 1) & (stones << 2) & (stones << 3)
+
+            # Horizontal and both diagonals
+            for shift in shifts:
+                pair = (stones << shift) & (stones << (2 * shift))
+                result |= pair & (stones << (3 * shift))
+                result |= pair & (stones >> shift)
+                pair = (stones >> shift) & (stones >> (2 * shift))
+                result |= pair & (stones << shift)
+                result |= pair & (stones >> (3 * shift))
+
+            return result & (board_mask ^ mask)
+
+        return winning_cells
+
+    # Any other line length: for every direction and every gap position in the
+    # line, a cell wins if all the other cells of the line hold stones.
+    offsets = [(shift, gap) for shift in geometry.directions for gap in range(connect)]
+
+    def winning_cells(stones, mask):
+        result = 0
+        for shift, gap in offsets:
+            line = -1
+            for i in range(connect):
+                if i < gap:
+                    line &= stones << ((gap - i) * shift)
+                elif i > gap:
+                    line &= stones >> ((i - gap) * shift)
+            result |= line
+        return result & (board_mask ^ mask)
+
+    return winning_cells
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time budget runs out or the search is stopped."""
+
+
+def _half(value):
+    """Halve an integer rounding towards zero."""
+    return -(-value // 2) if value < 0 else value // 2
+
+
+class Solver:
+    def __init__(self, tt_size_mb=16, geometry=DEFAULT_GEOMETRY):
+        """
+        Initialize an exact Connect 4 solver.
+
+        Uses negamax with alpha-beta, null-window probes that narrow the score
+        range, a transposition table of lower and upper bounds, and moves
+        ordered by how many threats they create. Scores follow the usual
+        convention: positive when the side to move wins, and larger the fewer
+        of its own stones it needs to win.
+
+        Args:
+            tt_size_mb: Memory budget of the solver's transposition table
+            geometry: The board shape
+        """
+        self.geometry = geometry
+        self.tt = TranspositionTable(tt_size_mb, geometry.key_bits)
+        self.nodes = 0
+        self._stop_event = None
+        self._deadline = None
+        self._winning_cells = _winning_cells_function(geometry)
+        self._center_column_masks = tuple(geometry.column_masks[col] for col in geometry.center_order)
+
+    def _negamax(self, current, mask, moves, alpha, beta):
+        """Return the exact score if it lies in (alpha, beta), otherwise a bound on it."""
+        # Check the clock and the stop event every thousand or so nodes
+        self.nodes += 1
+        if not self.nodes & 0x3FF and self._should_stop():
+            raise SearchTimeout()
+        geometry = self.geometry
+        cell_count = geometry.cells
+        winning_cells = self._winning_cells
+        possible = (mask + geometry.bottom_mask) & geometry.board_mask
+        opponent_wins = winning_cells(current ^ mask, mask)
+        forced = possible & opponent_wins
+        if forced:
+            if forced & (forced - 1):
+                return -((cell_count - moves) // 2)  # Two threats cannot both be blocked
+            possible = forced
+        # Never play directly below a cell the opponent needs
+        candidates = possible & ~(opponent_wins >> 1)
+        if not candidates:
+            return -((cell_count - moves) // 2)
+
+        if moves >= cell_count - 2:
+            return 0  # Neither side can win with the last two moves
+
+        lower = -((cell_count - 2 - moves) // 2)
+        if alpha < lower:
+            alpha = lower
+            if alpha >= beta:
+                return alpha
+        upper = (cell_count - 1 - moves) // 2
+
+        key = current + mask
+        entry = self.tt.probe(key)
+        if entry is not None:
+            value, _, bound, _ = entry
+            if bound == LOWER_BOUND:
+                if alpha < value:
+                    alpha = value
+                    if alpha >= beta:
+                        return alpha
+            elif value < upper:
+                upper = value
+        if beta > upper:
+            beta = upper
+            if alpha >= beta:
+                return beta
+
+        # Try the moves that create the most threats first, center-out on ties
+        ordered = []
+        for col_mask in self._center_column_masks:
+            move = candidates & col_mask
+            if move:
+                threats = winning_cells(current | move, mask).bit_count()
+                position = len(ordered)
+                while position and ordered[position - 1][0] < threats:
+                    position -= 1
+                ordered.insert(position, (threats, move))
+
+        for _, move in ordered:
+            score = -self._negamax(current ^ mask, mask | move, moves + 1, -beta, -alpha)
+            if score >= beta:
+                self.tt.store(key, score, cell_count - moves, LOWER_BOUND)
+                return score
+            if score > alpha:
+                alpha = score
+
+        self.tt.store(key, alpha, cell_count - moves, UPPER_BOUND)
+        return alpha
+
+    def _should_stop(self):
+        """Check if the deadline has passed or the caller asked the solver to stop."""
+        if self._stop_event is not None and self._stop_event.is_set():
+            return True
+        return self._deadline is not None and time.perf_counter() >= self._deadline
+
+    def score(self, current, mask, moves, stop_event=None, deadline=None):
+        """
+        Return the exact score of a position that is not yet won.
+
+        Args:
+            current: Stones of the side to move
+            mask: Every occupied cell
+            moves: Number of stones on the board
+            stop_event: Optional threading.Event, checked every thousand or so nodes
+            deadline: Optional time.perf_counter() value to give up at
+
+        Raises:
+            SearchTimeout: If the stop event is set or the deadline passes
+        """
+        self._stop_event, self._deadline = stop_event, deadline
+        try:
+            return self._score(current, mask, moves)
+        finally:
+            self._stop_event, self._deadline = None, None
+
+    def _score(self, current, mask, moves):
+        """Return the exact score of a position that is not yet won, as score() does."""
+        cell_count = self.geometry.cells
+        possible = (mask + self.geometry.bottom_mask) & self.geometry.board_mask
+        if self._winning_cells(current, mask) & possible:
+            return (cell_count + 1 - moves) // 2
+
+        low = -((cell_count - moves) // 2)
+        high = (cell_count + 1 - moves) // 2
+        while low < high:
+            middle = low + (high - low) // 2
+            # Probe closer to zero first, where most positions are decided
+            if middle <= 0 and _half(low) < middle:
+                middle = _half(low)
+            elif middle >= 0 and _half(high) > middle:
+                middle = _half(high)
+            result = self._negamax(current, mask, moves, middle, middle + 1)
+            if result <= middle:
+                high = result
+            else:
+                low = result
+        return low
+
+    def solve(self, position, stop_event=None, deadline=None):
+        """
+        Find the best move and exact outcome of a position.
+
+        Args:
+            position: The BitBoard to solve, with at least one playable column
+            stop_event: Optional threading.Event, checked every thousand or so nodes
+            deadline: Optional time.perf_counter() value to give up at
+
+        Returns:
+            A Solution for the side to move
+
+        Raises:
+            SearchTimeout: If the stop event is set or the deadline passes. The
+                bounds found so far stay in the transposition table.
+        """
+        self.tt.new_search()
+        self.nodes = 0
+        self._stop_event, self._deadline = stop_event, deadline
+        try:
+            return self._solve(position)
+        finally:
+            self._stop_event, self._deadline = None, None
+
+    def _solve(self, position):
+        """Find the best move and exact outcome of a position, as solve() does."""
+        best_col, best_score = None, None
+        cell_count = self.geometry.cells
+        for col in self.geometry.center_order:
+            if not position.can_play(col):
+                continue
+            if position.is_winning_move(col):
+                best_col, best_score = col, (cell_count + 1 - position.moves) // 2
+                break
+            child = position.copy()
+            child.play(col)
+            if child.is_full():
+                score = 0
+            else:
+                score = -self._score(child.current, child.mask, child.moves)
+            if best_score is None or score > best_score:
+                best_col, best_score = col, score
+
+        return Solution(best_col, *describe(best_score, position.moves, cell_count))
+
+    def principal_variation(self, position, stop_event=None, deadline=None):
+        """
+        Return the line of best moves from a position to the end of the game.
+
+        Args:
+            position: The BitBoard to start from, left unchanged
+            stop_event: Optional threading.Event that makes the solver raise SearchTimeout
+            deadline: Optional time.perf_counter() value at which the solver gives up
+
+        Returns:
+            List of columns, empty if the game is already over
+        """
+        line = []
+        position = position.copy()
+        while not position.is_full() and not position.last_move_won():
+            col = self.solve(position, stop_event, deadline).column
+            line.append(col)
+            position.play(col)
+        return line
+
+
+def describe(score, moves, cell_count=CELL_COUNT):
+    """
+    Turn a solver score into an outcome and the number of plies left.
+
+    Args:
+        score: Exact score for the side to move
+        moves: Number of stones on the board
+        cell_count: Number of cells on the board
+
+    Returns:
+        Tuple of (outcome, score, plies)
+    """
+    if score == 0:
+        return DRAW, 0, cell_count - moves
+    # The game ends when the winner drops stone number (cell_count + 1 - 2 * |score|)
+    # or the one after, whichever has the winner's parity.
+    last_stone = cell_count + 1 - 2 * abs(score)
+    winner_parity = moves % 2 if score > 0 else (moves + 1) % 2
+    if (last_stone - 1) % 2 != winner_parity:
+        last_stone += 1
+    return (WIN if score > 0 else LOSS), score, last_stone - moves
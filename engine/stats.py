@@ -0,0 +1,108 @@
+# stats.py - Contains the SearchStats class for optional search instrumentation, and search reports
+
+import time
+from collections import namedtuple
+
+# Kinds of SearchProgress reports
+ROOT_MOVE = "root_move"
+ITERATION = "iteration"
+
+SearchProgress = namedtuple("SearchProgress", ["kind", "depth", "column", "score", "nodes", "seconds", "pv"])
+SearchProgress.__doc__ = """A report passed to the search callback.
+
+kind: ROOT_MOVE after each root move is searched, ITERATION after each completed depth
+depth: Moves searched after the root move
+column: The root move, or the best root move so far for ITERATION
+score: Its score from the AI's point of view. A root move that cannot beat the
+    best move before it reports an upper bound instead.
+nodes: Nodes searched for this root move or iteration
+seconds: Time spent on this root move, or since the search started for ITERATION
+pv: The principal variation as a list of columns for ITERATION, otherwise None
+"""
+
+
+ColumnAnalysis = namedtuple("ColumnAnalysis", ["column", "score", "pv", "outcome", "plies", "depth"])
+ColumnAnalysis.__doc__ = """The analysis of one move, from AIPlayer.analyze.
+
+column: The move
+score: Its exact minimax score for the side to move, +/- WIN_SCORE for a proven win or loss
+pv: The expected line, starting with the move
+outcome: WIN, DRAW or LOSS for the side to move if proven, otherwise None
+plies: Moves left in the game with best play, counting this one, if solved exactly
+depth: Moves searched after this one
+"""
+
+
+class SearchStats:
+    def __init__(self, cells):
+        """
+        Initialize empty statistics for searches on a board with `cells` cells.
+
+        AIPlayer only fills these in while its `stats` attribute is set, by
+        switching to a counting version of its search. Searches without stats
+        run the plain search and pay nothing for it.
+        """
+        self.cells = cells
+        self.reset()
+
+    def reset(self):
+        """Clear the statistics before a new search."""
+        self.nodes = 0
+        self.leaf_evals = 0
+        self.max_depth = 0
+        self.depth = None
+        self.nodes_by_ply = [0] * (self.cells + 1)
+        self.cutoffs_by_ply = [0] * (self.cells + 1)
+        self.root_moves = []
+        self.iterations = []
+        self.pv = []
+        self.seconds = 0.0
+        self.solved = False
+        self._start = time.perf_counter()
+
+    def elapsed(self):
+        """Return the seconds since the search started."""
+        return time.perf_counter() - self._start
+
+    @property
+    def branching_factor(self):
+        """
+        Effective branching factor of the last completed iteration.
+
+        The number B for which a uniform tree of the searched depth, counting
+        the root move, would hold as many nodes as were searched.
+        """
+        if not self.iterations:
+            return None
+        last = self.iterations[-1]
+        return last.nodes ** (1.0 / (last.depth + 1)) if last.nodes else 0.0
+
+    @property
+    def cutoff_rate(self):
+        """Fraction of interior nodes that failed high, ending their move loop early."""
+        interior = self.nodes - self.leaf_evals
+        return sum(self.cutoffs_by_ply) / interior if interior > 0 else 0.0
+
+    def report(self):
+        """Return a multi-line summary of the last search."""
+        lines = ["nodes %d, leaf evals %d, depth %s, max depth %d, %.3fs" % (
+            self.nodes, self.leaf_evals, self.depth, self.max_depth, self.seconds)]
+        if self.solved:
+            lines.append("solved exactly, best move %s" % (self.pv[0] if self.pv else None))
+            return "\n".join(lines)
+        if self.iterations:
+            lines.append("branching factor %.2f, cutoff rate %.1f%%, pv %s" % (
+                self.branching_factor, self.cutoff_rate * 100, " ".join(map(str, self.pv))))
+        for it in self.iterations:
+            lines.append("  depth %2d: column %s score %s, %d nodes, %.3fs" % (
+                it.depth, it.column, it.score, it.nodes, it.seconds))
+        depth = self.iterations[-1].depth if self.iterations else None
+        for move in self.root_moves:
+            if move.depth == depth:
+                lines.append("  root move %d: score %s, %d nodes, %.4fs" % (
+                    move.column, move.score, move.nodes, move.seconds))
+        for ply in range(1, self.max_depth + 1):
+            if self.nodes_by_ply[ply]:
+                lines.append("  ply %2d: %d nodes, %d cutoffs" % (
+                    ply, self.nodes_by_ply[ply], self.cutoffs_by_ply[ply]))
+        return "\n".join(lines)
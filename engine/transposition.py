@@ -0,0 +1,131 @@
+# transposition.py - Contains the TranspositionTable class to cache search results
+
+from array import array
+
+# Bound types stored with each entry (0 marks an empty slot)
+EMPTY_ENTRY = 0
+EXACT = 1
+LOWER_BOUND = 2
+UPPER_BOUND = 3
+
+NO_MOVE = -1
+
+# Bytes per entry: key (8) + value (4) + depth, bound, move, generation (1 each)
+ENTRY_SIZE = 16
+
+_HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+_HASH_MASK = (1 << 64) - 1
+
+
+class TranspositionTable:
+    def __init__(self, size_mb=8, key_bits=64):
+        """
+        Initialize a fixed-size transposition table.
+
+        Entries live in flat typed arrays so the memory used is fixed up front.
+        The number of slots is the largest power of two that fits the budget.
+
+        Args:
+            size_mb: Memory budget in megabytes
+            key_bits: Bits in a position key; keys of large boards that do not
+                fit in 64 bits are kept in a list instead of a typed array
+        """
+        slots = max(1, int(size_mb * 1024 * 1024) // ENTRY_SIZE)
+        self.bits = slots.bit_length() - 1
+        self.size = 1 << self.bits
+
+        if key_bits <= 64:
+            self.keys = array('Q', bytes(8 * self.size))
+        else:
+            self.keys = [0] * self.size
+        self.values = array('i', bytes(4 * self.size))
+        self.depths = array('b', bytes(self.size))
+        self.bounds = array('B', bytes(self.size))
+        self.moves = array('b', bytes(self.size))
+        self.generations = array('B', bytes(self.size))
+        self.generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+        self.replacements = 0
+
+    def _index(self, key):
+        """Map a position key to a slot with multiplicative hashing."""
+        return ((key * _HASH_MULTIPLIER) & _HASH_MASK) >> (64 - self.bits) if self.bits else 0
+
+    def new_search(self):
+        """Age the table so entries from earlier searches are replaced first."""
+        self.generation = (self.generation + 1) & 0xFF
+
+    def probe(self, key):
+        """
+        Look up a position.
+
+        Args:
+            key: The position key
+
+        Returns:
+            A (value, depth, bound, move) tuple, or None on a miss
+        """
+        index = self._index(key)
+        bound = self.bounds[index]
+        if bound != EMPTY_ENTRY and self.keys[index] == key:
+            self.hits += 1
+            return self.values[index], self.depths[index], bound, self.moves[index]
+
+        self.misses += 1
+        if bound != EMPTY_ENTRY:
+            self.collisions += 1
+        return None
+
+    def store(self, key, value, depth, bound, move=NO_MOVE):
+        """
+        Store a search result, keeping deeper results from the current search.
+
+        An occupied slot is overwritten when it holds the same position, when it
+        was written by an earlier search, or when the new result is at least as
+        deep.
+
+        Args:
+            key: The position key
+            value: The score found for the position
+            depth: The remaining depth the score was searched to
+            bound: EXACT, LOWER_BOUND or UPPER_BOUND
+            move: The best column found, or NO_MOVE
+        """
+        index = self._index(key)
+        if self.bounds[index] != EMPTY_ENTRY:
+            if (self.keys[index] != key and self.generations[index] == self.generation
+                    and depth < self.depths[index]):
+                return
+            if self.keys[index] != key:
+                self.replacements += 1
+
+        self.keys[index] = key
+        self.values[index] = value
+        self.depths[index] = depth
+        self.bounds[index] = bound
+        self.moves[index] = move
+        self.generations[index] = self.generation
+        self.stores += 1
+
+    def clear(self):
+        """Empty the table and reset its counters."""
+        self.bounds = array('B', bytes(self.size))
+        self.generation = 0
+        self.hits = self.misses = self.collisions = self.stores = self.replacements = 0
+
+    def stats(self):
+        """Return the table's counters as a dictionary."""
+        probes = self.hits + self.misses
+        return {
+            "size": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "collisions": self.collisions,
+            "stores": self.stores,
+            "replacements": self.replacements,
+            "hit_rate": self.hits / probes if probes else 0.0,
+        }
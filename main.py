@@ -1,48 +1,57 @@
 # main.py - Main entry point for the Connect 4 game
 
+import argparse
 import pygame
 import sys
+import time
 from utils.constants import *
+from engine.geometry import get_geometry
 from components.game_state import GameState
 from components.renderer import Renderer
 
 
-def show_menu(screen, menu_font, button_font):
+def show_menu(screen, menu_font, button_font, gamestate=None):
     """
     Show a menu to select game mode and difficulty.
 
+    Closing the window exits the program, closing `gamestate` first so its AI
+    worker stops and its position store is written.
+
     Returns:
         Tuple of (game_mode, ai_difficulty)
     """
+    width, height = screen.get_size()
     screen.fill(BLACK)
 
     # Draw title
     title = menu_font.render("Connect 4", True, BLUE)
-    screen.blit(title, (WIDTH // 2 - title.get_width() // 2, 50))
+    screen.blit(title, (width // 2 - title.get_width() // 2, 50))
 
     # Draw game mode options
     mode_text = menu_font.render("Select Game Mode:", True, (255, 255, 255))
-    screen.blit(mode_text, (WIDTH // 2 - mode_text.get_width() // 2, 150))
+    screen.blit(mode_text, (width // 2 - mode_text.get_width() // 2, 150))
 
-    # PvP Button
-    pvp_rect = pygame.Rect(WIDTH // 2 - 150, 220, 300, 50)
+    # PvP Button, narrowed to fit small boards
+    button_width = min(300, width - 20)
+    pvp_rect = pygame.Rect(width // 2 - button_width // 2, 220, button_width, 50)
     pygame.draw.rect(screen, BLUE, pvp_rect)
     pvp_text = button_font.render("Player vs Player", True, (255, 255, 255))
-    screen.blit(pvp_text, (WIDTH // 2 - pvp_text.get_width() // 2, 235))
+    screen.blit(pvp_text, (width // 2 - pvp_text.get_width() // 2, 235))
 
     # PvC Button
-    pvc_rect = pygame.Rect(WIDTH // 2 - 150, 290, 300, 50)
+    pvc_rect = pygame.Rect(width // 2 - button_width // 2, 290, button_width, 50)
     pygame.draw.rect(screen, BLUE, pvc_rect)
     pvc_text = button_font.render("Player vs Computer", True, (255, 255, 255))
-    screen.blit(pvc_text, (WIDTH // 2 - pvc_text.get_width() // 2, 305))
+    screen.blit(pvc_text, (width // 2 - pvc_text.get_width() // 2, 305))
 
     # Prepare difficulty options (initially hidden)
     difficulty_text = menu_font.render("Select Difficulty:", True, (255, 255, 255))
 
-    # Better spacing for difficulty buttons - more horizontal space between them
-    easy_rect = pygame.Rect(WIDTH // 2 - 275, 450, 150, 50)
-    medium_rect = pygame.Rect(WIDTH // 2 - 75, 450, 150, 50)
-    hard_rect = pygame.Rect(WIDTH // 2 + 125, 450, 150, 50)
+    # Difficulty buttons, each centered in a quarter of the window so all four fit on any board width
+    slot = width // 4
+    difficulty_width = min(150, slot - 10)
+    easy_rect, medium_rect, hard_rect, perfect_rect = (
+        pygame.Rect(i * slot + (slot - difficulty_width) // 2, 450, difficulty_width, 50) for i in range(4))
 
     difficulty_visible = False
 
@@ -52,6 +61,8 @@ def show_menu(screen, menu_font, button_font):
     while True:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                if gamestate is not None:
+                    gamestate.close()
                 pygame.quit()
                 sys.exit()
 
@@ -67,10 +78,10 @@ def show_menu(screen, menu_font, button_font):
                     difficulty_visible = True
 
                     # Clear the area below the buttons to avoid overlapping text
-                    pygame.draw.rect(screen, BLACK, (0, 360, WIDTH, HEIGHT - 360))
+                    pygame.draw.rect(screen, BLACK, (0, 360, width, height - 360))
 
                     # Display the difficulty text with more vertical space
-                    screen.blit(difficulty_text, (WIDTH // 2 - difficulty_text.get_width() // 2, 380))
+                    screen.blit(difficulty_text, (width // 2 - difficulty_text.get_width() // 2, 380))
 
                     # Draw difficulty buttons
                     pygame.draw.rect(screen, RED, easy_rect)
@@ -88,6 +99,11 @@ def show_menu(screen, menu_font, button_font):
                     screen.blit(hard_text, (hard_rect.centerx - hard_text.get_width() // 2,
                                             hard_rect.centery - hard_text.get_height() // 2))
 
+                    pygame.draw.rect(screen, YELLOW, perfect_rect)
+                    perfect_text = button_font.render("Perfect", True, (255, 255, 255))
+                    screen.blit(perfect_text, (perfect_rect.centerx - perfect_text.get_width() // 2,
+                                               perfect_rect.centery - perfect_text.get_height() // 2))
+
                     pygame.display.update()
 
                 # Check if a difficulty was selected
@@ -98,14 +114,43 @@ def show_menu(screen, menu_font, button_font):
                         return "pvc", 2
                     elif hard_rect.collidepoint(mouse_pos):
                         return "pvc", 3
+                    elif perfect_rect.collidepoint(mouse_pos):
+                        return "pvc", 4
+
+
+def parse_args():
+    """Read the board size and line length from the command line."""
+    parser = argparse.ArgumentParser(description="Play Connect 4.")
+    parser.add_argument("--rows", type=int, default=ROW_COUNT, help="board rows (default: %d)" % ROW_COUNT)
+    parser.add_argument("--columns", type=int, default=COLUMN_COUNT,
+                        help="board columns (default: %d)" % COLUMN_COUNT)
+    parser.add_argument("--connect", type=int, default=WINDOW_LENGTH,
+                        help="pieces in a row needed to win (default: %d)" % WINDOW_LENGTH)
+    parser.add_argument("--fps", type=int, default=FPS, help="target frames per second (default: %d)" % FPS)
+    parser.add_argument("--show-frame-time", action="store_true",
+                        help="show the measured frame rate and frame time in the window title")
+    parser.add_argument("--ponder", action="store_true",
+                        help="let the computer search its replies while you think")
+    parser.add_argument("--store", metavar="PATH",
+                        help="keep the computer's search results in this file and reuse them in later games")
+    args = parser.parse_args()
+    try:
+        get_geometry(args.rows, args.columns, args.connect)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.fps < 1:
+        parser.error("--fps must be at least 1")
+    return args
 
 
 def main():
+    args = parse_args()
+
     # Initialize pygame
     pygame.init()
 
-    # Set up the display
-    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    # Set up the display, with an extra row for dropping pieces
+    screen = pygame.display.set_mode((args.columns * SQUARE_SIZE, (args.rows + 1) * SQUARE_SIZE))
     pygame.display.set_caption('Connect 4')
 
     # Initialize fonts
@@ -119,33 +164,78 @@ def main():
     game_mode, ai_difficulty = show_menu(screen, menu_font, button_font)
 
     # Initialize game state with selected mode
-    gamestate = GameState(game_mode=game_mode, ai_difficulty=ai_difficulty)
+    gamestate = GameState(game_mode=game_mode, ai_difficulty=ai_difficulty,
+                          rows=args.rows, columns=args.columns, connect=args.connect,
+                          ai_options={"store_path": args.store} if args.store else None)
+
+    def draw_turn_indicator():
+        """Show whose turn it is, or that the AI is still thinking."""
+        if gamestate.ai_thinking:
+            renderer.draw_ai_thinking_indicator(thinking_dots)
+        else:
+            renderer.draw_player_turn_indicator(gamestate.current_player, is_ai=gamestate.is_ai_turn())
+
+    def new_game():
+        """Show the menu and start the round the player picks."""
+        nonlocal ai_difficulty
+        gamestate.cancel_ai_move()
+        game_mode, ai_difficulty = show_menu(screen, menu_font, button_font, gamestate)
+        gamestate.restart_game(game_mode=game_mode, ai_difficulty=ai_difficulty)
+        renderer.invalidate()
+        renderer.draw_board(gamestate.get_board_grid())
+        draw_turn_indicator()
+        if gamestate.game_mode == "pvc":
+            renderer.draw_difficulty_indicator(ai_difficulty)
+
+    def after_move():
+        """Redraw the board after a move, and start a new round if the game is over."""
+        renderer.draw_board(gamestate.get_board_grid())
+        if gamestate.status != PLAYING:
+            renderer.draw_game_over_message(gamestate.status)
+            renderer.flush()
+            pygame.time.wait(3000)
+            new_game()
+        else:
+            draw_turn_indicator()
 
     # Draw initial board
+    thinking_dots = 0
+    renderer.invalidate()
     renderer.draw_board(gamestate.get_board_grid())
-    renderer.draw_player_turn_indicator(gamestate.current_player,
-                                        is_ai=(gamestate.game_mode == "pvc" and gamestate.current_player == PLAYER_2))
+    draw_turn_indicator()
     if gamestate.game_mode == "pvc":
         renderer.draw_difficulty_indicator(ai_difficulty)
 
-    # Main game loop
+    # Main game loop, paced to args.fps frames per second. The AI searches on a
+    # background thread and each frame checks whether its move is ready, so the
+    # window keeps handling events. With nothing to do, the loop sleeps until
+    # the next event instead of waking up every frame.
+    clock = pygame.time.Clock()
+    stats_start = time.perf_counter()
+    frames, busy_time = 0, 0.0
     while True:
-        for event in pygame.event.get():
+        if gamestate.is_ai_turn() or gamestate.ai_thinking:
+            events = pygame.event.get()
+        else:
+            events = [pygame.event.wait()] + pygame.event.get()
+        frame_start = time.perf_counter()
+
+        # Mouse motion is merged into one preview update per frame, at the last position
+        motion_x = None
+        for event in events:
             if event.type == pygame.QUIT:
+                gamestate.close()
                 pygame.quit()
                 sys.exit()
 
-            # Show piece preview during mouse movement (only for human players)
-            if event.type == pygame.MOUSEMOTION and (gamestate.current_player == PLAYER_1 or gamestate.game_mode == "pvp"):
-                x_pos = event.pos[0]
-                renderer.draw_piece_preview(x_pos, gamestate.current_player)
-                renderer.draw_player_turn_indicator(gamestate.current_player,
-                                                    is_ai=(gamestate.game_mode == "pvc" and gamestate.current_player == PLAYER_2))
+            if event.type == pygame.MOUSEMOTION and not gamestate.game_over:
+                motion_x = event.pos[0]
 
             # Process player moves (only for human players)
-            if event.type == pygame.MOUSEBUTTONDOWN and (gamestate.current_player == PLAYER_1 or gamestate.game_mode == "pvp"):
-                # Clear the top row
+            if event.type == pygame.MOUSEBUTTONDOWN and not gamestate.is_ai_turn():
+                # Clear the top row, and drop any preview from earlier motion this frame
                 renderer.clear_top_row()
+                motion_x = None
 
                 # Get the column from mouse position
                 x_pos = event.pos[0]
@@ -153,56 +243,55 @@ def main():
 
                 # Make the move
                 if gamestate.make_move(col):
-                    renderer.draw_board(gamestate.get_board_grid())
-
-                    # Check for game over
-                    if gamestate.status != PLAYING:
-                        renderer.draw_game_over_message(gamestate.status)
-                        pygame.time.wait(3000)
-
-                        # Show menu again
-                        game_mode, ai_difficulty = show_menu(screen, menu_font, button_font)
-                        gamestate.restart_game(game_mode=game_mode, ai_difficulty=ai_difficulty)
-                        renderer.draw_board(gamestate.get_board_grid())
-                        if gamestate.game_mode == "pvc":
-                            renderer.draw_difficulty_indicator(ai_difficulty)
-
-                    # If it's the AI's turn
-                    if gamestate.game_mode == "pvc" and gamestate.current_player == PLAYER_2:
-                        renderer.draw_player_turn_indicator(gamestate.current_player, is_ai=True)
-                        pygame.display.update()
-                        pygame.time.wait(500)  # Small delay to make AI move visible
-
-                        gamestate.make_ai_move()
-                        renderer.draw_board(gamestate.get_board_grid())
-
-                        # Check for game over after AI move
-                        if gamestate.status != PLAYING:
-                            renderer.draw_game_over_message(gamestate.status)
-                            pygame.time.wait(3000)
-                            # Show menu again
-                            game_mode, ai_difficulty = show_menu(screen, menu_font, button_font)
-                            gamestate.restart_game(game_mode=game_mode, ai_difficulty=ai_difficulty)
-                            renderer.draw_board(gamestate.get_board_grid())
-                            if gamestate.game_mode == "pvc":
-                                renderer.draw_difficulty_indicator(ai_difficulty)
-
-                    renderer.draw_player_turn_indicator(gamestate.current_player,
-                                                        is_ai=(gamestate.game_mode == "pvc" and
-                                                               gamestate.current_player == PLAYER_2))
+                    after_move()
 
             # Allow pressing 'r' to restart the game or ESC to show menu
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_r or event.key == pygame.K_ESCAPE:
-                    # Show menu again
-                    game_mode, ai_difficulty = show_menu(screen, menu_font, button_font)
-                    gamestate.restart_game(game_mode=game_mode, ai_difficulty=ai_difficulty)
+                    # Stop the AI search and show menu again
+                    new_game()
+
+                # 'u' takes back the last move, and the AI's reply to it against the computer
+                elif event.key == pygame.K_u and gamestate.undo():
+                    if gamestate.is_ai_turn():
+                        gamestate.undo()
                     renderer.draw_board(gamestate.get_board_grid())
-                    renderer.draw_player_turn_indicator(gamestate.current_player,
-                                                        is_ai=(gamestate.game_mode == "pvc" and
-                                                               gamestate.current_player == PLAYER_2))
-                    if gamestate.game_mode == "pvc":
-                        renderer.draw_difficulty_indicator(ai_difficulty)
+                    draw_turn_indicator()
+
+        # Show piece preview at the mouse. While the AI thinks, the preview
+        # shows the human player's piece for their next move.
+        if motion_x is not None and not gamestate.game_over:
+            preview_player = PLAYER_1 if gamestate.is_ai_turn() else gamestate.current_player
+            renderer.draw_piece_preview(motion_x, preview_player)
+
+        # Start the AI's search when it is its turn, and play its move once found.
+        # On the human player's turn the AI can ponder its replies instead.
+        if gamestate.start_ai_move():
+            thinking_dots = 0
+            draw_turn_indicator()
+        elif gamestate.ai_thinking:
+            if gamestate.poll_ai_move():
+                after_move()
+            elif pygame.time.get_ticks() // 400 % 4 != thinking_dots:
+                thinking_dots = pygame.time.get_ticks() // 400 % 4
+                draw_turn_indicator()
+        if args.ponder:
+            gamestate.start_pondering()
+
+        # Push everything drawn this frame to the display in one update
+        renderer.flush()
+
+        # Measure the work done each frame, leaving out time spent waiting for events or sleeping
+        frames += 1
+        busy_time += time.perf_counter() - frame_start
+        if args.show_frame_time and time.perf_counter() - stats_start >= 1.0:
+            elapsed = time.perf_counter() - stats_start
+            pygame.display.set_caption('Connect 4 - %.0f fps, %.2f ms/frame' %
+                                       (frames / elapsed, busy_time / frames * 1000))
+            stats_start = time.perf_counter()
+            frames, busy_time = 0, 0.0
+
+        clock.tick(args.fps)
 
 
 if __name__ == "__main__":
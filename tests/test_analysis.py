@@ -0,0 +1,30 @@
+# test_analysis.py - Checks that analyzing a position leaves the player's own searches unchanged
+#
+# Usage: python -m pytest tests
+
+import random
+
+from utils.constants import PLAYER_2
+from engine.bitboard import BitBoard
+from connect4AI import AIPlayer
+
+
+def random_position(rng, moves):
+    """Play `moves` random moves that do not end the game."""
+    position = BitBoard()
+    while position.moves < moves:
+        position.play(rng.choice([c for c in range(7) if position.can_play(c) and not position.is_winning_move(c)]))
+    return position
+
+
+def test_analysis_with_the_opponent_to_move_does_not_change_later_searches():
+    """Analyzing for the opponent must not leave scores from their side in the table get_move searches."""
+    for seed in range(10):
+        rng = random.Random(seed)
+        position = random_position(rng, 2 * rng.randint(3, 8))
+        ai = AIPlayer(PLAYER_2, 3)
+        ai.analyze(position, depth=6)
+
+        child = position.copy()
+        child.play(rng.choice([c for c in range(7) if child.can_play(c) and not child.is_winning_move(c)]))
+        assert ai.search(child) == AIPlayer(PLAYER_2, 3).search(child), "seed %d" % seed
@@ -0,0 +1,72 @@
+# test_evaluation.py - Checks that the incremental evaluator matches the full board scoring
+#
+# Usage: python -m pytest tests
+
+import random
+
+import pytest
+
+from utils.constants import PLAYER_1, PLAYER_2, THREE_WEIGHT, TWO_WEIGHT, OPPONENT_THREE_PENALTY
+from components.board import Board
+from engine.evaluation import IncrementalEvaluator, score_stones
+from connect4AI import AIPlayer
+
+
+@pytest.mark.parametrize("rows, columns, connect", [(6, 7, 4), (5, 6, 4), (6, 7, 5)])
+def test_incremental_score_matches_full_scoring(rows, columns, connect):
+    """Play random games with takebacks, comparing all three scores after every move and undo."""
+    rng = random.Random(rows * 100 + columns * 10 + connect)
+    ai = AIPlayer(player_piece=PLAYER_2, rows=rows, columns=columns, connect=connect)
+    geometry = ai.geometry
+
+    for _ in range(20):
+        board = Board(rows, columns, connect)
+        evaluator = IncrementalEvaluator(geometry=geometry)
+        stones = {PLAYER_1: 0, PLAYER_2: 0}
+        history = []
+
+        def check():
+            own, opponent = stones[PLAYER_2], stones[PLAYER_1]
+            expected = ai._score_position(board.grid, PLAYER_2)
+            assert evaluator.score == score_stones(own, opponent, geometry) == expected
+
+        check()
+        while not board.is_full():
+            if history and rng.random() < 0.25:
+                col, piece = history.pop()
+                board.remove_piece(col)
+                bit = geometry.cell_bit(board.heights[col], col).bit_length() - 1
+                stones[piece] ^= 1 << bit
+                evaluator.undo(bit, piece == PLAYER_2)
+            else:
+                piece = PLAYER_1 if len(history) % 2 == 0 else PLAYER_2
+                col = rng.choice([c for c in range(columns) if board.is_valid_location(c)])
+                row = board.get_next_open_row(col)
+                board.drop_piece(row, col, piece)
+                bit = geometry.cell_bit(row, col).bit_length() - 1
+                stones[piece] |= 1 << bit
+                evaluator.play(bit, piece == PLAYER_2)
+                history.append((col, piece))
+            check()
+
+
+@pytest.mark.parametrize("cells", [
+    [(0, 0), (1, 0), (2, 0)],  # vertical
+    [(0, 0), (1, 1), (2, 2)],  # rising diagonal
+    [(5, 0), (4, 1), (3, 2)],  # falling diagonal
+])
+def test_vertical_and_diagonal_windows_are_scored(cells):
+    """
+    Pin the window scoring fixed with the bitboard search.
+
+    The original _score_position built its vertical and diagonal windows as
+    plain lists, which scored 0 whatever they held. Three pieces in a line off
+    the center column score one open three and one open two, and the same
+    line for the opponent costs one blocked three.
+    """
+    ai = AIPlayer(player_piece=PLAYER_2)
+    board = Board()
+    for row, col in cells:
+        board.grid[row][col] = PLAYER_2
+    assert ai._score_position(board.grid, PLAYER_2) == THREE_WEIGHT + TWO_WEIGHT
+    assert ai._score_position(board.grid, PLAYER_1) == -OPPONENT_THREE_PENALTY
@@ -0,0 +1,57 @@
+# test_game_server.py - Checks the game server's answers to bad requests
+#
+# Usage: python -m pytest tests
+
+import asyncio
+import json
+
+from tools.game_server import GameServer
+
+
+def run_requests(*requests):
+    """Send requests to a server that is not listening, returning the responses."""
+    async def run():
+        server = GameServer(ai_workers=1)
+        try:
+            return [await server.handle_line(json.dumps(request)) for request in requests]
+        finally:
+            await server.close()
+    return asyncio.run(run())
+
+
+def test_board_wider_than_move_strings_is_refused():
+    """Columns past "z" could be played but not written back as a move string."""
+    response, = run_requests({"op": "new", "mode": "pvp", "columns": 37})
+    assert not response["ok"]
+    assert "36 columns" in response["error"]
+
+
+def test_unexpected_error_gets_a_response():
+    """A failure outside RequestError still answers the request."""
+    async def run():
+        server = GameServer(ai_workers=1)
+
+        async def broken(request):
+            raise KeyError("boom")
+        server._handlers["broken"] = broken
+        try:
+            return await server.handle_line(json.dumps({"op": "broken", "id": 7}))
+        finally:
+            await server.close()
+
+    response = asyncio.run(run())
+    assert response["id"] == 7
+    assert not response["ok"]
+    assert "KeyError" in response["error"]
+
+
+def test_ai_moves_are_played_in_worker_processes():
+    """The AI replies from its worker process, and the server's game records the move."""
+    new, move, reply, state = run_requests(
+        {"op": "new", "mode": "pvc", "difficulty": 2},
+        {"op": "move", "session": "1", "column": 3},
+        {"op": "ai_move", "session": "1"},
+        {"op": "state", "session": "1"})
+    assert new["ok"] and move["ok"] and reply["ok"]
+    assert state["moves"] == "3" + str(reply["column"])
+    assert state["current_player"] == 1
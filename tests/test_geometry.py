@@ -0,0 +1,28 @@
+# test_geometry.py - Checks that each board shape has exactly one shared Geometry
+#
+# Usage: python -m pytest tests
+
+from engine.geometry import get_geometry, DEFAULT_GEOMETRY
+from engine.bitboard import BitBoard
+from engine.opening_book import OpeningBook, write_book
+from tools.build_book import build_entries
+
+
+def test_geometry_is_shared_however_it_is_requested():
+    """Defaults, positional and keyword arguments all give the same object."""
+    assert get_geometry() is DEFAULT_GEOMETRY
+    assert get_geometry(6, 7, 4) is DEFAULT_GEOMETRY
+    assert get_geometry(rows=6, columns=7, connect=4) is DEFAULT_GEOMETRY
+    assert get_geometry(5, 6, 4) is get_geometry(rows=5, columns=6, connect=4)
+
+
+def test_book_built_for_explicit_shape_finds_default_positions(tmp_path):
+    """A book built for get_geometry(6, 7, 4) answers lookups on BitBoard()."""
+    geometry = get_geometry(6, 7, 4)
+    path = str(tmp_path / "book.bin")
+    write_book(path, build_entries(2, 3, geometry=geometry), 2, 3, geometry)
+    book = OpeningBook(path)
+    try:
+        assert book.lookup(BitBoard()) is not None
+    finally:
+        book.close()
@@ -0,0 +1,57 @@
+# test_menu.py - Checks that closing the window from the menu still closes the game
+#
+# Usage: python -m pytest tests
+
+import os
+
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import pygame
+
+from main import show_menu
+
+
+@pytest.fixture(autouse=True)
+def display():
+    """Start pygame for one test, and stop it afterwards so no SDL thread is left when later tests fork."""
+    pygame.init()
+    yield
+    pygame.quit()
+
+
+class RecordingGame:
+    """Stands in for GameState, recording whether it was closed."""
+
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_closing_the_menu_closes_the_game_state():
+    """Quitting from the menu shown mid-game must write the store and stop the AI, as in-game quitting does."""
+    screen = pygame.display.set_mode((5 * 100, 6 * 100))
+    font = pygame.font.Font(None, 24)
+    game = RecordingGame()
+    pygame.event.post(pygame.event.Event(pygame.QUIT))
+    with pytest.raises(SystemExit):
+        show_menu(screen, font, font, game)
+    assert game.closed
+
+
+@pytest.mark.parametrize("columns", [4, 5, 7, 9])
+def test_every_difficulty_can_be_picked_on_narrow_boards(columns):
+    """The four difficulty buttons lie within the window, whatever the board width."""
+    width = columns * 100
+    screen = pygame.display.set_mode((width, 7 * 100))
+    font = pygame.font.Font(None, 24)
+    for level in range(1, 5):
+        pygame.event.clear()
+        pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=(width // 2, 315), button=1))
+        pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=((2 * level - 1) * width // 8, 475),
+                                             button=1))
+        # Missed clicks leave the menu waiting, so quit to end the test instead of hanging
+        pygame.event.post(pygame.event.Event(pygame.QUIT))
+        assert show_menu(screen, font, font) == ("pvc", level)
@@ -0,0 +1,34 @@
+# test_position_store.py - Checks which stored results a player trusts instead of searching
+#
+# Usage: python -m pytest tests
+
+import random
+
+from utils.constants import PLAYER_1, PLAYER_2
+from engine.bitboard import BitBoard
+from connect4AI import AIPlayer
+
+
+def test_heuristic_result_does_not_replace_the_solver(tmp_path):
+    """A stored fixed-depth result is not played where the solver threshold applies."""
+    path = str(tmp_path / "positions.db")
+    # A position whose depth-5 search proves no result, so only a heuristic score is stored
+    rng = random.Random(9)
+    position = BitBoard()
+    while position.moves < 28:
+        position.play(rng.choice([c for c in range(7) if position.can_play(c) and not position.is_winning_move(c)]))
+    piece = PLAYER_1 if position.moves % 2 == 0 else PLAYER_2
+
+    heuristic = AIPlayer(piece, 3, store_path=path)
+    heuristic.search(position)
+    heuristic.close()
+
+    solving = AIPlayer(piece, 3, store_path=path, solver_threshold=14)
+    solving.search(position)
+    assert solving.last_solution is not None
+    solving.close()
+
+    reusing = AIPlayer(piece, 3, store_path=path)
+    reusing.search(position)
+    assert reusing.last_search_nodes == 0
+    reusing.close()
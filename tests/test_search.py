@@ -0,0 +1,48 @@
+# test_search.py - Checks the alpha-beta search against plain minimax with the same heuristic
+#
+# Usage: python -m pytest tests
+
+import random
+
+import pytest
+
+from utils.constants import PLAYER_1, PLAYER_2, WIN_SCORE
+from engine.bitboard import BitBoard
+from engine.evaluation import score_stones
+from connect4AI import AIPlayer
+
+
+def plain_minimax(position, depth, maximizing, geometry):
+    """Minimax with no pruning, table or mirroring, scored for the maximizing player."""
+    if position.last_move_won():
+        return -WIN_SCORE if maximizing else WIN_SCORE
+    if position.is_full():
+        return 0
+    if depth == 0:
+        stones = position.current if maximizing else position.opponent()
+        return score_stones(stones, stones ^ position.mask, geometry)
+    scores = []
+    for col in range(geometry.columns):
+        if position.can_play(col):
+            position.play(col)
+            scores.append(plain_minimax(position, depth - 1, not maximizing, geometry))
+            position.undo(col)
+    return max(scores) if maximizing else min(scores)
+
+
+@pytest.mark.parametrize("rows, columns", [(5, 6), (6, 7), (7, 8)])
+def test_search_matches_plain_minimax(rows, columns):
+    """Mirror-image positions share table entries, which is only right if the heuristic is symmetric."""
+    rng = random.Random(rows * 10 + columns)
+    for _ in range(30):
+        position = BitBoard(AIPlayer(rows=rows, columns=columns).geometry)
+        for _ in range(rng.randint(0, 10)):
+            position.play(rng.choice([c for c in range(columns)
+                                      if position.can_play(c) and not position.is_winning_move(c)]))
+        ai = AIPlayer(PLAYER_1 if position.moves % 2 == 0 else PLAYER_2, rows=rows, columns=columns)
+        ai.depth = 2
+
+        col, score = ai.search(position)
+        assert score == plain_minimax(position, ai.depth + 1, True, ai.geometry)
+        position.play(col)
+        assert plain_minimax(position, ai.depth, False, ai.geometry) == score
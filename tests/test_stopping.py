@@ -0,0 +1,74 @@
+# test_stopping.py - Checks that long searches end promptly once their stop event is set
+#
+# Usage: python -m pytest tests
+
+import random
+import threading
+import time
+
+import pytest
+
+from engine.bitboard import BitBoard
+from engine.geometry import get_geometry
+from engine.solver import Solver, SearchTimeout
+from connect4AI import AIPlayer
+
+
+def stop_after(seconds):
+    """Return an event that is set after `seconds`."""
+    event = threading.Event()
+    timer = threading.Timer(seconds, event.set)
+    timer.daemon = True
+    timer.start()
+    return event
+
+
+def test_solver_stops_on_event():
+    """A connect-5 endgame takes the solver minutes, but a stop ends it at once."""
+    geometry = get_geometry(6, 7, 5)
+    rng = random.Random(1)
+    position = BitBoard(geometry)
+    while position.moves < 20:
+        position.play(rng.choice([c for c in range(geometry.columns)
+                                  if position.can_play(c) and not position.is_winning_move(c)]))
+
+    start = time.perf_counter()
+    with pytest.raises(SearchTimeout):
+        Solver(geometry=geometry).solve(position, stop_after(0.1))
+    assert time.perf_counter() - start < 1.0
+
+
+def test_parallel_root_search_stops_on_event():
+    """Worker processes notice the stop too, and the pool is still usable afterwards."""
+    ai = AIPlayer(difficulty=3, workers=2)
+    try:
+        ai._parallel._ensure_pool()
+        position = BitBoard()
+        position.play(3)
+        ai.depth = 12
+        start = time.perf_counter()
+        with pytest.raises(SearchTimeout):
+            ai.search(position, stop_after(0.3))
+        assert time.perf_counter() - start < 2.0
+
+        ai.depth = 3
+        assert ai.search(position)[0] is not None
+    finally:
+        ai.close()
+
+
+def test_perfect_falls_back_when_the_solver_runs_out_of_time():
+    """On connect 5 the solver cannot finish at 22 empty cells, so Perfect searches heuristically instead."""
+    geometry = get_geometry(6, 7, 5)
+    rng = random.Random(0)
+    position = BitBoard(geometry)
+    while position.moves < geometry.cells - 22:
+        position.play(rng.choice([c for c in range(geometry.columns)
+                                  if position.can_play(c) and not position.is_winning_move(c)]))
+
+    ai = AIPlayer(difficulty=4, time_budget_ms=300, rows=6, columns=7, connect=5)
+    start = time.perf_counter()
+    col, _ = ai.search(position)
+    assert time.perf_counter() - start < 0.6
+    assert position.can_play(col)
+    assert ai.last_solution is None
@@ -0,0 +1,66 @@
+# build_book.py - Builds an opening book file for AIPlayer
+#
+# Usage: python -m tools.build_book --plies 6 --depth 8 --output book.bin
+
+import argparse
+import sys
+import time
+
+from utils.constants import PLAYER_1, PLAYER_2, ROW_COUNT, COLUMN_COUNT, WINDOW_LENGTH
+from connect4AI import AIPlayer
+from engine.geometry import get_geometry
+from engine.opening_book import opening_positions, write_book
+
+
+def build_entries(max_plies, depth, tt_size_mb=64, geometry=None):
+    """
+    Search every opening position and return its book entries.
+
+    Args:
+        max_plies: Deepest ply to include
+        depth: Search depth for each position
+        tt_size_mb: Transposition table budget for each side
+        geometry: The board shape (default: the standard 6x7 connect 4)
+
+    Returns:
+        List of (canonical key, score, column, depth) tuples
+    """
+    # One searcher per side to move, so their cached scores share a point of view
+    geometry = geometry or get_geometry()
+    searchers = {}
+    for moves_parity, piece in ((0, PLAYER_1), (1, PLAYER_2)):
+        searchers[moves_parity] = AIPlayer(player_piece=piece, difficulty=3, tt_size_mb=tt_size_mb,
+                                           rows=geometry.rows, columns=geometry.columns,
+                                           connect=geometry.connect)
+        searchers[moves_parity].depth = depth
+
+    entries = []
+    start = time.perf_counter()
+    for key, position in opening_positions(max_plies, geometry):
+        col, score = searchers[position.moves % 2].search(position)
+        entries.append((key, int(score), col, depth))
+        if len(entries) % 1000 == 0:
+            print("%d positions, %.1fs" % (len(entries), time.perf_counter() - start), file=sys.stderr)
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build an opening book for AIPlayer.")
+    parser.add_argument("--plies", type=int, default=6, help="deepest ply to include (default: 6)")
+    parser.add_argument("--depth", type=int, default=8, help="search depth per position (default: 8)")
+    parser.add_argument("--output", default="book.bin", help="output file (default: book.bin)")
+    parser.add_argument("--rows", type=int, default=ROW_COUNT, help="board rows (default: %d)" % ROW_COUNT)
+    parser.add_argument("--columns", type=int, default=COLUMN_COUNT,
+                        help="board columns (default: %d)" % COLUMN_COUNT)
+    parser.add_argument("--connect", type=int, default=WINDOW_LENGTH,
+                        help="pieces in a row needed to win (default: %d)" % WINDOW_LENGTH)
+    args = parser.parse_args()
+
+    geometry = get_geometry(args.rows, args.columns, args.connect)
+    entries = build_entries(args.plies, args.depth, geometry=geometry)
+    write_book(args.output, entries, args.plies, args.depth, geometry)
+    print("Wrote %d positions to %s" % (len(entries), args.output))
+
+
+if __name__ == "__main__":
+    main()
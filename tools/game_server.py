@@ -0,0 +1,366 @@
+# game_server.py - Serves many concurrent games to local clients over a JSON line protocol
+#
+# Usage: python -m tools.game_server [--port 8765] [--ai-workers 4]
+#
+# Each request and response is one JSON object on its own line. A request names
+# an "op" and may carry an "id", which the response echoes. Responses hold
+# "ok": true and the result, or "ok": false and an "error" message.
+#
+#   {"op": "new", "mode": "pvc", "difficulty": 3}   -> {"ok": true, "session": "1", "moves": "", ...}
+#   {"op": "move", "session": "1", "column": 3}      -> the game after the move
+#   {"op": "ai_move", "session": "1"}                -> the game after the AI's reply, with its "column"
+#   {"op": "state", "session": "1"}                  -> the game as it stands
+#   {"op": "close", "session": "1"}                  -> {"ok": true}
+#   {"op": "stats"}                                  -> session and AI worker counts
+
+import argparse
+import asyncio
+import itertools
+import json
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.constants import PLAYING, PLAYER_1_WIN, PLAYER_2_WIN, TIE, PLAYER_2
+from utils.constants import ROW_COUNT, COLUMN_COUNT, WINDOW_LENGTH
+from components.game_state import GameState
+
+DEFAULT_PORT = 8765
+
+STATUS_NAMES = {PLAYING: "playing", PLAYER_1_WIN: "player1_win", PLAYER_2_WIN: "player2_win", TIE: "tie"}
+
+# Sessions idle for longer than this are closed, checked once a minute
+IDLE_TIMEOUT = 600
+
+
+# Games in an AI worker process, by session id. Each keeps its AI player, so
+# the transposition table carries over between that session's moves.
+_worker_games = {}
+
+
+def _worker_ai_move(session_id, settings, moves):
+    """
+    Play the AI's move for a session, in an AI worker process.
+
+    Args:
+        session_id: The session whose game this process keeps
+        settings: GameState keyword arguments for the session's game
+        moves: The moves played so far, as a move string
+
+    Returns:
+        The column the AI played
+    """
+    game = _worker_games.get(session_id)
+    if game is None:
+        game = _worker_games[session_id] = GameState("pvc", **settings)
+    game.load_moves(moves)
+    game.make_ai_move()
+    return game.history[-1]
+
+
+def _worker_close(session_id=None):
+    """Close one session's game in an AI worker process, or all of them, so position stores are written."""
+    for key in list(_worker_games) if session_id is None else [session_id]:
+        game = _worker_games.pop(key, None)
+        if game is not None:
+            game.close()
+
+
+class RequestError(Exception):
+    """Raised by a request handler to send an error response instead of a result."""
+
+
+class Session:
+    def __init__(self, session_id, state, mode, settings, worker):
+        """
+        Hold one game and the lock that keeps its requests in order.
+
+        A move or AI move holds the lock until it is done, so a second request
+        for the same game waits instead of changing the board under a search.
+        The game here only checks and records moves. The AI player lives in
+        `worker`, the AI worker process that plays every AI move of the game.
+        """
+        self.id = session_id
+        self.state = state
+        self.mode = mode
+        self.settings = settings
+        self.worker = worker
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+    def is_ai_turn(self):
+        """Check if the AI is to move."""
+        return self.mode == "pvc" and self.state.current_player == PLAYER_2 and not self.state.game_over
+
+    def close(self):
+        """Free the game, and its AI player in the worker process."""
+        self.state.close()
+        if self.mode == "pvc":
+            self.worker.submit(_worker_close, self.id)
+
+    def describe(self):
+        """Return the game as a JSON-ready dictionary."""
+        state = self.state
+        return {
+            "session": self.id,
+            "mode": self.mode,
+            "rows": state.board.rows,
+            "columns": state.board.columns,
+            "connect": state.board.connect,
+            "moves": state.get_moves(),
+            "current_player": state.current_player,
+            "status": STATUS_NAMES[state.status],
+            "game_over": state.game_over,
+        }
+
+
+class GameServer:
+    def __init__(self, ai_workers=2, max_sessions=1000, max_queued=64, idle_timeout=IDLE_TIMEOUT, tt_size_mb=2,
+                 store_path=None):
+        """
+        Initialize a server for many concurrent games.
+
+        The event loop only handles I/O and cheap moves. AI moves run
+        GameState.make_ai_move in a fixed set of worker processes, so searches
+        use separate cores and do not hold up the event loop. Each session
+        keeps to one worker, where its AI player stays between moves. Once
+        `max_queued` AI moves are waiting for a worker, more are refused with a
+        "busy" error instead of queueing without limit.
+
+        Args:
+            ai_workers: Processes available for AI searches
+            max_sessions: Most games open at once
+            max_queued: Most AI moves running or waiting at once
+            idle_timeout: Seconds after which an unused session is closed
+            tt_size_mb: Transposition table size for each session's AI player
+            store_path: Optional PositionStore file shared by every session's AI player
+        """
+        self.ai_workers = ai_workers
+        self.max_sessions = max_sessions
+        self.max_queued = max_queued
+        self.idle_timeout = idle_timeout
+        self.tt_size_mb = tt_size_mb
+        self.ai_options = {"tt_size_mb": tt_size_mb}
+        if store_path:
+            self.ai_options["store_path"] = store_path
+
+        self.sessions = {}
+        self._ids = itertools.count(1)
+        self._workers = [ProcessPoolExecutor(max_workers=1) for _ in range(ai_workers)]
+        self._ai_pending = 0
+        self._server = None
+        self._reaper = None
+
+        self._handlers = {
+            "new": self._new,
+            "state": self._state,
+            "move": self._move,
+            "ai_move": self._ai_move,
+            "close": self._close,
+            "stats": self._stats,
+        }
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT):
+        """Start listening, and return the asyncio server."""
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        self._reaper = asyncio.ensure_future(self._close_idle_sessions())
+        return self._server
+
+    async def close(self):
+        """Stop listening, wait for running AI moves and close every session."""
+        if self._reaper is not None:
+            self._reaper.cancel()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for session in self.sessions.values():
+            session.state.close()
+        self.sessions.clear()
+        loop = asyncio.get_running_loop()
+        for worker in self._workers:
+            worker.submit(_worker_close)
+            await loop.run_in_executor(None, worker.shutdown)
+
+    async def _handle_connection(self, reader, writer):
+        """Answer the requests on one connection in the order they arrive."""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = await self.handle_line(line)
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def handle_line(self, line):
+        """
+        Run one request.
+
+        Args:
+            line: The request as a JSON object, in bytes or text
+
+        Returns:
+            The response dictionary
+        """
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return {"ok": False, "error": "request is not valid JSON"}
+        if not isinstance(request, dict):
+            return {"ok": False, "error": "request must be a JSON object"}
+
+        response = {"id": request["id"]} if "id" in request else {}
+        handler = self._handlers.get(request.get("op"))
+        try:
+            if handler is None:
+                raise RequestError("unknown op %r" % request.get("op"))
+            response.update(await handler(request))
+            response["ok"] = True
+        except RequestError as e:
+            response.update(ok=False, error=str(e))
+        except Exception as e:
+            # A bug in one request must not drop the connection without a reply
+            response.update(ok=False, error="internal error: %s: %s" % (type(e).__name__, e))
+        return response
+
+    def _session(self, request):
+        """Return the session a request names."""
+        session = self.sessions.get(str(request.get("session")))
+        if session is None:
+            raise RequestError("no session %r" % request.get("session"))
+        session.last_used = time.monotonic()
+        return session
+
+    async def _new(self, request):
+        """Start a game, optionally from a string of moves."""
+        if len(self.sessions) >= self.max_sessions:
+            raise RequestError("too many sessions")
+        mode = request.get("mode", "pvc")
+        if mode not in ("pvp", "pvc"):
+            raise RequestError("mode must be 'pvp' or 'pvc'")
+        try:
+            settings = {"ai_difficulty": int(request.get("difficulty", 2)), "rows": int(request.get("rows", ROW_COUNT)),
+                        "columns": int(request.get("columns", COLUMN_COUNT)),
+                        "connect": int(request.get("connect", WINDOW_LENGTH)), "ai_options": self.ai_options}
+            # The AI player is built in the session's worker process on its first move
+            state = GameState("pvp", **settings)
+        except (TypeError, ValueError) as e:
+            raise RequestError("bad game settings: %s" % e)
+        try:
+            state.load_moves(str(request.get("moves", "")))
+        except ValueError as e:
+            state.close()
+            raise RequestError(str(e))
+
+        session_id = next(self._ids)
+        session = Session(str(session_id), state, mode, settings, self._workers[session_id % len(self._workers)])
+        self.sessions[session.id] = session
+        return session.describe()
+
+    async def _state(self, request):
+        """Describe a game."""
+        session = self._session(request)
+        async with session.lock:
+            return session.describe()
+
+    async def _move(self, request):
+        """Play a player's move with GameState.make_move."""
+        session = self._session(request)
+        column = request.get("column")
+        if not isinstance(column, int):
+            raise RequestError("column must be an integer")
+        async with session.lock:
+            state = session.state
+            if session.is_ai_turn():
+                raise RequestError("it is the AI's turn")
+            if not state.make_move(column):
+                raise RequestError("illegal move %r" % column)
+            return session.describe()
+
+    async def _ai_move(self, request):
+        """Play the AI's move with GameState.make_ai_move in the session's worker process."""
+        session = self._session(request)
+        if self._ai_pending >= self.max_queued:
+            raise RequestError("busy: %d AI moves waiting" % self._ai_pending)
+        async with session.lock:
+            state = session.state
+            if not session.is_ai_turn():
+                raise RequestError("it is not the AI's turn")
+            self._ai_pending += 1
+            try:
+                column = await asyncio.get_running_loop().run_in_executor(
+                    session.worker, _worker_ai_move, session.id, session.settings, state.get_moves())
+            finally:
+                self._ai_pending -= 1
+            state.make_move(column)
+            result = session.describe()
+            result["column"] = column
+            return result
+
+    async def _close(self, request):
+        """End a game and free its AI player."""
+        session = self._session(request)
+        async with session.lock:
+            if self.sessions.pop(session.id, None) is not None:
+                session.close()
+        return {}
+
+    async def _stats(self, request):
+        """Report the load on the server."""
+        return {"sessions": len(self.sessions), "ai_workers": self.ai_workers, "ai_pending": self._ai_pending}
+
+    async def _close_idle_sessions(self):
+        """Close sessions nobody has used for idle_timeout seconds."""
+        while True:
+            await asyncio.sleep(60)
+            cutoff = time.monotonic() - self.idle_timeout
+            for session in list(self.sessions.values()):
+                if session.last_used < cutoff and not session.lock.locked():
+                    del self.sessions[session.id]
+                    session.close()
+
+
+async def serve(args):
+    """Run the server until interrupted."""
+    server = GameServer(args.ai_workers, args.max_sessions, args.max_queued, args.idle_timeout, args.tt_size_mb,
+                        args.store)
+    listener = await server.start(args.host, args.port)
+    print("Serving on %s" % ", ".join("%s:%d" % s.getsockname()[:2] for s in listener.sockets))
+    # Stop cleanly on SIGTERM too, so the AI worker processes are shut down and their stores written
+    stopped = asyncio.Event()
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopped.set)
+    except NotImplementedError:
+        pass
+    try:
+        await stopped.wait()
+    finally:
+        await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve Connect 4 games over a JSON line protocol.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port (default: %d)" % DEFAULT_PORT)
+    parser.add_argument("--ai-workers", type=int, default=2, help="processes for AI moves (default: 2)")
+    parser.add_argument("--max-sessions", type=int, default=1000, help="most open games (default: 1000)")
+    parser.add_argument("--max-queued", type=int, default=64,
+                        help="most AI moves running or waiting before requests are refused (default: 64)")
+    parser.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT,
+                        help="seconds before an unused game is closed (default: %d)" % IDLE_TIMEOUT)
+    parser.add_argument("--tt-size-mb", type=float, default=2,
+                        help="transposition table size per game in MB (default: 2)")
+    parser.add_argument("--store", metavar="PATH", help="position store file the AI players read and add to")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
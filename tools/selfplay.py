@@ -0,0 +1,262 @@
+# selfplay.py - Plays AIPlayer-vs-AIPlayer games without a window and streams the results
+#
+# Usage: python -m tools.selfplay --engine medium:difficulty=2 --engine hard:difficulty=3 \
+#            --games 1000 --workers 4 --output results.jsonl
+
+import argparse
+import ast
+import csv
+import itertools
+import json
+import multiprocessing
+import random
+import sys
+import time
+
+from utils.constants import PLAYER_1_WIN, PLAYER_2_WIN, ROW_COUNT, COLUMN_COUNT, WINDOW_LENGTH
+from components.game_state import GameState
+from connect4AI import AIPlayer
+
+# Games handed to the pool at a time, so the task list never has to fit in memory
+BATCH_SIZE = 256
+
+CSV_FIELDS = ["game", "player1", "player2", "winner", "result", "length", "moves", "opening", "move_times_ms"]
+
+# Per-process engines, built once by _init_worker and kept between games
+_engines = None
+_settings = None
+
+
+def parse_engine(spec):
+    """
+    Parse an engine spec such as "hard:difficulty=3,time_budget_ms=200".
+
+    Args:
+        spec: An optional name and a colon, then AIPlayer keyword arguments
+            separated by commas. Values are Python literals, or plain strings.
+
+    Returns:
+        Tuple of (name, keyword arguments)
+    """
+    name, _, options = spec.rpartition(":")
+    kwargs = {}
+    for option in filter(None, options.split(",")):
+        key, sep, value = option.partition("=")
+        if not sep:
+            raise ValueError("expected key=value in engine spec %r, got %r" % (spec, option))
+        try:
+            kwargs[key.strip()] = ast.literal_eval(value.strip())
+        except (ValueError, SyntaxError):
+            kwargs[key.strip()] = value.strip()
+    return name or spec, kwargs
+
+
+def _init_worker(engines, settings):
+    """Build every engine once per process, one AIPlayer for each side."""
+    global _engines, _settings
+    _settings = settings
+    board = {"rows": settings["rows"], "columns": settings["columns"], "connect": settings["connect"]}
+    _engines = [{piece: AIPlayer(player_piece=piece, **board, **kwargs) for piece in (1, 2)}
+                for _, kwargs in engines]
+
+
+def play_game(task):
+    """
+    Play one game.
+
+    Args:
+        task: Tuple of (game number, engine index for player 1, engine index for player 2)
+
+    Returns:
+        Dictionary describing the game, see CSV_FIELDS
+    """
+    game, first, second = task
+    settings = _settings
+    random.seed(settings["seed"] * 1000003 + game)
+
+    state = GameState("pvp", rows=settings["rows"], columns=settings["columns"], connect=settings["connect"])
+    # Random opening moves give deterministic engines different games to play
+    for _ in range(settings["opening_plies"]):
+        columns = [col for col in range(state.board.columns) if state.board.is_valid_location(col)]
+        if state.game_over or not columns:
+            break
+        state.make_move(random.choice(columns))
+    opening = len(state.history)
+
+    players = {1: _engines[first][1], 2: _engines[second][2]}
+    move_times = []
+    while not state.game_over:
+        start = time.perf_counter()
+        col = players[state.current_player].get_move(state.board, state.position)
+        move_times.append(round((time.perf_counter() - start) * 1000, 3))
+        state.make_move(col)
+
+    if state.status == PLAYER_1_WIN:
+        result, winner = "1-0", first
+    elif state.status == PLAYER_2_WIN:
+        result, winner = "0-1", second
+    else:
+        result, winner = "1/2-1/2", None
+    return {
+        "game": game,
+        "player1": first,
+        "player2": second,
+        "winner": winner,
+        "result": result,
+        "length": len(state.history),
+        "moves": state.get_moves(),
+        "opening": opening,
+        "move_times_ms": move_times,
+    }
+
+
+def schedule(engine_count, games):
+    """
+    Yield the games of a round robin, lazily.
+
+    Every pair of engines (or the one engine against itself) plays `games`
+    games, swapping colors each game.
+
+    Yields:
+        Tuple of (game number, engine index for player 1, engine index for player 2)
+    """
+    pairs = list(itertools.combinations(range(engine_count), 2)) or [(0, 0)]
+    game = 0
+    for a, b in pairs:
+        for i in range(games):
+            yield (game, a, b) if i % 2 == 0 else (game, b, a)
+            game += 1
+
+
+def run(engines, settings, games, workers, write):
+    """
+    Play a tournament and pass each finished game to `write`, in completion order.
+
+    Args:
+        engines: List of (name, AIPlayer keyword arguments)
+        settings: Board size, opening plies and seed shared by every game
+        games: Games per pair of engines
+        workers: Number of processes
+        write: Called with each game's dictionary
+
+    Returns:
+        Number of games played
+    """
+    tasks = schedule(len(engines), games)
+    played = 0
+    if workers <= 1:
+        _init_worker(engines, settings)
+        for task in tasks:
+            write(play_game(task))
+            played += 1
+        return played
+
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(engines, settings)) as pool:
+        while True:
+            batch = list(itertools.islice(tasks, BATCH_SIZE))
+            if not batch:
+                break
+            for record in pool.imap_unordered(play_game, batch, chunksize=max(1, len(batch) // (workers * 4))):
+                write(record)
+                played += 1
+    return played
+
+
+class Standings:
+    def __init__(self, names):
+        """Keep running totals per engine, without holding on to the games."""
+        self.names = names
+        self.wins = [0] * len(names)
+        self.losses = [0] * len(names)
+        self.draws = [0] * len(names)
+        self.moves = [0] * len(names)
+        self.move_time = [0.0] * len(names)
+
+    def add(self, record):
+        """Count one finished game."""
+        first, second = record["player1"], record["player2"]
+        if record["winner"] is None:
+            self.draws[first] += 1
+            self.draws[second] += 1
+        else:
+            loser = second if record["winner"] == first else first
+            self.wins[record["winner"]] += 1
+            self.losses[loser] += 1
+        # Player 1 makes the even-numbered moves after the opening, player 2 the odd ones
+        for i, ms in enumerate(record["move_times_ms"]):
+            engine = first if (record["opening"] + i) % 2 == 0 else second
+            self.moves[engine] += 1
+            self.move_time[engine] += ms
+
+    def report(self):
+        """Return a table of results per engine."""
+        lines = ["%-16s %7s %7s %7s %7s %10s" % ("engine", "wins", "losses", "draws", "score", "ms/move")]
+        for i, name in enumerate(self.names):
+            played = self.wins[i] + self.losses[i] + self.draws[i]
+            score = (self.wins[i] + self.draws[i] / 2) / played * 100 if played else 0.0
+            per_move = self.move_time[i] / self.moves[i] if self.moves[i] else 0.0
+            lines.append("%-16s %7d %7d %7d %6.1f%% %10.2f" % (name, self.wins[i], self.losses[i],
+                                                              self.draws[i], score, per_move))
+        return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play AIPlayer-vs-AIPlayer games without a window.")
+    parser.add_argument("--engine", action="append", default=[],
+                        help="engine as NAME:key=value,... of AIPlayer arguments, e.g. hard:difficulty=3; "
+                             "repeat for a round robin (default: medium and hard)")
+    parser.add_argument("--games", type=int, default=100, help="games per pair of engines (default: 100)")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(),
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("--opening-plies", type=int, default=2,
+                        help="random moves at the start of each game (default: 2)")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the random openings (default: 0)")
+    parser.add_argument("--rows", type=int, default=ROW_COUNT, help="board rows (default: %d)" % ROW_COUNT)
+    parser.add_argument("--columns", type=int, default=COLUMN_COUNT,
+                        help="board columns (default: %d)" % COLUMN_COUNT)
+    parser.add_argument("--connect", type=int, default=WINDOW_LENGTH,
+                        help="pieces in a row needed to win (default: %d)" % WINDOW_LENGTH)
+    parser.add_argument("--output", default="-", help="output file, or - for stdout (default: -)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default=None,
+                        help="output format (default: csv for .csv files, otherwise jsonl)")
+    args = parser.parse_args()
+
+    try:
+        engines = [parse_engine(spec) for spec in args.engine or ["medium:difficulty=2", "hard:difficulty=3"]]
+    except ValueError as e:
+        parser.error(str(e))
+    names = [name for name, _ in engines]
+    settings = {"rows": args.rows, "columns": args.columns, "connect": args.connect,
+                "opening_plies": args.opening_plies, "seed": args.seed}
+    output_format = args.format or ("csv" if args.output.endswith(".csv") else "jsonl")
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+    standings = Standings(names)
+    if output_format == "csv":
+        writer = csv.DictWriter(out, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+
+    def write(record):
+        standings.add(record)
+        winner = record["winner"]
+        record = dict(record, player1=names[record["player1"]], player2=names[record["player2"]],
+                      winner=None if winner is None else names[winner])
+        if output_format == "csv":
+            record["winner"] = record["winner"] or ""
+            record["move_times_ms"] = " ".join(map(str, record["move_times_ms"]))
+            writer.writerow(record)
+        else:
+            out.write(json.dumps(record) + "\n")
+
+    start = time.perf_counter()
+    try:
+        played = run(engines, settings, args.games, args.workers, write)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print("%d games in %.1fs" % (played, time.perf_counter() - start), file=sys.stderr)
+    print(standings.report(), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,7 @@ RADIUS = int(SQUARE_SIZE/2 - 5)
 # Screen dimensions
 WIDTH = COLUMN_COUNT * SQUARE_SIZE
 HEIGHT = (ROW_COUNT + 1) * SQUARE_SIZE  # Extra row for dropping pieces
+FPS = 60  # Frames per second of the main loop
 
 # Colors
 BLUE = (0, 0, 255)
@@ -25,4 +26,13 @@ PLAYER_2 = 2
 PLAYING = 0
 PLAYER_1_WIN = 1
 PLAYER_2_WIN = 2
-TIE = 3
\ No newline at end of file
+TIE = 3
+
+# AI scoring weights
+WIN_SCORE = 1000000
+WINDOW_LENGTH = 4
+CENTER_WEIGHT = 3
+FOUR_WEIGHT = 100
+THREE_WEIGHT = 5
+TWO_WEIGHT = 2
+OPPONENT_THREE_PENALTY = 4